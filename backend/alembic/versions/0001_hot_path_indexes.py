@@ -0,0 +1,71 @@
+"""hot path indexes for invoices, payments and customers
+
+Revision ID: 0001_hot_path_indexes
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_hot_path_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, options) - keep in sync with the models' __table_args__
+INDEXES = [
+    ("uq_invoices_customer_period", "invoices", ["customer_id", "billing_period"], {"unique": True}),
+    ("ix_invoices_created_at", "invoices", ["created_at"], {}),
+    ("ix_invoices_status_created_at", "invoices", ["status", "created_at"], {}),
+    ("ix_invoices_billing_period_created_at", "invoices", ["billing_period", "created_at"], {}),
+    ("ix_invoices_unpaid_status_due_date", "invoices", ["status", "due_date"], {
+        "postgresql_where": sa.text("status IN ('pending', 'partial')"),
+    }),
+    ("ix_invoices_outstanding_due_date", "invoices", ["due_date"], {
+        "postgresql_include": ["total_amount"],
+        "postgresql_where": sa.text("status IN ('pending', 'partial', 'overdue')"),
+    }),
+    ("ix_payments_created_at", "payments", ["created_at"], {}),
+    ("ix_payments_customer_id_created_at", "payments", ["customer_id", "created_at"], {}),
+    ("ix_payments_invoice_id", "payments", ["invoice_id"], {}),
+    ("ix_payments_status_created_at", "payments", ["status", "created_at"], {}),
+    ("ix_payments_payment_method_created_at", "payments", ["payment_method", "created_at"], {}),
+    ("ix_customers_created_at", "customers", ["created_at"], {}),
+    ("ix_customers_status_created_at", "customers", ["status", "created_at"], {}),
+    ("ix_customers_package_id_created_at", "customers", ["package_id", "created_at"], {}),
+]
+
+
+def upgrade() -> None:
+    # The unique index fails on existing duplicates; report them clearly first
+    duplicates = [] if context.is_offline_mode() else op.get_bind().execute(sa.text(
+        "SELECT customer_id, billing_period, count(*) FROM invoices "
+        "GROUP BY customer_id, billing_period HAVING count(*) > 1 LIMIT 20"
+    )).fetchall()
+    if duplicates:
+        listed = ", ".join(f"customer {c} period {p} ({n}x)" for c, p, n in duplicates)
+        raise RuntimeError(f"Duplicate invoices per customer and billing period: {listed}")
+
+    # CONCURRENTLY keeps the tables writable while the indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                **options
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                if_exists=True,
+                postgresql_concurrently=True
+            )
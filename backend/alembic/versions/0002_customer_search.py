@@ -0,0 +1,51 @@
+"""customer search: pg_trgm indexes and normalized phone
+
+Revision ID: 0002_customer_search
+Revises: 0001_hot_path_indexes
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_customer_search'
+down_revision = '0001_hot_path_indexes'
+branch_labels = None
+depends_on = None
+
+
+PHONE_NORMALIZED_SQL = "regexp_replace(regexp_replace(phone, '[^0-9]', '', 'g'), '^62', '0')"
+
+TRGM_INDEXES = [
+    ("ix_customers_full_name_trgm", "full_name"),
+    ("ix_customers_customer_code_trgm", "customer_code"),
+    ("ix_customers_email_trgm", "email"),
+    ("ix_customers_phone_normalized_trgm", "phone_normalized"),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # IF NOT EXISTS: create_all already added the column on fresh installs
+    op.execute(
+        "ALTER TABLE customers ADD COLUMN IF NOT EXISTS phone_normalized VARCHAR(20) "
+        f"GENERATED ALWAYS AS ({PHONE_NORMALIZED_SQL}) STORED"
+    )
+
+    with op.get_context().autocommit_block():
+        for name, column in TRGM_INDEXES:
+            op.create_index(
+                name, "customers", [column],
+                if_not_exists=True,
+                postgresql_concurrently=True,
+                postgresql_using="gin",
+                postgresql_ops={column: "gin_trgm_ops"}
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, column in TRGM_INDEXES:
+            op.drop_index(name, table_name="customers", if_exists=True, postgresql_concurrently=True)
+    op.drop_column("customers", "phone_normalized")
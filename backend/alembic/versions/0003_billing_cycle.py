@@ -0,0 +1,36 @@
+"""billing cycle: active customers by billing_day
+
+Revision ID: 0003_billing_cycle
+Revises: 0002_customer_search
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_billing_cycle'
+down_revision = '0002_customer_search'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The billing_runs checkpoint table is created by create_all on startup
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_customers_active_billing_day", "customers", ["billing_day"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("status = 'active'")
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_customers_active_billing_day", table_name="customers",
+            if_exists=True,
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,35 @@
+"""payment import: bank transfers by reference number
+
+Revision ID: 0004_payment_reference
+Revises: 0003_billing_cycle
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_payment_reference'
+down_revision = '0003_billing_cycle'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_payments_reference_number", "payments", ["reference_number"],
+            if_not_exists=True,
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("reference_number IS NOT NULL")
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_payments_reference_number", table_name="payments",
+            if_exists=True,
+            postgresql_concurrently=True
+        )
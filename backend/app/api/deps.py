@@ -1,11 +1,14 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional, Tuple, Union
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
 
 from app.core.config import settings
-from app.core.database import SessionLocal
+from app.core.database import SessionLocal, AsyncSessionLocal
+from app.core.principal import Principal, cache_principal, get_cached_principal
 from app.models.user import User
 from app.schemas.user import TokenPayload
 
@@ -27,29 +30,25 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
+async def get_async_db() -> AsyncGenerator:
     """
-    Get current authenticated user from JWT token
-    
-    Args:
-        db: Database session
-        token: JWT access token
-        
-    Returns:
-        User: Current authenticated user
-        
-    Raises:
-        HTTPException: If token is invalid or user not found
+    Async database dependency for async def endpoints
+    Yields an AsyncSession and closes it after request
     """
-    credentials_exception = HTTPException(
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _decode_token(token: str) -> Tuple[int, dict]:
+    """Decode a JWT access token into the user ID and its claims"""
     try:
         payload = jwt.decode(
             token,
@@ -59,16 +58,17 @@ def get_current_user(
         token_data = TokenPayload(**payload)
         
         if token_data.sub is None:
-            raise credentials_exception
+            raise _credentials_exception()
+        
+        return int(token_data.sub), payload
             
-    except JWTError:
-        raise credentials_exception
-    
-    # Get user from database
-    user = db.query(User).filter(User.id == int(token_data.sub)).first()
-    
+    except (JWTError, ValueError):
+        raise _credentials_exception()
+
+
+def _check_user(user: Optional[Union[User, Principal]]) -> Union[User, Principal]:
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
@@ -79,17 +79,98 @@ def get_current_user(
     return user
 
 
-def get_current_active_user(
-    current_user: User = Depends(get_current_user)
+def _principal_without_db(user_id: int, claims: dict) -> Optional[Principal]:
+    """Principal from token claims (AUTH_TOKEN_CLAIMS mode) or the principal cache"""
+    if settings.AUTH_TOKEN_CLAIMS:
+        principal = Principal.from_claims(user_id, claims)
+        if principal is not None:
+            return principal
+    return get_cached_principal(user_id)
+
+
+def get_current_principal(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Get the authenticated principal (id, role, active/superuser flags)
+    
+    Served from the token claims or the principal cache; the users table
+    is only queried on a cache miss.
+    """
+    user_id, claims = _decode_token(token)
+    
+    principal = _principal_without_db(user_id, claims)
+    if principal is None:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is not None:
+            principal = Principal.from_user(user)
+            cache_principal(principal)
+    
+    return _check_user(principal)
+
+
+async def get_current_principal_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> Principal:
+    """
+    Async variant of get_current_principal for async def endpoints
+    
+    Keeps the whole request on the event loop instead of running the
+    dependency in the threadpool.
+    """
+    user_id, claims = _decode_token(token)
+    
+    principal = _principal_without_db(user_id, claims)
+    if principal is None:
+        user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
+        if user is not None:
+            principal = Principal.from_user(user)
+            cache_principal(principal)
+    
+    return _check_user(principal)
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
 ) -> User:
+    """
+    Get current authenticated user row from JWT token
+    
+    Always loads the users row; use it only where the full User object is
+    needed (own profile). Authorization checks use get_current_principal.
+    
+    Args:
+        db: Database session
+        token: JWT access token
+        
+    Returns:
+        User: Current authenticated user
+        
+    Raises:
+        HTTPException: If token is invalid or user not found
+    """
+    user_id, _ = _decode_token(token)
+    
+    # Get user from database
+    user = db.query(User).filter(User.id == user_id).first()
+    
+    return _check_user(user)
+
+
+def get_current_active_user(
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     """
     Get current active user
     
     Args:
-        current_user: Current user from token
+        current_user: Current principal from token
         
     Returns:
-        User: Active user
+        Principal: Active user
         
     Raises:
         HTTPException: If user is not active
@@ -102,17 +183,31 @@ def get_current_active_user(
     return current_user
 
 
+async def get_current_active_user_async(
+    current_user: Principal = Depends(get_current_principal_async)
+) -> Principal:
+    """
+    Get current active user (async endpoints)
+    """
+    if not current_user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Inactive user"
+        )
+    return current_user
+
+
 def get_current_superuser(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     """
     Get current superuser (admin only)
     
     Args:
-        current_user: Current user from token
+        current_user: Current principal from token
         
     Returns:
-        User: Superuser
+        Principal: Superuser
         
     Raises:
         HTTPException: If user is not superuser
@@ -126,16 +221,16 @@ def get_current_superuser(
 
 
 def get_current_admin_or_staff(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: Principal = Depends(get_current_principal)
+) -> Principal:
     """
     Get current user if admin or staff
     
     Args:
-        current_user: Current user from token
+        current_user: Current principal from token
         
     Returns:
-        User: Admin or staff user
+        Principal: Admin or staff user
         
     Raises:
         HTTPException: If user is not admin or staff
@@ -6,7 +6,8 @@ from app.api.v1.endpoints import (
     packages,
     invoices,
     payments,
-    dashboard
+    dashboard,
+    jobs
 )
 
 # Create main API router
@@ -48,3 +49,9 @@ api_router.include_router(
     prefix="/dashboard",
     tags=["Dashboard"]
 )
+
+api_router.include_router(
+    jobs.router,
+    prefix="/jobs",
+    tags=["Jobs"]
+)
@@ -2,20 +2,20 @@ from datetime import timedelta, datetime
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.api.deps import (
     get_db,
+    get_async_db,
     get_current_user,
-    get_current_active_user,
     get_current_superuser
 )
 from app.core.config import settings
-from app.core.security import (
-    create_access_token,
-    verify_password,
-    get_password_hash
-)
+from app.core import hashing
+from app.core.security import create_access_token
+from app.core.principal import Principal, cache_principal, invalidate_principal
 from app.models.user import User
 from app.schemas.user import (
     Token,
@@ -29,8 +29,8 @@ router = APIRouter()
 
 
 @router.post("/login", response_model=Token)
-def login(
-    db: Session = Depends(get_db),
+async def login(
+    db: AsyncSession = Depends(get_async_db),
     form_data: OAuth2PasswordRequestForm = Depends()
 ) -> Any:
     """
@@ -39,9 +39,9 @@ def login(
     Use username and password to get JWT token
     """
     # Try to find user by username or email
-    user = db.query(User).filter(
+    user = (await db.scalars(select(User).where(
         (User.username == form_data.username) | (User.email == form_data.username)
-    ).first()
+    ).limit(1))).first()
     
     if not user:
         raise HTTPException(
@@ -49,7 +49,9 @@ def login(
             detail="Incorrect username or password"
         )
     
-    if not verify_password(form_data.password, user.hashed_password):
+    # bcrypt runs in the hashing pool, not on the event loop
+    valid, new_hash = await hashing.verify_password_async(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -61,15 +63,22 @@ def login(
             detail="Inactive user"
         )
     
+    # Upgrade hashes made with an old scheme or a lower bcrypt cost
+    if new_hash:
+        user.hashed_password = new_hash
+    
     # Update last login
     user.last_login = datetime.utcnow()
-    db.commit()
+    await db.commit()
     
     # Create access token
+    principal = Principal.from_user(user)
+    cache_principal(principal)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         subject=str(user.id),
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        claims=principal.to_claims() if settings.AUTH_TOKEN_CLAIMS else None
     )
     
     return {
@@ -83,7 +92,7 @@ def register(
     *,
     db: Session = Depends(get_db),
     user_in: UserCreate,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Create new user (Admin only)
@@ -112,7 +121,7 @@ def register(
         full_name=user_in.full_name,
         phone=user_in.phone,
         role=user_in.role,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=hashing.hash_password(user_in.password),
         is_superuser=user_in.is_superuser,
         is_active=True
     )
@@ -126,7 +135,7 @@ def register(
 
 @router.get("/me", response_model=UserSchema)
 def read_user_me(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get current user profile
@@ -139,7 +148,7 @@ def update_user_me(
     *,
     db: Session = Depends(get_db),
     user_in: UserUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Update current user profile
@@ -167,13 +176,14 @@ def update_user_me(
     
     # Hash password if provided
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data["password"])
+        update_data["hashed_password"] = hashing.hash_password(update_data["password"])
         del update_data["password"]
     
     for field, value in update_data.items():
         setattr(current_user, field, value)
     
     db.commit()
+    invalidate_principal(current_user.id)
     db.refresh(current_user)
     
     return current_user
@@ -184,7 +194,7 @@ def read_users(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Retrieve users list (Admin only)
@@ -197,7 +207,7 @@ def read_users(
 def read_user_by_id(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Get user by ID (Admin only)
@@ -217,7 +227,7 @@ def update_user(
     db: Session = Depends(get_db),
     user_id: int,
     user_in: UserUpdate,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Update user (Admin only)
@@ -252,13 +262,14 @@ def update_user(
     
     # Hash password if provided
     if "password" in update_data:
-        update_data["hashed_password"] = get_password_hash(update_data["password"])
+        update_data["hashed_password"] = hashing.hash_password(update_data["password"])
         del update_data["password"]
     
     for field, value in update_data.items():
         setattr(user, field, value)
     
     db.commit()
+    invalidate_principal(user.id)
     db.refresh(user)
     
     return user
@@ -269,7 +280,7 @@ def delete_user(
     *,
     db: Session = Depends(get_db),
     user_id: int,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> None:
     """
     Delete user (Admin only)
@@ -290,5 +301,6 @@ def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_principal(user_id)
     
     return None
@@ -1,89 +1,130 @@
-from typing import Any
-from fastapi import APIRouter, Depends
+from typing import Any, List
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 
 from app.api.deps import get_db, get_current_active_user
-from app.models.user import User
+from app.core import cache
+from app.core.config import settings
+from app.core.principal import Principal
 from app.models.customer import Customer
 from app.models.package import Package
 from app.models.invoice import Invoice
 from app.models.payment import Payment
+from app.models.rollup import (
+    InvoiceStatusRollup,
+    RevenueMonthlyRollup,
+    CustomerStatusRollup,
+    CustomerMonthlyRollup,
+    PaymentMonthlyRollup
+)
 
 router = APIRouter()
 
 
 @router.get("/stats", response_model=dict)
+@cache.cached(cache.DASHBOARD_STATS, ttl=settings.CACHE_TTL_DASHBOARD_STATS)
 def get_dashboard_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get overall dashboard statistics
+    
+    Served from the rollup tables: one conditional-aggregation query per
+    rollup (customers, invoices, payments), independent of history size.
     """
+    first_day_of_month = date.today().replace(day=1)
+    last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
+    
     # Customer stats
-    total_customers = db.query(Customer).count()
-    active_customers = db.query(Customer).filter(Customer.status == "active").count()
-    suspended_customers = db.query(Customer).filter(Customer.status == "suspended").count()
+    new_this_month = select(
+        func.coalesce(func.sum(CustomerMonthlyRollup.new_customers), 0)
+    ).where(
+        CustomerMonthlyRollup.month == first_day_of_month
+    ).scalar_subquery()
+    customer_stats = db.query(
+        func.coalesce(func.sum(CustomerStatusRollup.customer_count), 0).label("total"),
+        func.coalesce(func.sum(CustomerStatusRollup.customer_count).filter(
+            CustomerStatusRollup.status == "active"
+        ), 0).label("active"),
+        func.coalesce(func.sum(CustomerStatusRollup.customer_count).filter(
+            CustomerStatusRollup.status == "suspended"
+        ), 0).label("suspended"),
+        new_this_month.label("new_this_month")
+    ).one()
     
-    # Invoice stats
-    total_invoices = db.query(Invoice).count()
-    pending_invoices = db.query(Invoice).filter(Invoice.status == "pending").count()
-    paid_invoices = db.query(Invoice).filter(Invoice.status == "paid").count()
-    overdue_invoices = db.query(Invoice).filter(Invoice.status == "overdue").count()
+    # Invoice and revenue stats
+    def month_revenue(month: date):
+        return select(
+            func.coalesce(func.sum(RevenueMonthlyRollup.revenue), 0)
+        ).where(RevenueMonthlyRollup.month == month).scalar_subquery()
     
-    # Payment stats
-    total_payments = db.query(Payment).count()
-    pending_payments = db.query(Payment).filter(Payment.status == "pending").count()
-    verified_payments = db.query(Payment).filter(Payment.status == "verified").count()
+    def invoice_count(*statuses: str):
+        return func.coalesce(func.sum(InvoiceStatusRollup.invoice_count).filter(
+            InvoiceStatusRollup.status.in_(statuses)
+        ), 0)
     
-    # Revenue stats
-    total_revenue = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status == "paid"
-    ).scalar() or 0
+    def invoice_amount(*statuses: str):
+        return func.coalesce(func.sum(InvoiceStatusRollup.total_amount).filter(
+            InvoiceStatusRollup.status.in_(statuses)
+        ), 0)
     
-    pending_revenue = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status.in_(["pending", "partial", "overdue"])
-    ).scalar() or 0
+    invoice_stats = db.query(
+        func.coalesce(func.sum(InvoiceStatusRollup.invoice_count), 0).label("total"),
+        invoice_count("pending").label("pending"),
+        invoice_count("paid").label("paid"),
+        invoice_count("overdue").label("overdue"),
+        invoice_amount("paid").label("total_revenue"),
+        invoice_amount("pending", "partial", "overdue").label("pending_revenue"),
+        month_revenue(first_day_of_month).label("this_month_revenue"),
+        month_revenue(last_month_first_day).label("last_month_revenue")
+    ).one()
     
-    # This month revenue
-    first_day_of_month = date.today().replace(day=1)
-    this_month_revenue = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status == "paid",
-        Invoice.paid_at >= first_day_of_month
-    ).scalar() or 0
+    # Payment stats
+    payment_stats = db.query(
+        func.coalesce(func.sum(PaymentMonthlyRollup.payment_count), 0).label("total"),
+        func.coalesce(func.sum(PaymentMonthlyRollup.payment_count).filter(
+            PaymentMonthlyRollup.status == "pending"
+        ), 0).label("pending"),
+        func.coalesce(func.sum(PaymentMonthlyRollup.payment_count).filter(
+            PaymentMonthlyRollup.status == "verified"
+        ), 0).label("verified")
+    ).one()
     
-    # Last month revenue
-    last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
-    last_month_revenue = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status == "paid",
-        Invoice.paid_at >= last_month_first_day,
-        Invoice.paid_at < first_day_of_month
-    ).scalar() or 0
+    # Growth rate: customers added this month relative to the base at the start of the month
+    total_start_of_month = customer_stats.total - customer_stats.new_this_month
+    growth_rate = round(
+        (customer_stats.new_this_month / total_start_of_month * 100)
+        if total_start_of_month > 0 else 0, 2
+    )
+    
+    this_month_revenue = invoice_stats.this_month_revenue
+    last_month_revenue = invoice_stats.last_month_revenue
     
     return {
         "customers": {
-            "total": total_customers,
-            "active": active_customers,
-            "suspended": suspended_customers,
-            "growth_rate": 0  # TODO: Calculate growth rate
+            "total": int(customer_stats.total),
+            "active": int(customer_stats.active),
+            "suspended": int(customer_stats.suspended),
+            "growth_rate": growth_rate
         },
         "invoices": {
-            "total": total_invoices,
-            "pending": pending_invoices,
-            "paid": paid_invoices,
-            "overdue": overdue_invoices
+            "total": int(invoice_stats.total),
+            "pending": int(invoice_stats.pending),
+            "paid": int(invoice_stats.paid),
+            "overdue": int(invoice_stats.overdue)
         },
         "payments": {
-            "total": total_payments,
-            "pending": pending_payments,
-            "verified": verified_payments
+            "total": int(payment_stats.total),
+            "pending": int(payment_stats.pending),
+            "verified": int(payment_stats.verified)
         },
         "revenue": {
-            "total": float(total_revenue),
-            "pending": float(pending_revenue),
+            "total": float(invoice_stats.total_revenue),
+            "pending": float(invoice_stats.pending_revenue),
             "this_month": float(this_month_revenue),
             "last_month": float(last_month_revenue),
             "growth_percentage": round(
@@ -94,84 +135,114 @@ def get_dashboard_stats(
     }
 
 
+def _month_starts(months: int) -> List[date]:
+    """First day of each of the last N months, oldest first"""
+    current_month = date.today().replace(day=1)
+    return [current_month - relativedelta(months=i) for i in range(months - 1, -1, -1)]
+
+
+def _month_key(value) -> str:
+    """YYYY-MM key for a date_trunc('month', ...) result"""
+    return value.strftime("%Y-%m")
+
+
 @router.get("/revenue-chart", response_model=dict)
+@cache.cached(cache.DASHBOARD_REVENUE_CHART, ttl=settings.CACHE_TTL_REVENUE_CHART)
 def get_revenue_chart(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-    months: int = 12
+    current_user: Principal = Depends(get_current_active_user),
+    months: int = Query(12, ge=1, le=settings.DASHBOARD_MAX_CHART_MONTHS)
 ) -> Any:
     """
     Get revenue chart data for last N months
     """
-    today = date.today()
-    chart_data = []
+    month_starts = _month_starts(months)
+    range_end = month_starts[-1] + relativedelta(months=1)
+    
+    rows = db.query(RevenueMonthlyRollup).filter(
+        RevenueMonthlyRollup.month >= month_starts[0],
+        RevenueMonthlyRollup.month < range_end
+    ).all()
     
-    for i in range(months - 1, -1, -1):
-        month_date = today - relativedelta(months=i)
-        first_day = month_date.replace(day=1)
-        last_day = (first_day + relativedelta(months=1)) - timedelta(days=1)
-        
-        # Get revenue for this month
-        revenue = db.query(func.sum(Invoice.total_amount)).filter(
-            Invoice.status == "paid",
-            Invoice.paid_at >= first_day,
-            Invoice.paid_at <= last_day
-        ).scalar() or 0
-        
-        # Get invoice count for this month
-        invoice_count = db.query(func.count(Invoice.id)).filter(
-            Invoice.status == "paid",
-            Invoice.paid_at >= first_day,
-            Invoice.paid_at <= last_day
-        ).scalar() or 0
-        
+    by_month = {_month_key(row.month): row for row in rows}
+    
+    chart_data = []
+    for first_day in month_starts:
+        row = by_month.get(first_day.strftime("%Y-%m"))
         chart_data.append({
             "month": first_day.strftime("%Y-%m"),
             "month_name": first_day.strftime("%B %Y"),
-            "revenue": float(revenue),
-            "invoice_count": invoice_count
+            "revenue": float(row.revenue or 0) if row else 0.0,
+            "invoice_count": row.invoice_count if row else 0
         })
     
+    total_revenue = sum(item["revenue"] for item in chart_data)
     return {
         "data": chart_data,
-        "total_revenue": sum(item["revenue"] for item in chart_data),
-        "average_revenue": sum(item["revenue"] for item in chart_data) / months if months > 0 else 0
+        "total_revenue": total_revenue,
+        "average_revenue": total_revenue / months
     }
 
 
 @router.get("/customer-growth", response_model=dict)
+@cache.cached(cache.DASHBOARD_CUSTOMER_GROWTH, ttl=settings.CACHE_TTL_CUSTOMER_GROWTH)
 def get_customer_growth(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
-    months: int = 12
+    current_user: Principal = Depends(get_current_active_user),
+    months: int = Query(12, ge=1, le=settings.DASHBOARD_MAX_CHART_MONTHS)
 ) -> Any:
     """
     Get customer growth chart data for last N months
     """
-    today = date.today()
-    chart_data = []
+    month_starts = _month_starts(months)
+    range_end = month_starts[-1] + relativedelta(months=1)
+    
+    # New and churned customers per month with running totals over the
+    # whole history, one row per month that has movements
+    monthly = db.query(
+        CustomerMonthlyRollup.month.label("month"),
+        func.sum(CustomerMonthlyRollup.new_customers).label("new_customers"),
+        func.sum(CustomerMonthlyRollup.churned_customers).label("churned_customers")
+    ).filter(
+        CustomerMonthlyRollup.month < range_end
+    ).group_by(CustomerMonthlyRollup.month).subquery()
     
-    for i in range(months - 1, -1, -1):
-        month_date = today - relativedelta(months=i)
-        first_day = month_date.replace(day=1)
-        last_day = (first_day + relativedelta(months=1)) - timedelta(days=1)
-        
-        # Get new customers this month
-        new_customers = db.query(func.count(Customer.id)).filter(
-            Customer.created_at >= first_day,
-            Customer.created_at <= last_day
-        ).scalar() or 0
-        
-        # Get total customers up to end of this month
-        total_customers = db.query(func.count(Customer.id)).filter(
-            Customer.created_at <= last_day
-        ).scalar() or 0
-        
+    rows = db.query(
+        monthly.c.month,
+        monthly.c.new_customers,
+        monthly.c.churned_customers,
+        func.sum(monthly.c.new_customers).over(order_by=monthly.c.month).label("total_customers"),
+        func.sum(
+            monthly.c.new_customers - monthly.c.churned_customers
+        ).over(order_by=monthly.c.month).label("active_customers")
+    ).order_by(monthly.c.month).all()
+    
+    # Running total carried into the window from months before it
+    window_start = month_starts[0].strftime("%Y-%m")
+    total_customers = 0
+    active_customers = 0
+    by_month = {}
+    for row in rows:
+        key = _month_key(row.month)
+        if key < window_start:
+            total_customers = row.total_customers
+            active_customers = row.active_customers
+        else:
+            by_month[key] = row
+    
+    chart_data = []
+    for first_day in month_starts:
+        row = by_month.get(first_day.strftime("%Y-%m"))
+        if row:
+            total_customers = row.total_customers
+            active_customers = row.active_customers
         chart_data.append({
             "month": first_day.strftime("%Y-%m"),
             "month_name": first_day.strftime("%B %Y"),
-            "new_customers": new_customers,
-            "total_customers": total_customers
+            "new_customers": int(row.new_customers) if row else 0,
+            "churned_customers": int(row.churned_customers) if row else 0,
+            "total_customers": int(total_customers),
+            "active_customers": int(active_customers)
         })
     
     return {
@@ -180,24 +251,26 @@ def get_customer_growth(
 
 
 @router.get("/package-distribution", response_model=dict)
+@cache.cached(cache.DASHBOARD_PACKAGE_DISTRIBUTION, ttl=settings.CACHE_TTL_PACKAGE_DISTRIBUTION)
 def get_package_distribution(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get customer distribution by package
     """
-    # Get packages with customer count
+    # Get packages with active customer count
     packages = db.query(
         Package.id,
         Package.name,
         Package.code,
-        func.count(Customer.id).label('customer_count')
-    ).outerjoin(
-        Customer, Package.id == Customer.package_id
+        CustomerStatusRollup.customer_count
+    ).join(
+        CustomerStatusRollup, Package.id == CustomerStatusRollup.package_id
     ).filter(
-        Customer.status == "active"
-    ).group_by(Package.id).all()
+        CustomerStatusRollup.status == "active",
+        CustomerStatusRollup.customer_count > 0
+    ).order_by(Package.id).all()
     
     total_customers = sum(p.customer_count for p in packages)
     
@@ -220,7 +293,7 @@ def get_package_distribution(
 @router.get("/recent-activities", response_model=dict)
 def get_recent_activities(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
     limit: int = 10
 ) -> Any:
     """
@@ -275,9 +348,10 @@ def get_recent_activities(
 
 
 @router.get("/overdue-summary", response_model=dict)
+@cache.cached(cache.DASHBOARD_OVERDUE_SUMMARY, ttl=settings.CACHE_TTL_OVERDUE_SUMMARY)
 def get_overdue_summary(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get summary of overdue invoices
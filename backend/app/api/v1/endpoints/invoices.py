@@ -1,22 +1,30 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import date
 
-from app.api.deps import get_db, get_current_active_user
-from app.models.user import User
+from app.api.deps import get_db, get_async_db, get_current_active_user, get_current_active_user_async
+from app.core import pagination
+from app.core.principal import Principal
 from app.schemas import invoice as invoice_schema
-from app.services.invoice import InvoiceService
+from app.schemas import job as job_schema
+from app.services.invoice import InvoiceService, AsyncInvoiceService
+from app.services.export import ExportService, INVOICE_COLUMNS, invoices_export_statement
+from app.services.invoice_pdf import InvoicePdfService
+from app.services.job import JobService
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[invoice_schema.InvoiceInList])
-def get_invoices(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+@router.get("/", response_model=Union[List[invoice_schema.InvoiceInList], invoice_schema.InvoicePage])
+async def get_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=pagination.CURSOR_DESCRIPTION),
     customer_id: Optional[int] = Query(None, description="Filter by customer ID"),
     status: Optional[str] = Query(None, description="Filter by status: pending, paid, partial, overdue, cancelled"),
     month: Optional[str] = Query(None, description="Filter by billing month (YYYY-MM)")
@@ -24,7 +32,17 @@ def get_invoices(
     """
     Get invoices list with filters
     """
-    invoices = InvoiceService.get_invoices(
+    if cursor is not None:
+        return await AsyncInvoiceService.get_invoices_page(
+            db=db,
+            cursor=cursor,
+            limit=limit,
+            customer_id=customer_id,
+            status=status,
+            month=month
+        )
+    
+    invoices = await AsyncInvoiceService.get_invoices(
         db=db,
         skip=skip,
         limit=limit,
@@ -38,60 +56,98 @@ def get_invoices(
 @router.get("/count", response_model=dict)
 def get_invoices_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get invoices count by status
     """
-    from app.models.invoice import Invoice
+    from app.models.rollup import InvoiceStatusRollup
+    from sqlalchemy import func
     
-    total = db.query(Invoice).count()
-    pending = db.query(Invoice).filter(Invoice.status == "pending").count()
-    paid = db.query(Invoice).filter(Invoice.status == "paid").count()
-    partial = db.query(Invoice).filter(Invoice.status == "partial").count()
-    overdue = db.query(Invoice).filter(Invoice.status == "overdue").count()
-    cancelled = db.query(Invoice).filter(Invoice.status == "cancelled").count()
+    rows = db.query(
+        InvoiceStatusRollup.status,
+        func.sum(InvoiceStatusRollup.invoice_count).label("count"),
+        func.sum(InvoiceStatusRollup.total_amount).label("amount")
+    ).group_by(InvoiceStatusRollup.status).all()
     
-    # Calculate total amounts
-    from sqlalchemy import func
-    total_amount = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status.in_(["pending", "partial", "overdue"])
-    ).scalar() or 0
+    counts = {row.status: int(row.count or 0) for row in rows}
+    amounts = {row.status: row.amount or 0 for row in rows}
     
-    paid_amount = db.query(func.sum(Invoice.total_amount)).filter(
-        Invoice.status == "paid"
-    ).scalar() or 0
+    # Calculate total amounts
+    total_amount = sum(amounts.get(s, 0) for s in ("pending", "partial", "overdue"))
+    paid_amount = amounts.get("paid", 0)
     
     return {
-        "total": total,
-        "pending": pending,
-        "paid": paid,
-        "partial": partial,
-        "overdue": overdue,
-        "cancelled": cancelled,
+        "total": sum(counts.values()),
+        "pending": counts.get("pending", 0),
+        "paid": counts.get("paid", 0),
+        "partial": counts.get("partial", 0),
+        "overdue": counts.get("overdue", 0),
+        "cancelled": counts.get("cancelled", 0),
         "total_outstanding": float(total_amount),
         "total_paid": float(paid_amount)
     }
 
 
-@router.get("/overdue", response_model=List[invoice_schema.InvoiceInList])
-def get_overdue_invoices(
+@router.get("/export")
+def export_invoices(
+    current_user: Principal = Depends(get_current_active_user),
+    file_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$", description="Export format: csv or xlsx"),
+    customer_id: Optional[int] = Query(None, description="Filter by customer ID"),
+    status: Optional[str] = Query(None, description="Filter by status: pending, paid, partial, overdue, cancelled"),
+    month: Optional[str] = Query(None, description="Filter by billing month (YYYY-MM)")
+) -> Any:
+    """
+    Export invoices matching the list filters as CSV or XLSX (streamed)
+    """
+    stmt = invoices_export_statement(customer_id=customer_id, status=status, month=month)
+    return ExportService.response(stmt, INVOICE_COLUMNS, "invoices", file_format)
+
+
+@router.get("/pdf")
+def download_period_pdfs(
+    current_user: Principal = Depends(get_current_active_user),
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="Billing month (YYYY-MM)")
+) -> Any:
+    """
+    Download the PDFs of all invoices of a billing month as a ZIP (streamed)
+    """
+    return StreamingResponse(
+        InvoicePdfService.iter_period_zip(month),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="invoices-{month}.zip"'}
+    )
+
+
+@router.post("/pdf/render", response_model=job_schema.Job, status_code=status.HTTP_202_ACCEPTED)
+def render_period_pdfs(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    current_user: Principal = Depends(get_current_active_user),
+    month: str = Query(..., pattern=r"^\d{4}-\d{2}$", description="Billing month (YYYY-MM)")
+) -> Any:
+    """
+    Pre-render the PDFs of a billing month into the PDF cache
+    
+    Runs as a background job; poll GET /jobs/{id} for progress and results.
+    """
+    return JobService.submit_job(db, "pdf_render", {"billing_period": month}, created_by=current_user.id)
+
+
+@router.get("/overdue", response_model=Union[List[invoice_schema.InvoiceInList], invoice_schema.InvoicePage])
+async def get_overdue_invoices(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async),
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=pagination.CURSOR_DESCRIPTION)
 ) -> Any:
     """
-    Get overdue invoices
+    Get overdue invoices, oldest due date first
     """
-    from app.models.invoice import Invoice
-    
-    invoices = db.query(Invoice).filter(
-        Invoice.status.in_(["pending", "partial"]),
-        Invoice.due_date < date.today()
-    ).order_by(Invoice.due_date.asc()).offset(skip).limit(limit).all()
+    if cursor is not None:
+        return await AsyncInvoiceService.get_overdue_invoices_page(db, cursor=cursor, limit=limit)
     
-    return invoices
+    return await AsyncInvoiceService.get_overdue_invoices(db, skip=skip, limit=limit)
 
 
 @router.post("/", response_model=invoice_schema.Invoice, status_code=status.HTTP_201_CREATED)
@@ -99,7 +155,7 @@ def create_invoice(
     *,
     db: Session = Depends(get_db),
     invoice_in: invoice_schema.InvoiceCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Create new invoice manually
@@ -113,7 +169,7 @@ def generate_invoice(
     *,
     db: Session = Depends(get_db),
     invoice_gen: invoice_schema.InvoiceGenerate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Generate monthly invoice for a customer
@@ -126,85 +182,73 @@ def generate_invoice(
     return invoice
 
 
-@router.post("/generate-batch", response_model=dict)
+@router.post("/generate-batch", response_model=job_schema.Job, status_code=status.HTTP_202_ACCEPTED)
 def generate_batch_invoices(
     *,
     db: Session = Depends(get_db),
     billing_month: date,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Generate invoices for all active customers for a specific month
-    """
-    from app.models.customer import Customer
-    
-    # Get all active customers
-    customers = db.query(Customer).filter(
-        Customer.status == "active",
-        Customer.package_id.isnot(None)
-    ).all()
-    
-    success_count = 0
-    error_count = 0
-    errors = []
-    
-    for customer in customers:
-        try:
-            InvoiceService.generate_monthly_invoice(
-                db=db,
-                customer_id=customer.id,
-                billing_month=billing_month
-            )
-            success_count += 1
-        except Exception as e:
-            error_count += 1
-            errors.append({
-                "customer_id": customer.id,
-                "customer_name": customer.full_name,
-                "error": str(e)
-            })
     
-    return {
-        "total_customers": len(customers),
-        "success": success_count,
-        "errors": error_count,
-        "error_details": errors
-    }
+    Runs as a background job; poll GET /jobs/{id} for progress and results.
+    """
+    return JobService.submit_job(
+        db, "invoice_batch", {"billing_month": billing_month}, created_by=current_user.id
+    )
 
 
 @router.get("/{invoice_id}", response_model=invoice_schema.Invoice)
-def get_invoice(
+async def get_invoice(
     invoice_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async)
 ) -> Any:
     """
     Get invoice by ID
     """
-    invoice = InvoiceService.get_invoice_by_id(db, invoice_id)
+    invoice = await AsyncInvoiceService.get_invoice_by_id(db, invoice_id)
     return invoice
 
 
 @router.get("/number/{invoice_number}", response_model=invoice_schema.Invoice)
-def get_invoice_by_number(
+async def get_invoice_by_number(
     invoice_number: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async)
 ) -> Any:
     """
     Get invoice by invoice number
     """
-    invoice = InvoiceService.get_invoice_by_number(db, invoice_number)
+    invoice = await AsyncInvoiceService.get_invoice_by_number(db, invoice_number)
     return invoice
 
 
+@router.get("/{invoice_id}/pdf")
+def get_invoice_pdf(
+    invoice_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Get invoice as PDF
+    """
+    invoice_number, pdf = InvoicePdfService.get_invoice_pdf(db, invoice_id)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{invoice_number}.pdf"'}
+    )
+
+
 @router.put("/{invoice_id}", response_model=invoice_schema.Invoice)
 def update_invoice(
     *,
     db: Session = Depends(get_db),
     invoice_id: int,
     invoice_in: invoice_schema.InvoiceUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Update invoice
@@ -218,7 +262,7 @@ def cancel_invoice(
     *,
     db: Session = Depends(get_db),
     invoice_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Cancel invoice
@@ -232,7 +276,7 @@ def mark_invoice_as_paid(
     *,
     db: Session = Depends(get_db),
     invoice_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Mark invoice as paid
@@ -241,18 +285,18 @@ def mark_invoice_as_paid(
     return invoice
 
 
-@router.post("/check-overdue", response_model=dict)
+@router.post("/check-overdue", response_model=job_schema.Job, status_code=status.HTTP_202_ACCEPTED)
 def check_overdue_invoices(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user),
+    include_ids: bool = Query(False, description="Also list the ids of the invoices marked overdue in the job result")
 ) -> Any:
     """
     Check and update overdue invoices
-    """
-    overdue_invoices = InvoiceService.check_overdue_invoices(db)
     
-    return {
-        "message": "Overdue invoices checked and updated",
-        "overdue_count": len(overdue_invoices),
-        "invoice_ids": [inv.id for inv in overdue_invoices]
-    }
+    Runs as a background job; poll GET /jobs/{id} for the result (counts,
+    sweep id and, with include_ids, the invoice ids).
+    """
+    return JobService.submit_job(
+        db, "overdue_sweep", {"include_ids": include_ids}, created_by=current_user.id
+    )
@@ -0,0 +1,83 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, status, Query
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db, get_current_active_user
+from app.core.principal import Principal
+from app.schemas import job as job_schema
+from app.services.job import JobService
+
+router = APIRouter()
+
+
+@router.post("/", response_model=job_schema.Job, status_code=status.HTTP_202_ACCEPTED)
+def submit_job(
+    *,
+    db: Session = Depends(get_db),
+    job_in: job_schema.JobCreate,
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Submit a background job
+    
+    - invoice_batch: params {"billing_month": "YYYY-MM-DD"}
+    - overdue_sweep: no params
+    - billing_cycle: params {"run_date": "YYYY-MM-DD"} (customers billed on that day)
+    - pdf_render: params {"billing_period": "YYYY-MM"} (invoice PDFs into the cache)
+    
+    Submitting the same job while it is queued or running returns that job.
+    """
+    return JobService.submit_job(db, job_in.job_type, job_in.params, created_by=current_user.id)
+
+
+@router.get("/", response_model=List[job_schema.JobInList])
+def get_jobs(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    job_type: Optional[str] = Query(None, description="Filter by type: invoice_batch, overdue_sweep, billing_cycle, pdf_render"),
+    status: Optional[str] = Query(None, description="Filter by status: queued, running, succeeded, failed, cancelled")
+) -> Any:
+    """
+    Get background jobs, newest first
+    """
+    return JobService.get_jobs(db, skip=skip, limit=limit, job_type=job_type, status=status)
+
+
+@router.get("/{job_id}", response_model=job_schema.Job)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Get job by ID (poll for progress)
+    """
+    return JobService.get_job_by_id(db, job_id)
+
+
+@router.post("/{job_id}/cancel", response_model=job_schema.Job)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Cancel a queued or running job
+    """
+    return JobService.cancel_job(db, job_id)
+
+
+@router.post("/{job_id}/resume", response_model=job_schema.Job)
+def resume_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Resume a failed job or one whose worker stopped
+    
+    Work committed by the earlier attempt is kept and not repeated.
+    """
+    return JobService.resume_job(db, job_id)
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, get_current_active_user, get_current_superuser
-from app.models.user import User
+from app.core.principal import Principal
 from app.schemas import package as package_schema
 from app.services.package import PackageService
 
@@ -34,7 +34,7 @@ def get_packages(
 @router.get("/count", response_model=dict)
 def get_packages_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get packages count by type and status
@@ -87,7 +87,7 @@ def create_package(
     *,
     db: Session = Depends(get_db),
     package_in: package_schema.PackageCreate,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Create new package (Admin only)
@@ -102,7 +102,7 @@ def update_package(
     db: Session = Depends(get_db),
     package_id: int,
     package_in: package_schema.PackageUpdate,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Update package (Admin only)
@@ -116,7 +116,7 @@ def delete_package(
     *,
     db: Session = Depends(get_db),
     package_id: int,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> None:
     """
     Delete package (Admin only)
@@ -131,7 +131,7 @@ def toggle_package_status(
     *,
     db: Session = Depends(get_db),
     package_id: int,
-    current_user: User = Depends(get_current_superuser)
+    current_user: Principal = Depends(get_current_superuser)
 ) -> Any:
     """
     Toggle package active status (Admin only)
@@ -144,7 +144,7 @@ def toggle_package_status(
 def get_package_customers(
     package_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get customers count for a package
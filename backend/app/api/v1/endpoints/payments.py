@@ -1,21 +1,26 @@
-from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from typing import Any, List, Optional, Union
+from fastapi import APIRouter, Depends, File, HTTPException, status, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db, get_current_active_user
-from app.models.user import User
+from app.api.deps import get_db, get_async_db, get_current_active_user, get_current_active_user_async
+from app.core import pagination
+from app.core.principal import Principal
 from app.schemas import payment as payment_schema
-from app.services.payment import PaymentService
+from app.services.payment import PaymentService, AsyncPaymentService
+from app.services.bank_import import BankImportService
+from app.services.export import ExportService, PAYMENT_COLUMNS, payments_export_statement
 
 router = APIRouter()
 
 
-@router.get("/", response_model=List[payment_schema.PaymentInList])
-def get_payments(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+@router.get("/", response_model=Union[List[payment_schema.PaymentInList], payment_schema.PaymentPage])
+async def get_payments(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=pagination.CURSOR_DESCRIPTION),
     customer_id: Optional[int] = Query(None, description="Filter by customer ID"),
     invoice_id: Optional[int] = Query(None, description="Filter by invoice ID"),
     status: Optional[str] = Query(None, description="Filter by status: pending, verified, rejected, cancelled"),
@@ -24,7 +29,18 @@ def get_payments(
     """
     Get payments list with filters
     """
-    payments = PaymentService.get_payments(
+    if cursor is not None:
+        return await AsyncPaymentService.get_payments_page(
+            db=db,
+            cursor=cursor,
+            limit=limit,
+            customer_id=customer_id,
+            invoice_id=invoice_id,
+            status=status,
+            payment_method=payment_method
+        )
+    
+    payments = await AsyncPaymentService.get_payments(
         db=db,
         skip=skip,
         limit=limit,
@@ -39,57 +55,70 @@ def get_payments(
 @router.get("/count", response_model=dict)
 def get_payments_count(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get payments count by status
     """
-    from app.models.payment import Payment
-    
-    total = db.query(Payment).count()
-    pending = db.query(Payment).filter(Payment.status == "pending").count()
-    verified = db.query(Payment).filter(Payment.status == "verified").count()
-    rejected = db.query(Payment).filter(Payment.status == "rejected").count()
-    cancelled = db.query(Payment).filter(Payment.status == "cancelled").count()
-    
-    # Calculate total amounts
+    from app.models.rollup import PaymentMonthlyRollup
     from sqlalchemy import func
-    total_amount = db.query(func.sum(Payment.amount)).filter(
-        Payment.status == "verified"
-    ).scalar() or 0
     
-    pending_amount = db.query(func.sum(Payment.amount)).filter(
-        Payment.status == "pending"
-    ).scalar() or 0
+    rows = db.query(
+        PaymentMonthlyRollup.status,
+        func.sum(PaymentMonthlyRollup.payment_count).label("count"),
+        func.sum(PaymentMonthlyRollup.amount).label("amount")
+    ).group_by(PaymentMonthlyRollup.status).all()
+    
+    counts = {row.status: int(row.count or 0) for row in rows}
+    amounts = {row.status: row.amount or 0 for row in rows}
     
     return {
-        "total": total,
-        "pending": pending,
-        "verified": verified,
-        "rejected": rejected,
-        "cancelled": cancelled,
-        "total_verified_amount": float(total_amount),
-        "pending_amount": float(pending_amount)
+        "total": sum(counts.values()),
+        "pending": counts.get("pending", 0),
+        "verified": counts.get("verified", 0),
+        "rejected": counts.get("rejected", 0),
+        "cancelled": counts.get("cancelled", 0),
+        "total_verified_amount": float(amounts.get("verified", 0)),
+        "pending_amount": float(amounts.get("pending", 0))
     }
 
 
-@router.get("/pending", response_model=List[payment_schema.PaymentInList])
-def get_pending_payments(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+@router.get("/export")
+def export_payments(
+    current_user: Principal = Depends(get_current_active_user),
+    file_format: str = Query("csv", alias="format", pattern="^(csv|xlsx)$", description="Export format: csv or xlsx"),
+    customer_id: Optional[int] = Query(None, description="Filter by customer ID"),
+    invoice_id: Optional[int] = Query(None, description="Filter by invoice ID"),
+    status: Optional[str] = Query(None, description="Filter by status: pending, verified, rejected, cancelled"),
+    payment_method: Optional[str] = Query(None, description="Filter by payment method")
+) -> Any:
+    """
+    Export payments matching the list filters as CSV or XLSX (streamed)
+    """
+    stmt = payments_export_statement(
+        customer_id=customer_id,
+        invoice_id=invoice_id,
+        status=status,
+        payment_method=payment_method
+    )
+    return ExportService.response(stmt, PAYMENT_COLUMNS, "payments", file_format)
+
+
+@router.get("/pending", response_model=Union[List[payment_schema.PaymentInList], payment_schema.PaymentPage])
+async def get_pending_payments(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async),
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=pagination.CURSOR_DESCRIPTION)
 ) -> Any:
     """
     Get pending payments that need verification
     """
-    from app.models.payment import Payment
+    if cursor is not None:
+        return await AsyncPaymentService.get_payments_page(db=db, cursor=cursor, limit=limit, status="pending")
     
-    payments = db.query(Payment).filter(
-        Payment.status == "pending"
-    ).order_by(Payment.created_at.desc()).offset(skip).limit(limit).all()
-    
-    return payments
+    return await AsyncPaymentService.get_payments(db=db, skip=skip, limit=limit, status="pending")
 
 
 @router.post("/", response_model=payment_schema.Payment, status_code=status.HTTP_201_CREATED)
@@ -97,7 +126,7 @@ def create_payment(
     *,
     db: Session = Depends(get_db),
     payment_in: payment_schema.PaymentCreate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Create new payment
@@ -106,29 +135,54 @@ def create_payment(
     return payment
 
 
+@router.post("/import", response_model=dict)
+def import_bank_statement(
+    *,
+    db: Session = Depends(get_db),
+    file: UploadFile = File(..., description="Bank mutation file: CSV with a header row, or MT940"),
+    file_format: str = Query("auto", alias="format", pattern="^(auto|csv|mt940)$", description="Statement format: auto, csv or mt940"),
+    bank_name: Optional[str] = Query(None, max_length=100, description="Bank name stored on the imported payments"),
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Import a bank statement as verified payments
+    
+    Credit lines are matched to open invoices by the invoice number or
+    customer code in the transfer description. Lines that could not be
+    matched are returned in unmatched_lines with the reason.
+    """
+    return BankImportService.import_statement(
+        db=db,
+        raw=file.file,
+        file_format=file_format,
+        bank_name=bank_name,
+        verified_by=current_user.id
+    )
+
+
 @router.get("/{payment_id}", response_model=payment_schema.Payment)
-def get_payment(
+async def get_payment(
     payment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async)
 ) -> Any:
     """
     Get payment by ID
     """
-    payment = PaymentService.get_payment_by_id(db, payment_id)
+    payment = await AsyncPaymentService.get_payment_by_id(db, payment_id)
     return payment
 
 
 @router.get("/number/{payment_number}", response_model=payment_schema.Payment)
-def get_payment_by_number(
+async def get_payment_by_number(
     payment_number: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user_async)
 ) -> Any:
     """
     Get payment by payment number
     """
-    payment = PaymentService.get_payment_by_number(db, payment_number)
+    payment = await AsyncPaymentService.get_payment_by_number(db, payment_number)
     return payment
 
 
@@ -138,7 +192,7 @@ def update_payment(
     db: Session = Depends(get_db),
     payment_id: int,
     payment_in: payment_schema.PaymentUpdate,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Update payment
@@ -153,7 +207,7 @@ def verify_payment(
     db: Session = Depends(get_db),
     payment_id: int,
     verify_data: payment_schema.PaymentVerify,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Verify payment (approve)
@@ -179,7 +233,7 @@ def reject_payment(
     db: Session = Depends(get_db),
     payment_id: int,
     reject_data: payment_schema.PaymentReject,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Reject payment
@@ -200,12 +254,49 @@ def reject_payment(
     return payment
 
 
+@router.post("/verify-batch", response_model=dict)
+def verify_payments_batch(
+    *,
+    db: Session = Depends(get_db),
+    batch: payment_schema.PaymentBatchVerify,
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Verify many payments at once (single transaction, per-id results)
+    """
+    return PaymentService.verify_payments(
+        db=db,
+        payment_ids=batch.payment_ids,
+        verified_by=current_user.id,
+        admin_notes=batch.admin_notes
+    )
+
+
+@router.post("/reject-batch", response_model=dict)
+def reject_payments_batch(
+    *,
+    db: Session = Depends(get_db),
+    batch: payment_schema.PaymentBatchReject,
+    current_user: Principal = Depends(get_current_active_user)
+) -> Any:
+    """
+    Reject many payments at once (single transaction, per-id results)
+    """
+    return PaymentService.reject_payments(
+        db=db,
+        payment_ids=batch.payment_ids,
+        verified_by=current_user.id,
+        rejection_reason=batch.rejection_reason,
+        admin_notes=batch.admin_notes
+    )
+
+
 @router.post("/{payment_id}/cancel", response_model=payment_schema.Payment)
 def cancel_payment(
     *,
     db: Session = Depends(get_db),
     payment_id: int,
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Cancel payment
@@ -217,26 +308,30 @@ def cancel_payment(
 @router.get("/methods/stats", response_model=dict)
 def get_payment_methods_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user)
 ) -> Any:
     """
     Get payment statistics by payment method
     """
-    from app.models.payment import Payment
+    from app.models.rollup import PaymentMonthlyRollup
     from sqlalchemy import func
     
     stats = db.query(
-        Payment.payment_method,
-        func.count(Payment.id).label('count'),
-        func.sum(Payment.amount).label('total_amount')
+        PaymentMonthlyRollup.payment_method,
+        func.sum(PaymentMonthlyRollup.payment_count).label('count'),
+        func.sum(PaymentMonthlyRollup.amount).label('total_amount')
     ).filter(
-        Payment.status == "verified"
-    ).group_by(Payment.payment_method).all()
+        PaymentMonthlyRollup.status == "verified"
+    ).group_by(
+        PaymentMonthlyRollup.payment_method
+    ).having(
+        func.sum(PaymentMonthlyRollup.payment_count) > 0
+    ).all()
     
     result = {}
     for stat in stats:
         result[stat.payment_method] = {
-            "count": stat.count,
+            "count": int(stat.count),
             "total_amount": float(stat.total_amount or 0)
         }
     
@@ -0,0 +1,238 @@
+"""
+Response cache for read-heavy endpoints
+
+Values are JSON documents stored under versioned namespaces: every cached
+key embeds the namespace's current version, so invalidating a namespace is
+a single INCR and stale entries simply age out through their TTL.
+
+Two backends are available (settings.CACHE_BACKEND):
+- "redis": shared between workers, uses settings.REDIS_URL
+- "memory": in-process dictionary for tests and single-process setups
+"""
+import functools
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Namespaces for cached dashboard endpoints
+DASHBOARD_STATS = "dashboard:stats"
+DASHBOARD_REVENUE_CHART = "dashboard:revenue-chart"
+DASHBOARD_CUSTOMER_GROWTH = "dashboard:customer-growth"
+DASHBOARD_PACKAGE_DISTRIBUTION = "dashboard:package-distribution"
+DASHBOARD_OVERDUE_SUMMARY = "dashboard:overdue-summary"
+
+# Namespaces affected by writes to each entity
+INVOICE_NAMESPACES = (DASHBOARD_STATS, DASHBOARD_REVENUE_CHART, DASHBOARD_OVERDUE_SUMMARY)
+PAYMENT_NAMESPACES = (DASHBOARD_STATS,)
+PAYMENT_VERIFY_NAMESPACES = PAYMENT_NAMESPACES + INVOICE_NAMESPACES
+CUSTOMER_NAMESPACES = (DASHBOARD_STATS, DASHBOARD_CUSTOMER_GROWTH, DASHBOARD_PACKAGE_DISTRIBUTION)
+PACKAGE_NAMESPACES = (DASHBOARD_PACKAGE_DISTRIBUTION,)
+
+# Parameter types that become part of a cache key
+_KEY_TYPES = (str, int, float, bool, date, datetime, type(None))
+
+
+class MemoryCacheBackend:
+    """In-process cache backend with per-key expiry"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_live(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get_live(key)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def add(self, key: str, value: str, ttl: int) -> bool:
+        """Set key only if it does not exist"""
+        with self._lock:
+            if self._get_live(key) is not None:
+                return False
+            self._data[key] = (value, time.monotonic() + ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._get_live(key) or 0) + 1
+            self._data[key] = (str(value), None)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCacheBackend:
+    """Redis cache backend shared by all API workers"""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(
+            url,
+            decode_responses=True,
+            socket_timeout=settings.CACHE_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.CACHE_SOCKET_TIMEOUT
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        self._client.set(key, value, ex=ttl)
+
+    def add(self, key: str, value: str, ttl: int) -> bool:
+        return bool(self._client.set(key, value, ex=ttl, nx=True))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+    def incr(self, key: str) -> int:
+        return self._client.incr(key)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(f"{settings.CACHE_KEY_PREFIX}:*"):
+            self._client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend():
+    """Get (and lazily create) the configured cache backend"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.CACHE_BACKEND == "memory":
+                    _backend = MemoryCacheBackend()
+                else:
+                    _backend = RedisCacheBackend(settings.REDIS_URL)
+    return _backend
+
+
+def set_cache_backend(backend) -> None:
+    """Replace the cache backend, e.g. with MemoryCacheBackend() in tests"""
+    global _backend
+    _backend = backend
+
+
+def _namespace_version_key(namespace: str) -> str:
+    return f"{settings.CACHE_KEY_PREFIX}:ns:{namespace}"
+
+
+def _build_key(backend, namespace: str, params: Dict[str, Any]) -> str:
+    version = backend.get(_namespace_version_key(namespace)) or "0"
+    raw = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f"{settings.CACHE_KEY_PREFIX}:{namespace}:v{version}:{digest}"
+
+
+def invalidate(*namespaces: str) -> None:
+    """
+    Invalidate every cached entry of the given namespaces
+
+    Call after the write has been committed. Cache errors are logged and
+    swallowed: a failed invalidation only means entries live until their TTL.
+    """
+    if not settings.CACHE_ENABLED:
+        return
+    try:
+        backend = get_cache_backend()
+        for namespace in namespaces:
+            backend.incr(_namespace_version_key(namespace))
+    except Exception as e:
+        logger.warning("Cache invalidation failed for %s: %s", namespaces, e)
+
+
+def cached(namespace: str, ttl: int) -> Callable:
+    """
+    Cache the JSON-encoded result of a sync endpoint
+
+    Only scalar keyword arguments (query parameters) become part of the key;
+    dependencies such as the database session and current user do not, so
+    use it for data that is identical for every authorized user.
+
+    On a miss, one caller takes a short lock and computes the value while
+    concurrent callers wait for it (up to CACHE_LOCK_TIMEOUT) instead of all
+    hitting the database at once.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not settings.CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            params = {k: v for k, v in kwargs.items() if isinstance(v, _KEY_TYPES)}
+            try:
+                backend = get_cache_backend()
+                key = _build_key(backend, namespace, params)
+                hit = backend.get(key)
+            except Exception as e:
+                logger.warning("Cache unavailable for %s: %s", namespace, e)
+                return func(*args, **kwargs)
+
+            if hit is not None:
+                return json.loads(hit)
+
+            lock_key = f"{key}:lock"
+            try:
+                has_lock = backend.add(lock_key, "1", settings.CACHE_LOCK_TIMEOUT)
+                if not has_lock:
+                    # Someone else is computing this entry; wait for it
+                    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+                    while time.monotonic() < deadline:
+                        time.sleep(0.05)
+                        hit = backend.get(key)
+                        if hit is not None:
+                            return json.loads(hit)
+            except Exception as e:
+                logger.warning("Cache lock failed for %s: %s", namespace, e)
+                has_lock = False
+
+            try:
+                result = jsonable_encoder(func(*args, **kwargs))
+                try:
+                    backend.set(key, json.dumps(result), ttl)
+                except Exception as e:
+                    logger.warning("Cache write failed for %s: %s", namespace, e)
+                return result
+            finally:
+                if has_lock:
+                    try:
+                        backend.delete(lock_key)
+                    except Exception:
+                        pass
+
+        return wrapper
+
+    return decorator
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 import secrets
 
 
@@ -20,14 +20,40 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    PRINCIPAL_CACHE_TTL: int = 60  # Detik; role/status user di-cache per user id
+    # Simpan role/status di token dan lewati lookup user sama sekali.
+    # Perubahan user baru berlaku untuk token berikutnya: pakai masa berlaku token pendek.
+    AUTH_TOKEN_CLAIMS: bool = False
+    
+    # Password Hashing
+    PASSWORD_HASH_SCHEMES: List[str] = ["bcrypt"]  # Skema pertama untuk hash baru, sisanya di-upgrade saat login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2  # Proses khusus hashing
+    PASSWORD_HASH_MAX_PENDING: int = 32  # Lebih dari ini langsung 503
+    PASSWORD_HASH_TIMEOUT: float = 10.0  # Detik
     
     # Database
     DATABASE_URL: str
     DATABASE_ECHO: bool = False
+    ASYNC_DATABASE_URL: Optional[str] = None  # Default: DATABASE_URL dengan driver asyncpg
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_MAX_OVERFLOW: int = 20
     
     # Redis
     REDIS_URL: str
     
+    # Response Cache
+    CACHE_ENABLED: bool = True
+    CACHE_BACKEND: str = "redis"  # redis, memory
+    CACHE_KEY_PREFIX: str = "isp-billing"
+    CACHE_SOCKET_TIMEOUT: float = 0.5  # Detik
+    CACHE_LOCK_TIMEOUT: int = 10  # Detik menunggu request lain yang sedang mengisi cache
+    CACHE_TTL_DASHBOARD_STATS: int = 60
+    CACHE_TTL_REVENUE_CHART: int = 300
+    CACHE_TTL_CUSTOMER_GROWTH: int = 300
+    CACHE_TTL_PACKAGE_DISTRIBUTION: int = 300
+    CACHE_TTL_OVERDUE_SUMMARY: int = 120
+    
     # CORS
     BACKEND_CORS_ORIGINS: List[str] = [
         "http://localhost:3000",
@@ -36,6 +62,16 @@ class Settings(BaseSettings):
         "https://app.access.daragroup.cloud"
     ]
     
+    # Metrics (Prometheus)
+    METRICS_ENABLED: bool = True
+    PROMETHEUS_MULTIPROC_DIR: Optional[str] = None  # Direktori bersama untuk beberapa worker uvicorn
+    
+    # Query Budget (deteksi N+1 saat development)
+    QUERY_BUDGET_ENABLED: Optional[bool] = None  # Default: DEBUG
+    QUERY_BUDGET_DEFAULT: int = 20  # Maksimal statement SQL per request
+    QUERY_BUDGET_REPEAT_THRESHOLD: int = 5  # Statement yang sama sebanyak ini dianggap N+1
+    QUERY_BUDGETS: Dict[str, int] = {}  # Per route, e.g. {"GET /api/v1/customers/{customer_id}": 3}
+    
     # First Superuser
     FIRST_SUPERUSER_EMAIL: str = "admin@daragroup.cloud"
     FIRST_SUPERUSER_PASSWORD: str = "admin123"
@@ -54,10 +90,40 @@ class Settings(BaseSettings):
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
     
+    # Dashboard
+    DASHBOARD_MAX_CHART_MONTHS: int = 120  # Batas parameter months untuk grafik
+    
     # Business Settings
-    BILLING_CYCLE_DAY: int = 1  # Tagihan generate setiap tanggal berapa
+    BILLING_CYCLE_DAY: int = 1  # Tagihan generate setiap tanggal berapa (pelanggan tanpa billing_day)
+    BILLING_SCHEDULER_ENABLED: bool = True  # Tagih pelanggan sesuai billing_day setiap hari
+    BILLING_RUN_HOUR: int = 1  # Jam (TIMEZONE) mulai menagih hari ini
+    BILLING_SCHEDULER_INTERVAL: int = 3600  # Detik antar pengecekan hari yang belum ditagih
+    BILLING_CATCHUP_DAYS: int = 31  # Maksimal hari terlewat yang masih dikejar
+    BILLING_RENDER_PDFS: bool = False  # Render PDF invoice hari itu setelah ditagih
     LATE_PAYMENT_DAYS: int = 7  # Berapa hari grace period
     LATE_PAYMENT_FEE: float = 50000  # Denda keterlambatan
+    INVOICE_BATCH_CHUNK_SIZE: int = 1000  # Jumlah invoice per INSERT/commit saat generate batch
+    OVERDUE_SWEEP_CHUNK_SIZE: int = 5000  # Invoice per UPDATE/commit saat cek overdue
+    PAYMENT_IMPORT_CHUNK_SIZE: int = 500  # Baris mutasi bank per transaksi saat import pembayaran
+    
+    # Export
+    EXPORT_CHUNK_SIZE: int = 2000  # Baris per fetch dari server-side cursor
+    
+    # Invoice PDF
+    INVOICE_COMPANY_NAME: str = PROJECT_NAME
+    INVOICE_COMPANY_ADDRESS: Optional[str] = None
+    INVOICE_PDF_FONT: Optional[str] = None  # Path file TTF; default Helvetica
+    INVOICE_PDF_FONT_BOLD: Optional[str] = None
+    INVOICE_PDF_CACHE_DIR: str = "storage/invoice-pdf"
+    INVOICE_PDF_WORKERS: int = 4  # Proses render saat bulk per periode
+    INVOICE_PDF_BATCH_SIZE: int = 500  # Invoice per batch yang dibagi ke worker
+    
+    # Background Jobs
+    JOB_EXECUTOR: str = "inprocess"  # inprocess, celery
+    JOB_WORKERS: int = 2  # Thread untuk executor inprocess
+    JOB_HEARTBEAT_TIMEOUT: int = 300  # Detik tanpa progress sebelum job dianggap mati dan boleh dilanjutkan
+    JOB_MAX_ERROR_DETAILS: int = 500  # Detail error yang disimpan per job
+    CELERY_BROKER_URL: Optional[str] = None  # Default: REDIS_URL
     
     # Timezone
     TIMEZONE: str = "Asia/Jakarta"
@@ -75,6 +141,21 @@ class Settings(BaseSettings):
     @property
     def is_development(self) -> bool:
         return self.ENVIRONMENT.lower() == "development"
+    
+    @property
+    def query_budget_enabled(self) -> bool:
+        return self.DEBUG if self.QUERY_BUDGET_ENABLED is None else self.QUERY_BUDGET_ENABLED
+    
+    @property
+    def celery_broker_url(self) -> str:
+        return self.CELERY_BROKER_URL or self.REDIS_URL
+    
+    @property
+    def async_database_url(self) -> str:
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        scheme, _, rest = self.DATABASE_URL.partition("://")
+        return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgres") else self.DATABASE_URL
 
 
 # Create settings instance
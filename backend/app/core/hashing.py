@@ -0,0 +1,144 @@
+"""
+Password hashing off the request path
+
+bcrypt costs ~250 ms of CPU per hash or verify. Running it inline in
+endpoints pins a threadpool worker (and the GIL) for that long, so a burst
+of logins starves unrelated requests. Hashing runs in a dedicated process
+pool of settings.PASSWORD_HASH_WORKERS processes instead; at most
+settings.PASSWORD_HASH_MAX_PENDING operations may be queued or running,
+beyond that callers get 503 immediately rather than waiting in line, and
+an operation that does not finish within settings.PASSWORD_HASH_TIMEOUT
+also ends in 503.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core import metrics, security
+
+
+def _hash(password: str) -> str:
+    return security.get_password_hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return security.verify_and_update_password(password, hashed_password)
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password operations in progress, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
+class HashingPool:
+    """Bounded process pool with queue-depth counters (also exported on /metrics)"""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted_total = 0
+        self.completed_total = 0
+        self.rejected_total = 0
+        self.busy_seconds_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a multi-threaded server process is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected_total += 1
+                metrics.PASSWORD_HASH_REJECTED.inc()
+                raise _overloaded()
+            self.pending += 1
+            self.submitted_total += 1
+            metrics.PASSWORD_HASH_PENDING.inc()
+            metrics.PASSWORD_HASH_SUBMITTED.inc()
+            executor = self._get_executor()
+
+        started = time.monotonic()
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._done(started))
+        return future
+
+    def _done(self, started: float) -> None:
+        with self._lock:
+            self.pending -= 1
+            self.completed_total += 1
+            metrics.PASSWORD_HASH_PENDING.dec()
+            metrics.PASSWORD_HASH_COMPLETED.inc()
+            self.busy_seconds_total += time.monotonic() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "submitted_total": self.submitted_total,
+                "completed_total": self.completed_total,
+                "rejected_total": self.rejected_total,
+                "busy_seconds_total": round(self.busy_seconds_total, 3)
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = HashingPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+
+def hash_password(password: str) -> str:
+    """Hash a password in the pool (blocking; for sync endpoints and scripts)"""
+    try:
+        return pool.submit(_hash, password).result(timeout=settings.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise _overloaded()
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password in the pool without blocking the event loop"""
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(pool.submit(_hash, password)),
+            settings.PASSWORD_HASH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise _overloaded()
+
+
+async def verify_password_async(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password in the pool without blocking the event loop
+
+    Returns (valid, new_hash); new_hash is set when the stored hash uses a
+    deprecated scheme or a lower bcrypt cost and should be replaced.
+    """
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(pool.submit(_verify_and_update, password, hashed_password)),
+            settings.PASSWORD_HASH_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise _overloaded()
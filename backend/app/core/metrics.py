@@ -0,0 +1,248 @@
+"""
+Prometheus metrics: per-route latency, in-flight requests, status codes and DB usage
+
+MetricsMiddleware times every HTTP request and labels it with the route
+template (/api/v1/customers/{customer_id}, not the raw path), so label
+cardinality stays bounded. SQLAlchemy engine events count the statements
+each request sends and the time spent in them; the per-request totals go
+into histograms, so a route that starts issuing N+1 queries shows up as a
+shifted distribution. Pool instrumentation times every connection
+checkout, so requests queueing for an exhausted pool show up as
+db_pool_checkout_seconds outliers (and db_pool_timeouts_total). The
+password hashing pool's queue depth is exported as password_hash_*.
+
+With several uvicorn/gunicorn workers every process has its own counters.
+Set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the workers
+(cleared before the server starts) and /metrics aggregates the files all
+workers write there. Without it, /metrics reports the scraped process only.
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from app.core.config import settings
+
+# prometheus_client picks its value storage at import time
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import (  # noqa: E402
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError  # noqa: E402
+from starlette.responses import Response  # noqa: E402
+from starlette.types import ASGIApp, Message, Receive, Scope, Send  # noqa: E402
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "route", "status"]
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served (the route is only known after routing)",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements sent per HTTP request",
+    ["method", "route"],
+    buckets=STATEMENT_BUCKETS
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent executing SQL per HTTP request",
+    ["method", "route"],
+    buckets=DB_TIME_BUCKETS
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total",
+    "SQL statements sent, by route (background work counts as route=\"\")",
+    ["route"]
+)
+DB_POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the pool (queueing when it is exhausted)",
+    ["pool"],
+    buckets=POOL_WAIT_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Connection checkouts that gave up after pool_timeout",
+    ["pool"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending",
+    "Password hash/verify operations queued or running in the hashing pool",
+    multiprocess_mode="livesum"
+)
+PASSWORD_HASH_SUBMITTED = Counter(
+    "password_hash_submitted_total",
+    "Password hash/verify operations accepted by the hashing pool"
+)
+PASSWORD_HASH_COMPLETED = Counter(
+    "password_hash_completed_total",
+    "Password hash/verify operations finished by the hashing pool"
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "Password hash/verify operations refused with 503 because the pool was full"
+)
+
+
+class RequestDbStats:
+    """Statements and DB time of the current request"""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set per request; sync endpoints run in a copy of the context, async
+# sessions run their greenlets in it, so both see the same object
+_request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+    else:
+        DB_STATEMENTS.labels("").inc()
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    started = exception_context.connection.info.get("metrics_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements and DB time of a (sync, or AsyncEngine.sync_engine) engine"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    """Time connection checkouts and count checked-out connections of an engine's pool"""
+    pool = engine.pool
+    if getattr(pool, "_metrics_instrumented", False):
+        return
+
+    checkout_time = DB_POOL_CHECKOUT.labels(name)
+    timeouts = DB_POOL_TIMEOUTS.labels(name)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    connect = pool.connect
+
+    # Pools have no "checkout requested" event, so wrap the method engines
+    # (sync, and async through their sync_engine) call for every connection
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        except PoolTimeoutError:
+            timeouts.inc()
+            raise
+        finally:
+            checkout_time.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+    pool._metrics_instrumented = True
+    event.listen(pool, "checkout", lambda *args: checked_out.inc())
+    event.listen(pool, "checkin", lambda *args: checked_out.dec())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the request metrics"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        stats = RequestDbStats()
+        token = _request_db_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            _request_db_stats.reset(token)
+
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_STATEMENTS.labels(method, route).observe(stats.statements)
+            REQUEST_DB_TIME.labels(method, route).observe(stats.seconds)
+            DB_STATEMENTS.labels(route).inc(stats.statements)
+
+
+def metrics_response() -> Response:
+    """Prometheus text exposition of all workers (multiprocess) or this process"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess files (on shutdown)"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
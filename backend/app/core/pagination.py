@@ -0,0 +1,127 @@
+"""
+Keyset (cursor) pagination for list endpoints
+
+A cursor is an opaque, URL-safe token holding the sort key of the last row
+of a page, e.g. (created_at, id). The next page continues strictly after
+that key, so deep pages cost the same as the first one and rows inserted
+while a client pages through a list do not shift later pages.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, and_, literal, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+# (column, descending) pairs; the last column must be unique (usually id)
+OrderBy = Sequence[Tuple[Any, bool]]
+
+CURSOR_DESCRIPTION = (
+    "Keyset pagination: pass an empty cursor for the first page, then next_cursor. "
+    "Returns {items, next_cursor} instead of a plain list; skip is ignored"
+)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of a row as an opaque cursor"""
+    raw = json.dumps([
+        value.isoformat() if isinstance(value, (date, datetime)) else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order_by: OrderBy) -> tuple:
+    """Decode a cursor back into typed sort key values for the given columns"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(order_by):
+            raise ValueError("cursor does not match the sort order")
+        return tuple(
+            _from_json(value, column.type.python_type)
+            for value, (column, _) in zip(values, order_by)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _from_json(value: Any, python_type: type) -> Any:
+    if value is None:
+        return None
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def keyset_filter(order_by: OrderBy, values: Sequence[Any]):
+    """WHERE clause selecting the rows that sort strictly after values"""
+    columns = [column for column, _ in order_by]
+    binds = [literal(value, column.type) for value, column in zip(values, columns)]
+    directions = {descending for _, descending in order_by}
+
+    if len(directions) == 1:
+        # Uniform direction: a row comparison Postgres can run as an index range
+        if directions.pop():
+            return tuple_(*columns) < tuple_(*binds)
+        return tuple_(*columns) > tuple_(*binds)
+
+    # Mixed directions: (a after x) OR (a = x AND b after y) OR ...
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        after = column < binds[i] if descending else column > binds[i]
+        clauses.append(and_(*[columns[j] == binds[j] for j in range(i)], after))
+    return or_(*clauses)
+
+
+def page_statement(stmt: Select, order_by: OrderBy, cursor: Optional[str], limit: int) -> Select:
+    """Order an (unordered) select in keyset order and continue after the cursor"""
+    if cursor:
+        stmt = stmt.where(keyset_filter(order_by, decode_cursor(cursor, order_by)))
+
+    # One extra row tells whether there is a next page
+    return stmt.order_by(*[
+        column.desc() if descending else column.asc()
+        for column, descending in order_by
+    ]).limit(limit + 1)
+
+
+def paginate(db: Session, stmt: Select, order_by: OrderBy, cursor: Optional[str], limit: int) -> dict:
+    """
+    Fetch one page of an (unordered) select in keyset order
+
+    An empty cursor returns the first page. The response holds the rows and
+    next_cursor, which is None on the last page.
+    """
+    rows = db.scalars(page_statement(stmt, order_by, cursor, limit)).all()
+    return _page(list(rows), order_by, limit)
+
+
+async def paginate_async(
+    db: AsyncSession, stmt: Select, order_by: OrderBy, cursor: Optional[str], limit: int
+) -> dict:
+    """paginate() for an AsyncSession"""
+    rows = (await db.scalars(page_statement(stmt, order_by, cursor, limit))).all()
+    return _page(list(rows), order_by, limit)
+
+
+def _page(rows: list, order_by: OrderBy, limit: int) -> dict:
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([
+            getattr(rows[-1], column.key) for column, _ in order_by
+        ])
+
+    return {
+        "items": rows,
+        "next_cursor": next_cursor
+    }
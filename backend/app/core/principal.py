@@ -0,0 +1,100 @@
+"""
+Authenticated principal: the user fields authorization checks need
+
+Resolving a request's user only needs id, role and the active/superuser
+flags, so those are cached per user id (settings.PRINCIPAL_CACHE_TTL)
+instead of loading the users row on every request. Writes to a user must
+call invalidate_principal() after commit.
+
+With settings.AUTH_TOKEN_CLAIMS the same fields travel inside the access
+token and no lookup happens at all; changes to a user then only apply to
+tokens issued afterwards.
+"""
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+from app.core import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Current user as seen by authorization dependencies"""
+    id: int
+    username: str
+    role: str
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=user.role or "staff",
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser)
+        )
+
+    def to_claims(self) -> Dict[str, Any]:
+        """Token claims for AUTH_TOKEN_CLAIMS mode (sub carries the id)"""
+        return {
+            "username": self.username,
+            "role": self.role,
+            "is_active": self.is_active,
+            "is_superuser": self.is_superuser
+        }
+
+    @classmethod
+    def from_claims(cls, user_id: int, claims: Dict[str, Any]) -> Optional["Principal"]:
+        """Principal from token claims, None for tokens issued without them"""
+        if not all(key in claims for key in ("username", "role", "is_active", "is_superuser")):
+            return None
+        return cls(
+            id=user_id,
+            username=claims["username"],
+            role=claims["role"],
+            is_active=bool(claims["is_active"]),
+            is_superuser=bool(claims["is_superuser"])
+        )
+
+
+def _key(user_id: int) -> str:
+    return f"{settings.CACHE_KEY_PREFIX}:principal:{user_id}"
+
+
+def get_cached_principal(user_id: int) -> Optional[Principal]:
+    """Cached principal for a user id, None on a miss or cache error"""
+    if not settings.CACHE_ENABLED:
+        return None
+    try:
+        raw = cache.get_cache_backend().get(_key(user_id))
+    except Exception as e:
+        logger.warning("Principal cache unavailable: %s", e)
+        return None
+    return Principal(**json.loads(raw)) if raw else None
+
+
+def cache_principal(principal: Principal) -> None:
+    if not settings.CACHE_ENABLED:
+        return
+    try:
+        cache.get_cache_backend().set(
+            _key(principal.id), json.dumps(asdict(principal)), settings.PRINCIPAL_CACHE_TTL
+        )
+    except Exception as e:
+        logger.warning("Principal cache write failed: %s", e)
+
+
+def invalidate_principal(user_id: int) -> None:
+    """Drop the cached principal of a user; call after committing user changes"""
+    if not settings.CACHE_ENABLED:
+        return
+    try:
+        cache.get_cache_backend().delete(_key(user_id))
+    except Exception as e:
+        logger.warning("Principal cache invalidation failed for user %s: %s", user_id, e)
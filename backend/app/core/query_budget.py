@@ -0,0 +1,174 @@
+"""
+Query budgets: catch N+1 patterns in development and tests
+
+Every SQL statement sent while a QueryRecorder is active is recorded (a
+before_cursor_execute listener on the engines). Statements that differ only
+in their parameters normalize to the same text, so a lazy load inside a
+loop shows up as one statement repeated once per row.
+
+In tests, wrap a request in assert_max_queries():
+
+    with assert_max_queries(3):
+        client.get(f"/api/v1/customers/{customer_id}", headers=auth)
+
+In development (QUERY_BUDGET_ENABLED, default DEBUG) QueryBudgetMiddleware
+records each request, adds an X-Query-Count header and logs a warning with
+the offending statements when a request exceeds its budget
+(QUERY_BUDGETS["GET /api/v1/customers/{customer_id}"], else
+QUERY_BUDGET_DEFAULT) or repeats a statement QUERY_BUDGET_REPEAT_THRESHOLD
+times or more.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Expanded IN lists, bound parameters (psycopg2 and asyncpg style), whitespace
+_IN_LIST_RE = re.compile(r"IN \((?:\s*(?:%\(\w+\)s|\$\d+|%s|\?)\s*,?)+\)", re.IGNORECASE)
+_PARAM_RE = re.compile(r"%\(\w+\)s|\$\d+|%s")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """Statement text with parameters and IN-list lengths folded away"""
+    statement = _IN_LIST_RE.sub("IN (?)", statement)
+    statement = _PARAM_RE.sub("?", statement)
+    return _SPACE_RE.sub(" ", statement).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More statements than allowed were sent"""
+
+
+class QueryRecorder:
+    """Statements sent while recording"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = 2) -> List[Tuple[str, int]]:
+        """Normalized statements sent at least threshold times, most frequent first"""
+        counts = Counter(normalize(statement) for statement in self.statements)
+        return [(statement, n) for statement, n in counts.most_common() if n >= threshold]
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """Human-readable summary, repeated statements first"""
+        header = f"{self.count} statements" + (f" (budget {limit})" if limit is not None else "")
+        lines = [header]
+        for statement, n in self.repeated():
+            lines.append(f"  {n}x {statement[:300]}")
+        repeated = {statement for statement, _ in self.repeated()}
+        for statement in dict.fromkeys(normalize(s) for s in self.statements):
+            if statement not in repeated:
+                lines.append(f"  1x {statement[:300]}")
+        return "\n".join(lines)
+
+
+# Recorders of the current request / test block; nested blocks all record
+_recorders: ContextVar[Tuple[QueryRecorder, ...]] = ContextVar("query_recorders", default=())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for recorder in _recorders.get():
+        recorder.statements.append(statement)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Record statements of a (sync, or AsyncEngine.sync_engine) engine"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def _instrument_default_engines() -> None:
+    from app.core.database import async_engine, engine
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryRecorder]:
+    """Record the statements sent inside the block"""
+    _instrument_default_engines()
+    recorder = QueryRecorder()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, max_repeats: Optional[int] = None) -> Iterator[QueryRecorder]:
+    """
+    Fail if the block sends more than limit statements
+
+    With max_repeats it also fails when one normalized statement is sent
+    more often than that (an N+1 that still fits the overall budget).
+    """
+    with record_queries() as recorder:
+        yield recorder
+
+    if recorder.count > limit:
+        raise QueryBudgetExceeded(recorder.report(limit))
+    if max_repeats is not None and recorder.repeated(max_repeats + 1):
+        raise QueryBudgetExceeded(f"statement repeated more than {max_repeats} times\n{recorder.report(limit)}")
+
+
+def budget_for(method: str, route: str) -> int:
+    return settings.QUERY_BUDGETS.get(f"{method} {route}", settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryBudgetMiddleware:
+    """Record each request's statements and warn about budget overruns / N+1"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        _instrument_default_engines()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = QueryRecorder()
+        token = _recorders.set(_recorders.get() + (recorder,))
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Query-Count"] = str(recorder.count)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _recorders.reset(token)
+
+        route = getattr(scope.get("route"), "path", None)
+        if route is None:
+            return
+
+        limit = budget_for(scope["method"], route)
+        repeated = recorder.repeated(settings.QUERY_BUDGET_REPEAT_THRESHOLD)
+        if recorder.count > limit or repeated:
+            logger.warning(
+                "Query budget exceeded: %s %s%s\n%s",
+                scope["method"],
+                route,
+                " (possible N+1)" if repeated else "",
+                recorder.report(limit)
+            )
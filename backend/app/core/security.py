@@ -1,16 +1,23 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union, Any
+from typing import Any, Dict, Optional, Tuple, Union
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context: the first scheme hashes new passwords, the
+# others only verify and are upgraded on the next successful login
+pwd_context = CryptContext(
+    schemes=settings.PASSWORD_HASH_SCHEMES,
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
 
 
 def create_access_token(
     subject: Union[str, Any],
-    expires_delta: Optional[timedelta] = None
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[Dict[str, Any]] = None
 ) -> str:
     """
     Create JWT access token
@@ -18,6 +25,7 @@ def create_access_token(
     Args:
         subject: Token subject (usually user id or email)
         expires_delta: Token expiration time
+        claims: Extra claims (e.g. the principal in AUTH_TOKEN_CLAIMS mode)
         
     Returns:
         str: Encoded JWT token
@@ -30,6 +38,7 @@ def create_access_token(
         )
     
     to_encode = {
+        **(claims or {}),
         "exp": expire,
         "sub": str(subject),
         "type": "access"
@@ -82,6 +91,20 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify password and rehash it if the stored hash is outdated
+    
+    Args:
+        plain_password: Plain text password
+        hashed_password: Hashed password from database
+        
+    Returns:
+        Tuple[bool, Optional[str]]: (valid, new hash to store or None)
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """
     Hash password
@@ -1,10 +1,11 @@
 from sqlalchemy.orm import Session
 
 from app.core.database import SessionLocal
-from app.core.security import get_password_hash
+from app.core import hashing
 from app.core.config import settings
 from app.models.user import User
 from app.models.package import Package
+from app.services.rollup import RollupService
 
 
 def init_db() -> None:
@@ -12,6 +13,7 @@ def init_db() -> None:
     Initialize database with default data
     - Create first superuser if not exists
     - Create default packages if not exists
+    - Build dashboard rollup tables if empty
     """
     db = SessionLocal()
     
@@ -24,7 +26,7 @@ def init_db() -> None:
                 email=settings.FIRST_SUPERUSER_EMAIL,
                 username="admin",
                 full_name=settings.FIRST_SUPERUSER_NAME,
-                hashed_password=get_password_hash(settings.FIRST_SUPERUSER_PASSWORD),
+                hashed_password=hashing.hash_password(settings.FIRST_SUPERUSER_PASSWORD),
                 is_superuser=True,
                 is_active=True,
                 role="admin"
@@ -106,6 +108,12 @@ def init_db() -> None:
             print(f"✅ Created {len(default_packages)} default packages")
         else:
             print(f"ℹ️  Packages already exist: {package_count} packages")
+        
+        # Build dashboard rollups for existing data (first start after upgrade)
+        if RollupService.is_empty(db):
+            RollupService.rebuild(db)
+            db.commit()
+            print("✅ Built dashboard rollup tables")
             
     except Exception as e:
         print(f"❌ Error initializing database: {e}")
@@ -0,0 +1,37 @@
+"""
+Rebuild the dashboard rollup tables from the fact tables
+
+Run after bulk data fixes done outside the services (manual SQL, restores):
+    python -m app.db.rollups
+"""
+from app.core import cache
+from app.core.database import SessionLocal
+from app.services.rollup import RollupService
+
+
+def rebuild_rollups() -> None:
+    """Recompute all rollup tables in one transaction and drop cached dashboard data"""
+    db = SessionLocal()
+    
+    try:
+        RollupService.rebuild(db)
+        db.commit()
+        print("✅ Rollup tables rebuilt")
+    except Exception as e:
+        print(f"❌ Error rebuilding rollup tables: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    
+    cache.invalidate(
+        cache.DASHBOARD_STATS,
+        cache.DASHBOARD_REVENUE_CHART,
+        cache.DASHBOARD_CUSTOMER_GROWTH,
+        cache.DASHBOARD_PACKAGE_DISTRIBUTION,
+        cache.DASHBOARD_OVERDUE_SUMMARY
+    )
+
+
+if __name__ == "__main__":
+    rebuild_rollups()
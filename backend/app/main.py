@@ -2,12 +2,16 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import time
 
+from app.core import hashing, metrics, query_budget
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base
 from app.api.v1.api import api_router
 from app.db.init_db import init_db
+from app.services.job import JobService, shutdown_executor
+from app.services.billing_cycle import run_scheduler
 
 
 @asynccontextmanager
@@ -28,10 +32,27 @@ async def lifespan(app: FastAPI):
     init_db()
     print("✅ Database initialized")
     
+    # Pick up background jobs interrupted by the last shutdown
+    if settings.JOB_EXECUTOR == "inprocess":
+        resumed = JobService.resume_interrupted_jobs()
+        if resumed:
+            print(f"🔁 Resumed {resumed} background job(s)")
+    
+    # Daily billing cycle (Celery deployments schedule it with celery beat)
+    scheduler = None
+    if settings.BILLING_SCHEDULER_ENABLED and settings.JOB_EXECUTOR == "inprocess":
+        scheduler = asyncio.create_task(run_scheduler())
+    
     yield
     
     # Shutdown
     print("🛑 Shutting down ISP Billing System API...")
+    if scheduler:
+        scheduler.cancel()
+    await async_engine.dispose()
+    hashing.pool.shutdown()
+    shutdown_executor()
+    metrics.mark_process_dead()
 
 
 # Create FastAPI application
@@ -55,6 +76,19 @@ app.add_middleware(
 )
 
 
+# Per-route latency / status / DB statement / pool metrics, served on /metrics
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    metrics.instrument_pool(engine, "sync")
+    metrics.instrument_pool(async_engine.sync_engine, "async")
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Statements per request, N+1 warnings (development)
+if settings.query_budget_enabled:
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+
+
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -90,10 +124,20 @@ async def health_check():
         "status": "healthy",
         "service": settings.PROJECT_NAME,
         "version": settings.VERSION,
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "password_hashing": hashing.pool.stats()
     }
 
 
+# Prometheus metrics endpoint
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus metrics (all workers when PROMETHEUS_MULTIPROC_DIR is set)
+    """
+    return metrics.metrics_response()
+
+
 # Root endpoint
 @app.get("/", tags=["Root"])
 async def root():
@@ -4,6 +4,17 @@ from app.models.package import Package
 from app.models.customer import Customer
 from app.models.invoice import Invoice
 from app.models.payment import Payment
+from app.models.document_counter import DocumentCounter
+from app.models.job import Job
+from app.models.billing_run import BillingRun
+from app.models.overdue_sweep import OverdueSweep
+from app.models.rollup import (
+    InvoiceStatusRollup,
+    RevenueMonthlyRollup,
+    CustomerStatusRollup,
+    CustomerMonthlyRollup,
+    PaymentMonthlyRollup
+)
 
 __all__ = [
     "User",
@@ -11,4 +22,13 @@ __all__ = [
     "Customer",
     "Invoice",
     "Payment",
+    "DocumentCounter",
+    "Job",
+    "BillingRun",
+    "OverdueSweep",
+    "InvoiceStatusRollup",
+    "RevenueMonthlyRollup",
+    "CustomerStatusRollup",
+    "CustomerMonthlyRollup",
+    "PaymentMonthlyRollup",
 ]
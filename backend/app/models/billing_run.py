@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class BillingRun(Base):
+    """
+    Billing run model - Checkpoint siklus tagihan harian (satu baris per tanggal yang sudah ditagih)
+    """
+    __tablename__ = "billing_runs"
+    
+    run_date = Column(Date, primary_key=True)  # Tanggal siklus; pelanggan dengan billing_day = hari ini
+    billing_period = Column(String(20), nullable=False)  # e.g., "2024-12"
+    
+    # Hasil
+    job_id = Column(Integer, nullable=True)
+    total_customers = Column(Integer, nullable=False, default=0)
+    invoices_created = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)  # Sudah punya invoice periode ini
+    errors = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    completed_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<BillingRun {self.run_date} - {self.invoices_created}>"
@@ -1,14 +1,45 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Numeric, Index, Computed, DDL, event, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
+# Same rule as CustomerService.normalize_phone
+PHONE_NORMALIZED_SQL = "regexp_replace(regexp_replace(phone, '[^0-9]', '', 'g'), '^62', '0')"
+
 
 class Customer(Base):
     """
     Customer model - Pelanggan ISP
     """
     __tablename__ = "customers"
+    __table_args__ = (
+        # Siklus tagihan harian: pelanggan aktif per billing_day
+        Index(
+            "ix_customers_active_billing_day", "billing_day",
+            postgresql_where=text("status = 'active'")
+        ),
+        # Daftar pelanggan: filter status / paket, urut created_at
+        Index("ix_customers_created_at", "created_at"),
+        Index("ix_customers_status_created_at", "status", "created_at"),
+        Index("ix_customers_package_id_created_at", "package_id", "created_at"),
+        # Pencarian pelanggan: ILIKE '%kata%' lewat indeks trigram (pg_trgm)
+        Index(
+            "ix_customers_full_name_trgm", "full_name",
+            postgresql_using="gin", postgresql_ops={"full_name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_customers_customer_code_trgm", "customer_code",
+            postgresql_using="gin", postgresql_ops={"customer_code": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_customers_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_customers_phone_normalized_trgm", "phone_normalized",
+            postgresql_using="gin", postgresql_ops={"phone_normalized": "gin_trgm_ops"}
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -17,6 +48,11 @@ class Customer(Base):
     full_name = Column(String(255), nullable=False)
     email = Column(String(255), unique=True, index=True, nullable=True)
     phone = Column(String(20), nullable=False)
+    # Nomor telepon hanya angka dengan awalan nasional, e.g. "+62 812-..." -> "0812..."
+    phone_normalized = Column(
+        String(20),
+        Computed(PHONE_NORMALIZED_SQL, persisted=True)
+    )
     id_card_number = Column(String(50), nullable=True)  # NIK/KTP
     
     # Address
@@ -64,3 +100,11 @@ class Customer(Base):
     
     def __repr__(self):
         return f"<Customer {self.customer_code} - {self.full_name}>"
+
+
+# Trigram operator classes for the search indexes
+event.listen(
+    Customer.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
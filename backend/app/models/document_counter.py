@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DocumentCounter(Base):
+    """
+    Document counter model - Nomor urut terakhir per prefix dokumen
+    """
+    __tablename__ = "document_counters"
+    
+    # Prefix, e.g. "INV-2024-12" or "PAY-2024-12"
+    prefix = Column(String(50), primary_key=True)
+    last_value = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<DocumentCounter {self.prefix} - {self.last_value}>"
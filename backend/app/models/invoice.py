@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Date, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -9,6 +9,25 @@ class Invoice(Base):
     Invoice model - Tagihan pelanggan
     """
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Satu invoice per pelanggan per periode; juga melayani filter customer_id
+        Index("uq_invoices_customer_period", "customer_id", "billing_period", unique=True),
+        # Daftar invoice: filter status / periode, urut created_at
+        Index("ix_invoices_created_at", "created_at"),
+        Index("ix_invoices_status_created_at", "status", "created_at"),
+        Index("ix_invoices_billing_period_created_at", "billing_period", "created_at"),
+        # Cek jatuh tempo dan daftar overdue
+        Index(
+            "ix_invoices_unpaid_status_due_date", "status", "due_date",
+            postgresql_where=text("status IN ('pending', 'partial')")
+        ),
+        # Ringkasan overdue (pending, partial, overdue per umur)
+        Index(
+            "ix_invoices_outstanding_due_date", "due_date",
+            postgresql_include=["total_amount"],
+            postgresql_where=text("status IN ('pending', 'partial', 'overdue')")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
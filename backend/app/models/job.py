@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, JSON, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Job(Base):
+    """
+    Job model - Pekerjaan latar belakang (generate invoice massal, cek overdue)
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Daftar job terbaru per status, dan pencarian job yang macet
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Job Info
+    job_type = Column(String(50), nullable=False)  # invoice_batch, overdue_sweep, billing_cycle, pdf_render
+    params = Column(JSON, nullable=False, default=dict)
+    
+    # Status
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)  # Berapa kali dijalankan (resume setelah crash)
+    
+    # Progress
+    progress_total = Column(Integer, nullable=False, default=0)
+    progress_done = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=False, default=list)  # Detail error (dibatasi JOB_MAX_ERROR_DETAILS)
+    result = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)  # Exception yang menggagalkan job
+    
+    # Worker
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Audit
+    created_by = Column(Integer, nullable=True)  # User ID yang submit
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<Job {self.id} {self.job_type} - {self.status}>"
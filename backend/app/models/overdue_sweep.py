@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class OverdueSweep(Base):
+    """
+    Overdue sweep model - Riwayat setiap pengecekan invoice jatuh tempo
+    """
+    __tablename__ = "overdue_sweeps"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Sweep Info
+    as_of = Column(Date, nullable=False)  # Invoice dengan due_date < as_of menjadi overdue
+    status = Column(String(20), nullable=False, default="completed")  # completed, cancelled, failed
+    job_id = Column(Integer, nullable=True)  # Jika dijalankan sebagai background job
+    
+    # Hasil
+    invoices_updated = Column(Integer, nullable=False, default=0)
+    late_fees_added = Column(Integer, nullable=False, default=0)
+    chunks = Column(Integer, nullable=False, default=0)
+    duration_ms = Column(Integer, nullable=False, default=0)
+    error_message = Column(Text, nullable=True)
+    
+    # Timestamps
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    finished_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<OverdueSweep {self.as_of} - {self.invoices_updated}>"
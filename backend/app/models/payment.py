@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Numeric, Date, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -9,6 +9,19 @@ class Payment(Base):
     Payment model - Pembayaran dari pelanggan
     """
     __tablename__ = "payments"
+    __table_args__ = (
+        # Daftar pembayaran: filter pelanggan / invoice / status / metode, urut created_at
+        Index("ix_payments_created_at", "created_at"),
+        Index("ix_payments_customer_id_created_at", "customer_id", "created_at"),
+        Index("ix_payments_invoice_id", "invoice_id"),
+        Index("ix_payments_status_created_at", "status", "created_at"),
+        Index("ix_payments_payment_method_created_at", "payment_method", "created_at"),
+        # Import mutasi bank: cek duplikat berdasarkan no. referensi
+        Index(
+            "ix_payments_reference_number", "reference_number",
+            postgresql_where=text("reference_number IS NOT NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
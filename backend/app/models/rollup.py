@@ -0,0 +1,82 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric
+from app.core.database import Base
+
+
+class InvoiceStatusRollup(Base):
+    """
+    Invoice rollup - Jumlah dan nilai invoice per periode tagihan dan status
+    """
+    __tablename__ = "rollup_invoice_status"
+
+    billing_period = Column(String(20), primary_key=True)  # e.g., "2024-12"
+    status = Column(String(20), primary_key=True)
+
+    invoice_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(15, 2), nullable=False, default=0)
+    paid_amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<InvoiceStatusRollup {self.billing_period} {self.status} - {self.invoice_count}>"
+
+
+class RevenueMonthlyRollup(Base):
+    """
+    Revenue rollup - Pendapatan dari invoice lunas per bulan pelunasan (paid_at)
+    """
+    __tablename__ = "rollup_revenue_monthly"
+
+    month = Column(Date, primary_key=True)  # First day of month
+
+    revenue = Column(Numeric(15, 2), nullable=False, default=0)
+    invoice_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<RevenueMonthlyRollup {self.month} - {self.revenue}>"
+
+
+class CustomerStatusRollup(Base):
+    """
+    Customer rollup - Jumlah pelanggan saat ini per status dan paket
+    """
+    __tablename__ = "rollup_customer_status"
+
+    status = Column(String(20), primary_key=True)
+    package_id = Column(Integer, primary_key=True)  # 0 = tanpa paket
+
+    customer_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CustomerStatusRollup {self.status} {self.package_id} - {self.customer_count}>"
+
+
+class CustomerMonthlyRollup(Base):
+    """
+    Customer rollup - Pelanggan baru (created_at) dan berhenti (termination_date) per bulan dan paket
+    """
+    __tablename__ = "rollup_customer_monthly"
+
+    month = Column(Date, primary_key=True)  # First day of month
+    package_id = Column(Integer, primary_key=True)  # 0 = tanpa paket
+
+    new_customers = Column(Integer, nullable=False, default=0)
+    churned_customers = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CustomerMonthlyRollup {self.month} {self.package_id} - +{self.new_customers}/-{self.churned_customers}>"
+
+
+class PaymentMonthlyRollup(Base):
+    """
+    Payment rollup - Jumlah dan nilai pembayaran per bulan (payment_date), metode dan status
+    """
+    __tablename__ = "rollup_payment_monthly"
+
+    month = Column(Date, primary_key=True)  # First day of month
+    payment_method = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+
+    payment_count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(15, 2), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PaymentMonthlyRollup {self.month} {self.payment_method} {self.status} - {self.amount}>"
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 
 
@@ -88,6 +88,12 @@ class CustomerInList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schema for one page of customers in cursor mode
+class CustomerPage(BaseModel):
+    items: List[CustomerInList]
+    next_cursor: Optional[str] = None  # None on the last page
+
+
 # For circular import prevention
 class PackageInCustomer(BaseModel):
     id: int
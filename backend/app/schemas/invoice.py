@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -77,6 +77,12 @@ class InvoiceInList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schema for one page of invoices in cursor mode
+class InvoicePage(BaseModel):
+    items: List[InvoiceInList]
+    next_cursor: Optional[str] = None  # None on the last page
+
+
 # Schema with customer details
 class InvoiceWithCustomer(Invoice):
     customer: Optional["CustomerInInvoice"] = None
@@ -0,0 +1,68 @@
+from pydantic import BaseModel, Field, ConfigDict
+from typing import Any, Dict, List, Optional
+from datetime import datetime, date
+
+
+# Parameters per job type
+class InvoiceBatchJobParams(BaseModel):
+    billing_month: date  # Any day of the month to bill
+
+
+class OverdueSweepJobParams(BaseModel):
+    include_ids: bool = False  # Also list the invoice ids marked overdue in the result
+
+
+class BillingCycleJobParams(BaseModel):
+    run_date: date  # Bill customers whose billing_day is this day
+
+
+class PdfRenderJobParams(BaseModel):
+    billing_period: str = Field(..., pattern=r"^\d{4}-\d{2}$")  # YYYY-MM
+
+
+# Schema for submitting a job
+class JobCreate(BaseModel):
+    job_type: str = Field(..., pattern="^(invoice_batch|overdue_sweep|billing_cycle|pdf_render)$")
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+# Schema for job in database (response)
+class Job(BaseModel):
+    id: int
+    job_type: str
+    params: Dict[str, Any]
+    status: str
+    cancel_requested: bool
+    attempts: int
+    progress_total: int
+    progress_done: int
+    success_count: int
+    error_count: int
+    errors: List[Dict[str, Any]]
+    result: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
+    created_by: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+# Schema for job in list (without error details)
+class JobInList(BaseModel):
+    id: int
+    job_type: str
+    status: str
+    attempts: int
+    progress_total: int
+    progress_done: int
+    success_count: int
+    error_count: int
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    model_config = ConfigDict(from_attributes=True)
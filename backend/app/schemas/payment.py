@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -68,6 +68,12 @@ class PaymentInList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+# Schema for one page of payments in cursor mode
+class PaymentPage(BaseModel):
+    items: List[PaymentInList]
+    next_cursor: Optional[str] = None  # None on the last page
+
+
 # Schema with customer and invoice details
 class PaymentWithDetails(Payment):
     customer: Optional["CustomerInPayment"] = None
@@ -104,3 +110,16 @@ class PaymentVerify(BaseModel):
 class PaymentReject(BaseModel):
     rejection_reason: str = Field(..., min_length=1)
     admin_notes: Optional[str] = None
+
+
+# Schema for batch verification
+class PaymentBatchVerify(BaseModel):
+    payment_ids: List[int] = Field(..., min_length=1, max_length=5000)
+    admin_notes: Optional[str] = None
+
+
+# Schema for batch rejection
+class PaymentBatchReject(BaseModel):
+    payment_ids: List[int] = Field(..., min_length=1, max_length=5000)
+    rejection_reason: str = Field(..., min_length=1)
+    admin_notes: Optional[str] = None
@@ -1,11 +1,26 @@
-from app.services.customer import CustomerService
+from app.services.numbering import NumberingService
+from app.services.rollup import RollupService
+from app.services.customer import CustomerService, AsyncCustomerService
 from app.services.package import PackageService
-from app.services.invoice import InvoiceService
-from app.services.payment import PaymentService
+from app.services.invoice import InvoiceService, AsyncInvoiceService
+from app.services.payment import PaymentService, AsyncPaymentService
+from app.services.bank_import import BankImportService
+from app.services.export import ExportService
+from app.services.invoice_pdf import InvoicePdfService
+from app.services.job import JobService
 
 __all__ = [
+    "NumberingService",
+    "RollupService",
     "CustomerService",
+    "AsyncCustomerService",
     "PackageService",
     "InvoiceService",
+    "AsyncInvoiceService",
     "PaymentService",
+    "AsyncPaymentService",
+    "BankImportService",
+    "ExportService",
+    "InvoicePdfService",
+    "JobService",
 ]
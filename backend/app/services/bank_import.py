@@ -0,0 +1,557 @@
+"""
+Bulk payment import from bank statements
+
+A bank mutation file (CSV export or MT940 text) is parsed line by line and
+processed in chunks of settings.PAYMENT_IMPORT_CHUNK_SIZE credit lines. For
+every chunk the open invoices its lines refer to (by invoice number in the
+transfer description, or by customer code) are loaded and locked with one
+query and indexed in memory by invoice number and by customer. Lines are
+matched against those indexes, and the matched payments are inserted
+already verified, together with the invoice and rollup updates, in one
+transaction per chunk.
+
+Matching rules:
+
+- A line quoting an invoice number pays that invoice, as long as it is
+  still open, the amount does not exceed what is outstanding and a quoted
+  customer code (if any) is the invoice's customer.
+- A line quoting only a customer code pays that customer's oldest open
+  invoice whose outstanding amount equals the line amount.
+- Lines whose bank reference was imported before are duplicates. Lines
+  without a reference are duplicates when a bank transfer without one has
+  the same date, amount, sender account and description.
+
+Everything else is returned in the report as unmatched, with the reason, for
+manual entry through POST /payments.
+"""
+import codecs
+import csv
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal, InvalidOperation
+from itertools import chain, islice
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.core.config import settings
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.services.payment import PaymentService
+from app.services.rollup import RollupService
+
+INVOICE_NUMBER_RE = re.compile(r"INV-\d{4}-\d{2}-\d+")
+CUSTOMER_CODE_RE = re.compile(r"CUST-\d+")
+
+OPEN_STATUSES = ("pending", "partial", "overdue")
+
+# Accepted CSV header names per field (compared lower-cased and stripped)
+CSV_HEADERS = {
+    "date": ("date", "tanggal", "tgl", "transaction date", "tanggal transaksi"),
+    "amount": ("amount", "jumlah", "nominal", "credit", "kredit", "mutasi"),
+    "type": ("type", "db/cr", "d/k", "dk", "jenis"),
+    "description": ("description", "keterangan", "berita", "remark", "remarks"),
+    "reference": ("reference", "reference number", "referensi", "no. referensi", "ref"),
+    "account_name": ("account name", "nama", "nama pengirim", "sender"),
+    "account_number": ("account number", "rekening", "no. rekening"),
+}
+
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d.%m.%Y")
+
+# :61:YYMMDD[MMDD](C|D|RC|RD)[funds code]amount(N|F|S)xxx[customer ref][//bank ref]
+MT940_STATEMENT_RE = re.compile(
+    r"^(?P<date>\d{6})(?:\d{4})?(?P<mark>R?[CD])[A-Z]?(?P<amount>\d+,\d*)"
+    r"[NFS][A-Z0-9]{3}(?P<customer_ref>[^/]*)(?://(?P<bank_ref>.*))?$"
+)
+MT940_TAG_RE = re.compile(r"^:(\d{2}[A-Z]?):(.*)$")
+
+
+class StatementParseError(ValueError):
+    """A statement line that could not be read"""
+
+
+@dataclass(frozen=True)
+class StatementLine:
+    """One credit (incoming transfer) of a bank statement"""
+    line_no: int
+    payment_date: date
+    amount: Decimal
+    description: str = ""
+    reference: Optional[str] = None
+    account_name: Optional[str] = None
+    account_number: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class SkippedLine:
+    """A statement line that is not imported (debit, or unreadable)"""
+    line_no: int
+    reason: str
+
+
+ParsedLine = Union[StatementLine, SkippedLine]
+
+
+def parse_amount(text: str) -> Decimal:
+    """
+    Parse a bank amount: 150000, 150.000, 150,000.00, 1.500.000,00, Rp 150.000
+
+    A trailing separator with exactly two digits after it is the decimal
+    separator; other separators group thousands.
+    """
+    cleaned = re.sub(r"(?i)rp|idr|\s", "", text).strip("+")
+    negative = cleaned.startswith("-") or (cleaned.startswith("(") and cleaned.endswith(")"))
+    cleaned = cleaned.strip("-()")
+
+    last_sep = max(cleaned.rfind("."), cleaned.rfind(","))
+    if last_sep != -1 and len(cleaned) - last_sep - 1 == 2:
+        whole, fraction = cleaned[:last_sep], cleaned[last_sep + 1:]
+    else:
+        whole, fraction = cleaned, "0"
+
+    try:
+        amount = Decimal(re.sub(r"[.,]", "", whole) + "." + fraction)
+    except InvalidOperation:
+        raise StatementParseError(f"invalid amount {text!r}")
+    return -amount if negative else amount
+
+
+def _parse_date(text: str) -> date:
+    for fmt in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), fmt).date()
+        except ValueError:
+            continue
+    raise StatementParseError(f"invalid date {text!r}")
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[ParsedLine]:
+    """Parse a CSV bank export with a header row (',', ';' or tab separated)"""
+    lines = iter(lines)
+    header = next(lines, "")
+    delimiter = max(",;\t", key=header.count)
+    columns = [name.strip().lower() for name in next(csv.reader([header], delimiter=delimiter))]
+
+    index = {}
+    for field, aliases in CSV_HEADERS.items():
+        for position, name in enumerate(columns):
+            if name in aliases:
+                index[field] = position
+                break
+
+    missing = {"date", "amount"} - index.keys()
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV header must contain {' and '.join(sorted(missing))} columns"
+        )
+
+    def field(row: List[str], name: str) -> Optional[str]:
+        position = index.get(name)
+        if position is None or position >= len(row):
+            return None
+        return row[position].strip() or None
+
+    for row_no, row in enumerate(csv.reader(lines, delimiter=delimiter), start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        try:
+            amount = parse_amount(field(row, "amount") or "")
+            payment_date = _parse_date(field(row, "date") or "")
+        except StatementParseError as e:
+            yield SkippedLine(row_no, f"parse error: {e}")
+            continue
+
+        kind = (field(row, "type") or "").upper()
+        if amount <= 0 or kind.startswith("D"):
+            yield SkippedLine(row_no, "debit")
+            continue
+
+        yield StatementLine(
+            line_no=row_no,
+            payment_date=payment_date,
+            amount=amount,
+            description=field(row, "description") or "",
+            reference=field(row, "reference"),
+            account_name=field(row, "account_name"),
+            account_number=field(row, "account_number")
+        )
+
+
+def parse_mt940(lines: Iterable[str]) -> Iterator[ParsedLine]:
+    """Parse MT940 statement text: :61: statement lines with their :86: details"""
+    pending = None  # (line_no, :61: value, [:86: parts])
+    tag = None
+
+    def flush(entry) -> ParsedLine:
+        line_no, value, details = entry
+        match = MT940_STATEMENT_RE.match(value)
+        if not match:
+            return SkippedLine(line_no, f"parse error: invalid :61: line {value!r}")
+        if match["mark"] not in ("C", "RD"):
+            return SkippedLine(line_no, "debit")
+
+        customer_ref = match["customer_ref"].strip()
+        reference = (match["bank_ref"] or "").strip() or (customer_ref if customer_ref != "NONREF" else None)
+        return StatementLine(
+            line_no=line_no,
+            payment_date=datetime.strptime(match["date"], "%y%m%d").date(),
+            amount=Decimal(match["amount"].replace(",", ".")),
+            description=" ".join(details),
+            reference=reference
+        )
+
+    for line_no, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        tagged = MT940_TAG_RE.match(line)
+        if tagged:
+            tag, value = tagged.groups()
+            if tag == "61":
+                if pending:
+                    yield flush(pending)
+                pending = (line_no, value, [])
+            elif tag == "86" and pending:
+                pending[2].append(value.strip())
+            elif tag in ("62F", "62M") and pending:
+                # Closing balance ends the statement lines
+                yield flush(pending)
+                pending = None
+        elif tag == "86" and pending and line and not line.startswith(("-}", "{")):
+            # :86: details continue on the following lines
+            pending[2].append(line.strip())
+
+    if pending:
+        yield flush(pending)
+
+
+def detect_format(first_line: str) -> str:
+    """mt940 for SWIFT-tagged text, csv otherwise"""
+    stripped = first_line.lstrip()
+    return "mt940" if stripped.startswith(("{1:", ":20:", ":940:")) or MT940_TAG_RE.match(stripped) else "csv"
+
+
+class BankImportService:
+    """
+    Bank statement import: parse, match against open invoices, create verified payments
+    """
+
+    @staticmethod
+    def parse(raw: BinaryIO, file_format: str = "auto") -> Iterator[ParsedLine]:
+        """Stream-parse an uploaded statement (UTF-8, BOM optional)"""
+        reader = codecs.getreader("utf-8-sig")(raw, errors="replace")
+        lines = iter(reader.readline, "")
+        first = next(lines, "")
+
+        if file_format == "auto":
+            file_format = detect_format(first)
+
+        lines = chain([first], lines)
+        return parse_mt940(lines) if file_format == "mt940" else parse_csv(lines)
+
+    @staticmethod
+    def _load_invoices(db: Session, lines: List[Tuple[StatementLine, List[str], List[str]]]) -> List[dict]:
+        """Open invoices referenced by a chunk, locked, oldest due first"""
+        numbers = {number for _, line_numbers, _ in lines for number in line_numbers}
+        codes = {code for _, _, line_codes in lines for code in line_codes}
+        if not numbers and not codes:
+            return []
+
+        conditions = []
+        if numbers:
+            conditions.append(Invoice.invoice_number.in_(numbers))
+        if codes:
+            conditions.append(and_(Customer.customer_code.in_(codes), Invoice.status.in_(OPEN_STATUSES)))
+
+        rows = db.execute(
+            select(
+                Invoice.id,
+                Invoice.invoice_number,
+                Invoice.customer_id,
+                Customer.customer_code,
+                Invoice.billing_period,
+                Invoice.status,
+                Invoice.total_amount,
+                Invoice.paid_amount,
+                Invoice.paid_at,
+                Invoice.due_date
+            ).join(
+                Customer, Customer.id == Invoice.customer_id
+            ).where(
+                or_(*conditions)
+            ).order_by(
+                # Locked in id order like payment verification, oldest due first below
+                Invoice.id
+            ).with_for_update(of=Invoice)
+        ).all()
+
+        rows = sorted(rows, key=lambda row: (row.due_date, row.id))
+        return [dict(row._asdict(), paid_amount=row.paid_amount or Decimal("0")) for row in rows]
+
+    @staticmethod
+    def _duplicate_key(line: StatementLine) -> tuple:
+        """What makes two lines the same transfer: the bank reference, or the line itself without one"""
+        if line.reference:
+            return ("reference", line.reference)
+        return (
+            "line",
+            line.payment_date,
+            line.amount,
+            (line.account_number or "")[:50] or None,
+            line.description or None
+        )
+
+    @staticmethod
+    def _existing_duplicates(db: Session, chunk: List[StatementLine]) -> set:
+        """Duplicate keys of the chunk's lines that already have a live bank transfer payment"""
+        live = (Payment.payment_method == "bank_transfer", Payment.status.in_(["pending", "verified"]))
+        existing = set()
+
+        references = {line.reference for line in chunk if line.reference}
+        if references:
+            existing.update(
+                ("reference", reference)
+                for reference in db.scalars(
+                    select(Payment.reference_number).where(Payment.reference_number.in_(references), *live)
+                )
+            )
+
+        unreferenced = [line for line in chunk if not line.reference]
+        if unreferenced:
+            rows = db.execute(
+                select(Payment.payment_date, Payment.amount, Payment.account_number, Payment.notes).where(
+                    Payment.reference_number.is_(None),
+                    Payment.payment_date.in_({line.payment_date for line in unreferenced}),
+                    Payment.amount.in_({line.amount for line in unreferenced}),
+                    *live
+                )
+            )
+            existing.update(("line", *row) for row in rows)
+        return existing
+
+    @staticmethod
+    def _match(
+        line: StatementLine,
+        numbers: List[str],
+        codes: List[str],
+        by_number: Dict[str, dict],
+        by_customer: Dict[str, List[dict]]
+    ) -> Tuple[Optional[dict], Optional[str]]:
+        """(invoice, None) for a match, (None, reason) otherwise"""
+        if numbers:
+            invoice = next((by_number[number] for number in numbers if number in by_number), None)
+            if invoice is None:
+                return None, f"invoice {numbers[0]} not found"
+            if codes and invoice["customer_code"] not in codes:
+                return None, f"invoice {invoice['invoice_number']} belongs to {invoice['customer_code']}"
+            if invoice["status"] not in OPEN_STATUSES:
+                return None, f"invoice {invoice['invoice_number']} is {invoice['status']}"
+            outstanding = invoice["total_amount"] - invoice["paid_amount"]
+            if line.amount > outstanding:
+                return None, f"amount exceeds outstanding {outstanding} of {invoice['invoice_number']}"
+            return invoice, None
+
+        if codes:
+            candidates = [invoice for code in codes for invoice in by_customer.get(code, [])]
+            if not candidates:
+                return None, f"no open invoice for {', '.join(codes)}"
+            for invoice in candidates:
+                if invoice["status"] in OPEN_STATUSES and invoice["total_amount"] - invoice["paid_amount"] == line.amount:
+                    return invoice, None
+            return None, "no open invoice with this amount"
+
+        return None, "no invoice number or customer code in description"
+
+    @staticmethod
+    def _import_chunk(
+        db: Session,
+        chunk: List[StatementLine],
+        bank_name: Optional[str],
+        verified_by: int,
+        seen_keys: set
+    ) -> Tuple[List[dict], List[dict]]:
+        """Match and write one chunk in one transaction; returns (matched, unmatched)"""
+        lines = []
+        for line in chunk:
+            text = f"{line.reference or ''} {line.description}".upper()
+            lines.append((line, INVOICE_NUMBER_RE.findall(text), CUSTOMER_CODE_RE.findall(text)))
+
+        # Hash indexes of the chunk's candidate invoices
+        by_number = {}
+        by_customer = defaultdict(list)
+        for invoice in BankImportService._load_invoices(db, lines):
+            by_number[invoice["invoice_number"]] = invoice
+            if invoice["status"] in OPEN_STATUSES:
+                by_customer[invoice["customer_code"]].append(invoice)
+
+        duplicates = seen_keys | BankImportService._existing_duplicates(db, chunk)
+
+        now = datetime.now(timezone.utc)
+        matched = []
+        unmatched = []
+        invoice_before = {}
+        for line, numbers, codes in lines:
+            key = BankImportService._duplicate_key(line)
+            if key in duplicates:
+                reason = "duplicate of an imported payment"
+                if not line.reference:
+                    reason += " (same date, amount, account and description, no bank reference)"
+                unmatched.append(BankImportService._report_line(line, reason))
+                continue
+
+            invoice, reason = BankImportService._match(line, numbers, codes, by_number, by_customer)
+            if invoice is None:
+                unmatched.append(BankImportService._report_line(line, reason))
+                continue
+
+            duplicates.add(key)
+
+            # Invoices are updated in memory so later lines see the new balance
+            invoice_before.setdefault(invoice["id"], RollupService.invoice_snapshot(invoice))
+            invoice["paid_amount"] += line.amount
+            if invoice["paid_amount"] >= invoice["total_amount"]:
+                invoice["status"] = "paid"
+                invoice["paid_at"] = now
+            else:
+                invoice["status"] = "partial"
+
+            matched.append({
+                "line": line,
+                "invoice": invoice,
+                "row": {
+                    "customer_id": invoice["customer_id"],
+                    "invoice_id": invoice["id"],
+                    "payment_date": line.payment_date,
+                    "amount": line.amount,
+                    "payment_method": "bank_transfer",
+                    "bank_name": bank_name,
+                    "account_number": (line.account_number or "")[:50] or None,
+                    "account_name": (line.account_name or "")[:255] or None,
+                    "reference_number": (line.reference or "")[:100] or None,
+                    "notes": line.description or None,
+                    "status": "verified",
+                    "verified_by": verified_by,
+                    "verified_at": now
+                }
+            })
+
+        if not matched:
+            db.rollback()
+            return [], unmatched
+
+        # Payment numbers in one block per month
+        by_month = defaultdict(list)
+        for entry in matched:
+            by_month[PaymentService.payment_number_prefix(entry["row"]["payment_date"])].append(entry["row"])
+        for rows in by_month.values():
+            numbers = PaymentService.allocate_payment_numbers(db, rows[0]["payment_date"], len(rows))
+            for row, number in zip(rows, numbers):
+                row["payment_number"] = number
+
+        try:
+            payment_ids = db.scalars(
+                insert(Payment).returning(Payment.id, sort_by_parameter_order=True),
+                [entry["row"] for entry in matched]
+            ).all()
+            invoices = {entry["invoice"]["id"]: entry["invoice"] for entry in matched}
+            db.execute(update(Invoice), [
+                {
+                    "id": invoice["id"],
+                    "paid_amount": invoice["paid_amount"],
+                    "status": invoice["status"],
+                    "paid_at": invoice["paid_at"],
+                    "updated_at": now
+                }
+                for invoice in invoices.values()
+            ])
+            RollupService.payments_changed(
+                db, [(None, RollupService.payment_snapshot(entry["row"])) for entry in matched]
+            )
+            RollupService.invoices_changed(
+                db, [(invoice_before[invoice_id], RollupService.invoice_snapshot(invoice)) for invoice_id, invoice in invoices.items()]
+            )
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            return [], unmatched + [
+                BankImportService._report_line(entry["line"], f"not saved: {e.orig}") for entry in matched
+            ]
+
+        seen_keys.update(BankImportService._duplicate_key(entry["line"]) for entry in matched)
+        return [
+            {
+                "line": entry["line"].line_no,
+                "payment_id": payment_id,
+                "payment_number": entry["row"]["payment_number"],
+                "invoice_number": entry["invoice"]["invoice_number"],
+                "amount": entry["row"]["amount"]
+            }
+            for entry, payment_id in zip(matched, payment_ids)
+        ], unmatched
+
+    @staticmethod
+    def _report_line(line: StatementLine, reason: str) -> dict:
+        return {
+            "line": line.line_no,
+            "date": line.payment_date.isoformat(),
+            "amount": line.amount,
+            "reference": line.reference,
+            "description": line.description,
+            "reason": reason
+        }
+
+    @staticmethod
+    def import_statement(
+        db: Session,
+        raw: BinaryIO,
+        file_format: str = "auto",
+        bank_name: Optional[str] = None,
+        verified_by: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> dict:
+        """Import a bank statement; returns the matched payments and the unmatched lines"""
+        chunk_size = chunk_size or settings.PAYMENT_IMPORT_CHUNK_SIZE
+        parsed = BankImportService.parse(raw, file_format)
+
+        matched = []
+        unmatched = []
+        skipped = []
+        seen_keys = set()
+        def credits() -> Iterator[StatementLine]:
+            for entry in parsed:
+                if isinstance(entry, SkippedLine):
+                    skipped.append(entry)
+                else:
+                    yield entry
+
+        credit_lines = credits()
+        try:
+            while True:
+                chunk = list(islice(credit_lines, chunk_size))
+                if not chunk:
+                    break
+                chunk_matched, chunk_unmatched = BankImportService._import_chunk(
+                    db, chunk, bank_name, verified_by, seen_keys
+                )
+                matched.extend(chunk_matched)
+                unmatched.extend(chunk_unmatched)
+        finally:
+            if matched:
+                cache.invalidate(*cache.PAYMENT_VERIFY_NAMESPACES)
+
+        return {
+            "lines": len(matched) + len(unmatched) + len(skipped),
+            "matched": len(matched),
+            "unmatched": len(unmatched),
+            "debits_skipped": sum(1 for entry in skipped if entry.reason == "debit"),
+            "parse_errors": [{"line": entry.line_no, "reason": entry.reason} for entry in skipped if entry.reason != "debit"],
+            "matched_amount": sum((entry["amount"] for entry in matched), Decimal("0")),
+            "payments": matched,
+            "unmatched_lines": unmatched
+        }
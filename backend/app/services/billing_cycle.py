@@ -0,0 +1,144 @@
+"""
+Daily billing cycle
+
+Every day the customers whose billing_day is today are billed (customers
+without one use settings.BILLING_CYCLE_DAY), so invoice generation and PDF
+rendering are spread over the month instead of landing on one day.
+
+Each billed day is checkpointed in billing_runs. The scheduler bills every
+day since the last checkpoint that has none yet (at most
+settings.BILLING_CATCHUP_DAYS back), so days missed while the service was
+down are caught up. A day is billed by a billing_cycle background job
+through the set-based batch path, which skips customers already billed for
+the period; re-running a day is harmless.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.billing_run import BillingRun
+from app.services.invoice import InvoiceService
+from app.services.invoice_pdf import InvoicePdfService
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: one scheduler pass at a time across processes
+_SCHEDULER_LOCK_KEY = 0x62696C6C  # "bill"
+
+
+class BillingCycleService:
+    """
+    Billing cycle service: which days are due, and billing one day
+    """
+
+    @staticmethod
+    def now() -> datetime:
+        """Current time in the billing time zone"""
+        return datetime.now(ZoneInfo(settings.TIMEZONE))
+
+    @staticmethod
+    def due_dates(db: Session, now: Optional[datetime] = None) -> List[date]:
+        """
+        Days that should have been billed by now but have no checkpoint
+
+        Today counts from settings.BILLING_RUN_HOUR on. Without any checkpoint
+        (first start) only today is due, so nothing is billed retroactively.
+        """
+        now = now or BillingCycleService.now()
+        last_due = now.date() if now.hour >= settings.BILLING_RUN_HOUR else now.date() - timedelta(days=1)
+
+        first_run = db.scalar(select(func.min(BillingRun.run_date)))
+        if first_run is None:
+            start = now.date()
+        else:
+            start = max(first_run, now.date() - timedelta(days=settings.BILLING_CATCHUP_DAYS))
+
+        done = set(db.scalars(select(BillingRun.run_date).where(BillingRun.run_date >= start)))
+        days = (start + timedelta(days=offset) for offset in range((last_due - start).days + 1))
+        return [day for day in days if day not in done]
+
+    @staticmethod
+    def schedule_due_runs(now: Optional[datetime] = None) -> List[int]:
+        """Submit a billing_cycle job per due day; returns the job ids"""
+        from app.services.job import JobService
+
+        # Several API processes may tick at once; only one schedules. The lock
+        # is session level (submit_job commits in between), so the session is
+        # bound to one connection that holds it.
+        with engine.connect() as connection:
+            locked = connection.scalar(select(func.pg_try_advisory_lock(_SCHEDULER_LOCK_KEY)))
+            connection.commit()
+            if not locked:
+                return []
+            try:
+                with Session(bind=connection) as db:
+                    return [
+                        JobService.submit_job(db, "billing_cycle", {"run_date": day}).id
+                        for day in BillingCycleService.due_dates(db, now)
+                    ]
+            finally:
+                connection.scalar(select(func.pg_advisory_unlock(_SCHEDULER_LOCK_KEY)))
+                connection.commit()
+
+    @staticmethod
+    def run_day(db: Session, run_date: date, progress=None, heartbeat=None, job_id: Optional[int] = None) -> dict:
+        """
+        Bill the customers whose billing day is run_date and checkpoint the day
+
+        progress is passed on to InvoiceService.generate_batch_invoices;
+        heartbeat() is called after every batch of PDFs rendered afterwards.
+        """
+        result = InvoiceService.generate_batch_invoices(
+            db=db,
+            billing_month=run_date,
+            billing_day=run_date.day,
+            skip_already_billed=True,
+            progress=progress
+        )
+        result.pop("error_details")
+        billing_period = run_date.strftime("%Y-%m")
+
+        values = {
+            "billing_period": billing_period,
+            "job_id": job_id,
+            "total_customers": result["total_customers"],
+            "invoices_created": result["success"],
+            "skipped": result["skipped"],
+            "errors": result["errors"],
+            "completed_at": func.now()
+        }
+        stmt = insert(BillingRun).values(run_date=run_date, **values)
+        db.execute(stmt.on_conflict_do_update(index_elements=["run_date"], set_=values))
+        db.commit()
+
+        # Render the day's PDFs now rather than all at once at month end
+        if settings.BILLING_RENDER_PDFS and result["success"]:
+            result["pdf"] = InvoicePdfService.render_period(
+                billing_period,
+                invoice_date=run_date,
+                progress=(lambda *_: heartbeat()) if heartbeat else None
+            )
+
+        result["run_date"] = run_date.isoformat()
+        result["billing_period"] = billing_period
+        return result
+
+
+async def run_scheduler() -> None:
+    """Check for due billing days every BILLING_SCHEDULER_INTERVAL seconds (in-process executor)"""
+    while True:
+        try:
+            job_ids = await asyncio.to_thread(BillingCycleService.schedule_due_runs)
+            if job_ids:
+                logger.info("Scheduled billing cycle jobs %s", job_ids)
+        except Exception:
+            logger.exception("Billing cycle scheduler pass failed")
+        await asyncio.sleep(settings.BILLING_SCHEDULER_INTERVAL)
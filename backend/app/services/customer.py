@@ -1,12 +1,66 @@
+import re
 from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import Select, case, func, or_, select
 from datetime import datetime
 from fastapi import HTTPException, status
 
 from app.models.customer import Customer
 from app.models.package import Package
+from app.models.rollup import CustomerStatusRollup
 from app.schemas.customer import CustomerCreate, CustomerUpdate
+from app.services.rollup import RollupService
+from app.core import cache, pagination
+
+# Keyset order of customer lists: (created_at, id) newest first
+CUSTOMER_LIST_ORDER = [(Customer.created_at, True), (Customer.id, True)]
+
+# Search terms treated as (part of) a phone number
+_PHONE_TERM = re.compile(r"\+?[0-9][0-9 ()\-.]{2,}")
+
+# 62 + the shortest Indonesian subscriber number (8xx-xxx-xxx)
+_MIN_INTERNATIONAL_DIGITS = 11
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input matches literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def customers_statement(
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    package_id: Optional[int] = None,
+    city: Optional[str] = None,
+    ranked: bool = False
+) -> Select:
+    """
+    SELECT of customers matching the list filters (sync and async)
+    
+    With ranked=True the statement is ordered for offset pages: best
+    search matches first, then newest first. Otherwise it is unordered.
+    """
+    stmt = select(Customer)
+    
+    if search:
+        stmt = stmt.where(CustomerService.search_filter(search))
+    
+    if status:
+        stmt = stmt.where(Customer.status == status)
+    
+    if package_id:
+        stmt = stmt.where(Customer.package_id == package_id)
+    
+    if city:
+        stmt = stmt.where(Customer.city.ilike(f"%{city}%"))
+    
+    if ranked:
+        if search:
+            stmt = stmt.order_by(*CustomerService.search_ranking(search))
+        stmt = stmt.order_by(Customer.created_at.desc(), Customer.id.desc())
+    
+    return stmt
 
 
 class CustomerService:
@@ -40,46 +94,123 @@ class CustomerService:
         package_id: Optional[int] = None,
         city: Optional[str] = None
     ) -> List[Customer]:
-        """Get customers list with filters"""
-        query = db.query(Customer)
+        """Get customers list with filters, best search matches first"""
+        stmt = customers_statement(search, status, package_id, city, ranked=True)
+        return db.scalars(stmt.offset(skip).limit(limit)).all()
+    
+    @staticmethod
+    def get_customers_page(
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        package_id: Optional[int] = None,
+        city: Optional[str] = None
+    ) -> dict:
+        """
+        Get one page of customers in keyset order (newest first)
         
-        if search:
-            search_filter = or_(
-                Customer.full_name.ilike(f"%{search}%"),
-                Customer.customer_code.ilike(f"%{search}%"),
-                Customer.phone.ilike(f"%{search}%"),
-                Customer.email.ilike(f"%{search}%")
-            )
-            query = query.filter(search_filter)
+        Search results are filtered the same way as get_customers but keep
+        the stable newest-first order instead of match ranking, which cannot
+        be continued from a cursor.
+        """
+        stmt = customers_statement(search, status, package_id, city)
+        return pagination.paginate(db, stmt, CUSTOMER_LIST_ORDER, cursor, limit)
+    
+    @staticmethod
+    def normalize_phone(value: str) -> str:
+        """Digits only with the national prefix, e.g. +62 812-3456 -> 08123456"""
+        digits = re.sub(r"\D", "", value or "")
+        if digits.startswith("62"):
+            digits = "0" + digits[2:]
+        return digits
+    
+    @staticmethod
+    def phone_search_terms(search: str) -> List[str]:
+        """
+        Normalized phone fragments a search term should match
         
-        if status:
-            query = query.filter(Customer.status == status)
+        Only a term in international form (+62 812...) is converted to the
+        national prefix. Bare digits may be a fragment from anywhere in the
+        number ("6278" of 0812-6278-...), so they are searched as typed; a
+        bare 62... term long enough to be a whole number is searched in
+        national form as well.
+        """
+        term = search.strip()
+        if not _PHONE_TERM.fullmatch(term):
+            return []
+        digits = re.sub(r"\D", "", term)
+        if term.startswith("+"):
+            return [CustomerService.normalize_phone(digits)]
+        if digits.startswith("62") and len(digits) >= _MIN_INTERNATIONAL_DIGITS:
+            return [digits, CustomerService.normalize_phone(digits)]
+        return [digits]
+    
+    @staticmethod
+    def search_filter(search: str):
+        """
+        Match name, code, email or phone containing the search term
         
-        if package_id:
-            query = query.filter(Customer.package_id == package_id)
+        Every predicate is an ILIKE '%term%' on a pg_trgm GIN indexed column,
+        so Postgres combines the indexes with a BitmapOr instead of scanning
+        the table. Phone numbers are compared in normalized form.
+        """
+        term = search.strip()
+        pattern = f"%{_escape_like(term)}%"
+        conditions = [
+            Customer.full_name.ilike(pattern, escape="\\"),
+            Customer.customer_code.ilike(pattern, escape="\\"),
+            Customer.email.ilike(pattern, escape="\\"),
+        ]
         
-        if city:
-            query = query.filter(Customer.city.ilike(f"%{city}%"))
+        for phone in CustomerService.phone_search_terms(term):
+            conditions.append(Customer.phone_normalized.like(f"%{phone}%"))
         
-        query = query.order_by(Customer.created_at.desc())
-        return query.offset(skip).limit(limit).all()
+        return or_(*conditions)
     
     @staticmethod
-    def get_customers_count(db: Session, status: Optional[str] = None) -> dict:
-        """Get customers count by status"""
-        query = db.query(Customer)
+    def search_ranking(search: str) -> list:
+        """ORDER BY terms: exact matches, then prefix matches, then name similarity"""
+        term = search.strip()
+        phones = CustomerService.phone_search_terms(term)
+        prefix = f"{_escape_like(term)}%"
         
-        if status:
-            query = query.filter(Customer.status == status)
+        exact = [
+            func.lower(Customer.customer_code) == term.lower(),
+            func.lower(Customer.email) == term.lower(),
+        ]
+        if phones:
+            exact.append(Customer.phone_normalized.in_(phones))
+        
+        match_rank = case(
+            (or_(*exact), 0),
+            (or_(
+                Customer.full_name.ilike(prefix, escape="\\"),
+                Customer.customer_code.ilike(prefix, escape="\\")
+            ), 1),
+            else_=2
+        )
+        return [match_rank, func.word_similarity(term, Customer.full_name).desc()]
+    
+    @staticmethod
+    def get_customers_count(db: Session, status: Optional[str] = None) -> dict:
+        """Get customers count by status (from the customer status rollup)"""
+        counts = dict(
+            db.query(
+                CustomerStatusRollup.status,
+                func.sum(CustomerStatusRollup.customer_count)
+            ).group_by(CustomerStatusRollup.status).all()
+        )
         
-        total = query.count()
+        total = counts.get(status, 0) if status else sum(counts.values())
         
         return {
-            "total": total,
-            "active": db.query(Customer).filter(Customer.status == "active").count(),
-            "suspended": db.query(Customer).filter(Customer.status == "suspended").count(),
-            "inactive": db.query(Customer).filter(Customer.status == "inactive").count(),
-            "terminated": db.query(Customer).filter(Customer.status == "terminated").count()
+            "total": int(total or 0),
+            "active": int(counts.get("active", 0)),
+            "suspended": int(counts.get("suspended", 0)),
+            "inactive": int(counts.get("inactive", 0)),
+            "terminated": int(counts.get("terminated", 0))
         }
     
     @staticmethod
@@ -127,7 +258,9 @@ class CustomerService:
         )
         
         db.add(customer)
+        RollupService.customer_changed(db, None, RollupService.customer_snapshot(customer))
         db.commit()
+        cache.invalidate(*cache.CUSTOMER_NAMESPACES)
         db.refresh(customer)
         
         return customer
@@ -159,12 +292,16 @@ class CustomerService:
                     detail="Package not found"
                 )
         
+        before = RollupService.customer_snapshot(customer)
+        
         # Update fields
         update_data = customer_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(customer, field, value)
         
+        RollupService.customer_changed(db, before, RollupService.customer_snapshot(customer))
         db.commit()
+        cache.invalidate(*cache.CUSTOMER_NAMESPACES)
         db.refresh(customer)
         
         return customer
@@ -174,21 +311,29 @@ class CustomerService:
         """Soft delete customer"""
         customer = CustomerService.get_customer_by_id(db, customer_id)
         
+        before = RollupService.customer_snapshot(customer)
+        
         customer.status = "terminated"
         customer.is_active = False
         customer.termination_date = datetime.utcnow()
         
+        RollupService.customer_changed(db, before, RollupService.customer_snapshot(customer))
         db.commit()
+        cache.invalidate(*cache.CUSTOMER_NAMESPACES)
     
     @staticmethod
     def suspend_customer(db: Session, customer_id: int) -> Customer:
         """Suspend customer"""
         customer = CustomerService.get_customer_by_id(db, customer_id)
         
+        before = RollupService.customer_snapshot(customer)
+        
         customer.status = "suspended"
         customer.is_active = False
         
+        RollupService.customer_changed(db, before, RollupService.customer_snapshot(customer))
         db.commit()
+        cache.invalidate(*cache.CUSTOMER_NAMESPACES)
         db.refresh(customer)
         
         return customer
@@ -198,13 +343,62 @@ class CustomerService:
         """Activate customer"""
         customer = CustomerService.get_customer_by_id(db, customer_id)
         
+        before = RollupService.customer_snapshot(customer)
+        
         customer.status = "active"
         customer.is_active = True
         
         if not customer.activation_date:
             customer.activation_date = datetime.utcnow()
         
+        RollupService.customer_changed(db, before, RollupService.customer_snapshot(customer))
         db.commit()
+        cache.invalidate(*cache.CUSTOMER_NAMESPACES)
         db.refresh(customer)
         
         return customer
+
+
+class AsyncCustomerService:
+    """
+    AsyncSession counterparts of the CustomerService read methods
+    """
+    
+    @staticmethod
+    async def get_customers(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 20,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        package_id: Optional[int] = None,
+        city: Optional[str] = None
+    ) -> List[Customer]:
+        """Get customers list with filters, best search matches first"""
+        stmt = customers_statement(search, status, package_id, city, ranked=True)
+        return (await db.scalars(stmt.offset(skip).limit(limit))).all()
+    
+    @staticmethod
+    async def get_customers_page(
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        search: Optional[str] = None,
+        status: Optional[str] = None,
+        package_id: Optional[int] = None,
+        city: Optional[str] = None
+    ) -> dict:
+        """Get one page of customers in keyset order (newest first)"""
+        stmt = customers_statement(search, status, package_id, city)
+        return await pagination.paginate_async(db, stmt, CUSTOMER_LIST_ORDER, cursor, limit)
+    
+    @staticmethod
+    async def get_customer_by_id(db: AsyncSession, customer_id: int) -> Customer:
+        """Get customer by ID with its package loaded (no lazy loads in async)"""
+        customer = await db.get(Customer, customer_id, options=[selectinload(Customer.package)])
+        if not customer:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Customer not found"
+            )
+        return customer
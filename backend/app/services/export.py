@@ -0,0 +1,232 @@
+"""
+Streaming CSV/XLSX exports of customers, invoices and payments
+
+Rows come from a server-side cursor in chunks of settings.EXPORT_CHUNK_SIZE
+and are written out as they arrive, so memory stays flat regardless of the
+export size. CSV is streamed to the client chunk by chunk. XLSX is a zip
+archive that openpyxl can only finalize at the end, so the workbook is
+written in write-only mode to a temporary file and streamed from there.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy import Select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.package import Package
+from app.models.payment import Payment
+from app.services.customer import CUSTOMER_LIST_ORDER, customers_statement
+from app.services.invoice import INVOICE_LIST_ORDER, invoices_statement
+from app.services.payment import PAYMENT_LIST_ORDER, payments_statement
+
+# Excel's row limit per worksheet (header included)
+XLSX_MAX_ROWS = 1_048_576
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+}
+
+# (header, column) pairs of each export
+CUSTOMER_COLUMNS = [
+    ("Customer Code", Customer.customer_code),
+    ("Full Name", Customer.full_name),
+    ("Email", Customer.email),
+    ("Phone", Customer.phone),
+    ("Address", Customer.address),
+    ("City", Customer.city),
+    ("Province", Customer.province),
+    ("Postal Code", Customer.postal_code),
+    ("Package", Package.name),
+    ("Status", Customer.status),
+    ("Billing Day", Customer.billing_day),
+    ("Installation Date", Customer.installation_date),
+    ("Activation Date", Customer.activation_date),
+    ("Created At", Customer.created_at),
+]
+
+INVOICE_COLUMNS = [
+    ("Invoice Number", Invoice.invoice_number),
+    ("Customer Code", Customer.customer_code),
+    ("Customer Name", Customer.full_name),
+    ("Billing Period", Invoice.billing_period),
+    ("Invoice Date", Invoice.invoice_date),
+    ("Due Date", Invoice.due_date),
+    ("Subtotal", Invoice.subtotal),
+    ("Discount", Invoice.discount),
+    ("Late Fee", Invoice.late_fee),
+    ("Tax", Invoice.tax),
+    ("Total Amount", Invoice.total_amount),
+    ("Paid Amount", Invoice.paid_amount),
+    ("Status", Invoice.status),
+    ("Paid At", Invoice.paid_at),
+    ("Created At", Invoice.created_at),
+]
+
+PAYMENT_COLUMNS = [
+    ("Payment Number", Payment.payment_number),
+    ("Invoice Number", Invoice.invoice_number),
+    ("Customer Code", Customer.customer_code),
+    ("Customer Name", Customer.full_name),
+    ("Payment Date", Payment.payment_date),
+    ("Amount", Payment.amount),
+    ("Payment Method", Payment.payment_method),
+    ("Bank Name", Payment.bank_name),
+    ("Reference Number", Payment.reference_number),
+    ("Status", Payment.status),
+    ("Verified At", Payment.verified_at),
+    ("Created At", Payment.created_at),
+]
+
+Columns = Sequence[Tuple[str, object]]
+
+
+def _columns_statement(stmt: Select, columns: Columns, order_by) -> Select:
+    """Narrow a list statement (keeping its filters) to the export columns"""
+    return stmt.with_only_columns(
+        *[column for _, column in columns], maintain_column_froms=True
+    ).order_by(*[
+        column.desc() if descending else column.asc()
+        for column, descending in order_by
+    ])
+
+
+def customers_export_statement(
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    package_id: Optional[int] = None,
+    city: Optional[str] = None
+) -> Select:
+    stmt = customers_statement(search=search, status=status, package_id=package_id, city=city)
+    stmt = _columns_statement(stmt, CUSTOMER_COLUMNS, CUSTOMER_LIST_ORDER)
+    return stmt.outerjoin(Package, Customer.package_id == Package.id)
+
+
+def invoices_export_statement(
+    customer_id: Optional[int] = None,
+    status: Optional[str] = None,
+    month: Optional[str] = None
+) -> Select:
+    stmt = invoices_statement(customer_id=customer_id, status=status, month=month)
+    stmt = _columns_statement(stmt, INVOICE_COLUMNS, INVOICE_LIST_ORDER)
+    return stmt.join(Customer, Invoice.customer_id == Customer.id)
+
+
+def payments_export_statement(
+    customer_id: Optional[int] = None,
+    invoice_id: Optional[int] = None,
+    status: Optional[str] = None,
+    payment_method: Optional[str] = None
+) -> Select:
+    stmt = payments_statement(
+        customer_id=customer_id,
+        invoice_id=invoice_id,
+        status=status,
+        payment_method=payment_method
+    )
+    stmt = _columns_statement(stmt, PAYMENT_COLUMNS, PAYMENT_LIST_ORDER)
+    return stmt.join(Customer, Payment.customer_id == Customer.id).outerjoin(
+        Invoice, Payment.invoice_id == Invoice.id
+    )
+
+
+class ExportService:
+    """
+    Export service: stream list query results as CSV or XLSX
+    """
+
+    @staticmethod
+    def iter_chunks(stmt: Select) -> Iterator[List[tuple]]:
+        """
+        Yield result rows in chunks from a server-side cursor
+
+        Uses its own session: the request's session is closed before a
+        streaming response body is sent.
+        """
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                stmt.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE)
+            )
+            for chunk in result.partitions():
+                yield chunk
+        finally:
+            db.close()
+
+    @staticmethod
+    def iter_csv(stmt: Select, columns: Columns) -> Iterator[bytes]:
+        """Encode rows as CSV, one block per fetched chunk"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # BOM so Excel opens the UTF-8 file with the right encoding
+        buffer.write("\ufeff")
+        writer.writerow([header for header, _ in columns])
+
+        for chunk in ExportService.iter_chunks(stmt):
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def iter_xlsx(stmt: Select, columns: Columns, title: str) -> Iterator[bytes]:
+        """Write rows to a write-only workbook on disk, then stream the file"""
+        tz = ZoneInfo(settings.TIMEZONE)
+        headers = [header for header, _ in columns]
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(title=title)
+        sheet.append(headers)
+        sheet_rows, sheet_count = 1, 1
+
+        for chunk in ExportService.iter_chunks(stmt):
+            for row in chunk:
+                # Continue on a new sheet once one is full
+                if sheet_rows == XLSX_MAX_ROWS:
+                    sheet_count += 1
+                    sheet = workbook.create_sheet(title=f"{title} {sheet_count}")
+                    sheet.append(headers)
+                    sheet_rows = 1
+                sheet_rows += 1
+                # Excel has no time zones: store local wall-clock time
+                sheet.append([
+                    value.astimezone(tz).replace(tzinfo=None)
+                    if isinstance(value, datetime) and value.tzinfo else value
+                    for value in row
+                ])
+
+        with tempfile.TemporaryFile() as file:
+            workbook.save(file)
+            file.seek(0)
+            while True:
+                data = file.read(64 * 1024)
+                if not data:
+                    break
+                yield data
+
+    @staticmethod
+    def response(stmt: Select, columns: Columns, name: str, file_format: str) -> StreamingResponse:
+        """StreamingResponse with the export as an attachment"""
+        if file_format == "xlsx":
+            body = ExportService.iter_xlsx(stmt, columns, title=name.capitalize())
+        else:
+            body = ExportService.iter_csv(stmt, columns)
+
+        filename = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{file_format}"
+        return StreamingResponse(
+            body,
+            media_type=MEDIA_TYPES[file_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
@@ -0,0 +1,424 @@
+"""
+Invoice PDF rendering
+
+The page layout is compiled once per process (InvoiceTemplate): fonts are
+registered, and the static parts of the page (letterhead, table headings,
+footer) are built as a reportlab Drawing that every invoice just stamps.
+Rendering works on plain dict snapshots of invoice rows so it can run in
+worker processes.
+
+Rendered files are cached on disk, addressed by a hash of the invoice id,
+its updated_at and TEMPLATE_VERSION, so an invoice is only rendered again
+after it changed (or the layout did). Bulk rendering of a billing period
+fans out across a process pool and is written straight into a ZIP stream.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing, Line, Rect, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so cached files are rendered again
+TEMPLATE_VERSION = 1
+
+# Invoice and customer fields a PDF needs
+SNAPSHOT_COLUMNS = [
+    Invoice.id,
+    Invoice.invoice_number,
+    Invoice.billing_period,
+    Invoice.period_start,
+    Invoice.period_end,
+    Invoice.invoice_date,
+    Invoice.due_date,
+    Invoice.subtotal,
+    Invoice.discount,
+    Invoice.late_fee,
+    Invoice.tax,
+    Invoice.total_amount,
+    Invoice.paid_amount,
+    Invoice.status,
+    Invoice.description,
+    Invoice.items,
+    Invoice.notes,
+    Invoice.created_at,
+    Invoice.updated_at,
+    Customer.customer_code,
+    Customer.full_name,
+    Customer.address,
+    Customer.city,
+    Customer.province,
+    Customer.postal_code,
+    Customer.phone,
+    Customer.email,
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 40
+
+
+def snapshot_statement() -> Select:
+    """SELECT of invoice snapshots (invoice joined with its customer)"""
+    return select(*SNAPSHOT_COLUMNS).join(Customer, Invoice.customer_id == Customer.id)
+
+
+def _period_filter(month: str, invoice_date: Optional[date]) -> list:
+    conditions = [Invoice.billing_period == month]
+    if invoice_date:
+        conditions.append(Invoice.invoice_date == invoice_date)
+    return conditions
+
+
+def format_money(value) -> str:
+    """Rupiah with dot thousands separators, e.g. Rp 1.250.000"""
+    amount = Decimal(value or 0).quantize(Decimal("1"))
+    return "Rp " + f"{amount:,}".replace(",", ".")
+
+
+def _line_items(snapshot: dict) -> List[Tuple[str, Decimal]]:
+    """(description, amount) rows from the items JSON, falling back to the subtotal"""
+    try:
+        items = json.loads(snapshot["items"] or "null")
+    except ValueError:
+        items = None
+    if isinstance(items, dict):
+        items = [items]
+    if isinstance(items, list) and items and all(isinstance(item, dict) for item in items):
+        return [
+            (str(item.get("package") or item.get("description") or snapshot["description"] or "-"),
+             Decimal(str(item.get("price") or item.get("amount") or 0)))
+            for item in items
+        ]
+    return [(snapshot["description"] or "Internet Service", snapshot["subtotal"])]
+
+
+class InvoiceTemplate:
+    """Invoice layout with fonts and static page elements prepared once"""
+
+    def __init__(self):
+        self.font, self.font_bold = self._register_fonts()
+        self.static = self._build_static()
+
+    @staticmethod
+    def _register_fonts() -> Tuple[str, str]:
+        if not settings.INVOICE_PDF_FONT:
+            return "Helvetica", "Helvetica-Bold"
+        pdfmetrics.registerFont(TTFont("InvoiceFont", settings.INVOICE_PDF_FONT))
+        bold = settings.INVOICE_PDF_FONT_BOLD or settings.INVOICE_PDF_FONT
+        pdfmetrics.registerFont(TTFont("InvoiceFont-Bold", bold))
+        return "InvoiceFont", "InvoiceFont-Bold"
+
+    def _build_static(self) -> Drawing:
+        drawing = Drawing(PAGE_WIDTH, PAGE_HEIGHT)
+        top = PAGE_HEIGHT - MARGIN
+
+        # Letterhead
+        drawing.add(Rect(0, top - 30, PAGE_WIDTH, 70, fillColor=colors.HexColor("#1f4e79"), strokeColor=None))
+        drawing.add(String(MARGIN, top - 5, settings.INVOICE_COMPANY_NAME,
+                           fontName=self.font_bold, fontSize=18, fillColor=colors.white))
+        if settings.INVOICE_COMPANY_ADDRESS:
+            drawing.add(String(MARGIN, top - 20, settings.INVOICE_COMPANY_ADDRESS,
+                               fontName=self.font, fontSize=9, fillColor=colors.white))
+        drawing.add(String(PAGE_WIDTH - MARGIN, top - 5, "INVOICE", textAnchor="end",
+                           fontName=self.font_bold, fontSize=18, fillColor=colors.white))
+
+        # Labels
+        drawing.add(String(MARGIN, top - 70, "Bill To", fontName=self.font_bold, fontSize=10))
+        drawing.add(String(PAGE_WIDTH / 2 + 20, top - 70, "Invoice No.", fontName=self.font_bold, fontSize=10))
+        for i, label in enumerate(("Billing Period", "Invoice Date", "Due Date", "Status")):
+            drawing.add(String(PAGE_WIDTH / 2 + 20, top - 100 - i * 15, label, fontName=self.font, fontSize=9))
+
+        # Line item table heading
+        table_top = top - 190
+        drawing.add(Rect(MARGIN, table_top - 6, PAGE_WIDTH - 2 * MARGIN, 20,
+                         fillColor=colors.HexColor("#dde6f0"), strokeColor=None))
+        drawing.add(String(MARGIN + 6, table_top, "Description", fontName=self.font_bold, fontSize=10))
+        drawing.add(String(PAGE_WIDTH - MARGIN - 6, table_top, "Amount", textAnchor="end",
+                           fontName=self.font_bold, fontSize=10))
+
+        # Footer
+        drawing.add(Line(MARGIN, MARGIN + 30, PAGE_WIDTH - MARGIN, MARGIN + 30, strokeColor=colors.grey))
+        drawing.add(String(PAGE_WIDTH / 2, MARGIN + 15,
+                           "Please include the invoice number with your payment. Thank you.",
+                           textAnchor="middle", fontName=self.font, fontSize=8, fillColor=colors.grey))
+        return drawing
+
+    def render(self, snapshot: dict) -> bytes:
+        """Render one invoice snapshot to PDF bytes"""
+        buffer = BytesIO()
+        # invariant: identical input gives identical bytes
+        pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1, pageCompression=1)
+        pdf.setTitle(f"Invoice {snapshot['invoice_number']}")
+        renderPDF.draw(self.static, pdf, 0, 0)
+
+        top = PAGE_HEIGHT - MARGIN
+        right = PAGE_WIDTH - MARGIN
+
+        # Customer
+        pdf.setFont(self.font_bold, 10)
+        pdf.drawString(MARGIN, top - 85, snapshot["full_name"])
+        pdf.setFont(self.font, 9)
+        lines = [
+            snapshot["customer_code"],
+            snapshot["address"],
+            ", ".join(part for part in (snapshot["city"], snapshot["province"], snapshot["postal_code"]) if part),
+            snapshot["phone"],
+            snapshot["email"],
+        ]
+        y = top - 100
+        for line in lines:
+            if line:
+                pdf.drawString(MARGIN, y, line[:70])
+                y -= 13
+
+        # Invoice details
+        pdf.setFont(self.font_bold, 10)
+        pdf.drawRightString(right, top - 70, snapshot["invoice_number"])
+        pdf.setFont(self.font, 9)
+        for i, value in enumerate((
+            snapshot["billing_period"],
+            snapshot["invoice_date"].strftime("%d %b %Y"),
+            snapshot["due_date"].strftime("%d %b %Y"),
+            (snapshot["status"] or "pending").upper(),
+        )):
+            pdf.drawRightString(right, top - 100 - i * 15, value)
+
+        # Line items
+        y = top - 215
+        for description, amount in _line_items(snapshot):
+            pdf.drawString(MARGIN + 6, y, description[:80])
+            pdf.drawRightString(right - 6, y, format_money(amount))
+            y -= 16
+
+        # Totals
+        y -= 10
+        pdf.line(PAGE_WIDTH / 2, y + 8, right, y + 8)
+        totals = [
+            ("Subtotal", snapshot["subtotal"]),
+            ("Discount", -(snapshot["discount"] or 0)),
+            ("Late Fee", snapshot["late_fee"]),
+            ("Tax", snapshot["tax"]),
+        ]
+        for label, amount in totals:
+            if amount:
+                pdf.drawString(PAGE_WIDTH / 2 + 20, y - 6, label)
+                pdf.drawRightString(right - 6, y - 6, format_money(amount))
+                y -= 15
+
+        pdf.setFont(self.font_bold, 11)
+        pdf.drawString(PAGE_WIDTH / 2 + 20, y - 10, "Total")
+        pdf.drawRightString(right - 6, y - 10, format_money(snapshot["total_amount"]))
+        if snapshot["paid_amount"]:
+            pdf.setFont(self.font, 9)
+            pdf.drawString(PAGE_WIDTH / 2 + 20, y - 28, "Paid")
+            pdf.drawRightString(right - 6, y - 28, format_money(snapshot["paid_amount"]))
+            pdf.drawString(PAGE_WIDTH / 2 + 20, y - 43, "Balance Due")
+            pdf.drawRightString(
+                right - 6, y - 43, format_money(snapshot["total_amount"] - snapshot["paid_amount"])
+            )
+
+        if snapshot["notes"]:
+            pdf.setFont(self.font, 9)
+            pdf.drawString(MARGIN, MARGIN + 50, snapshot["notes"][:110])
+
+        pdf.showPage()
+        pdf.save()
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=1)
+def get_template() -> InvoiceTemplate:
+    """The process-wide compiled template"""
+    return InvoiceTemplate()
+
+
+def render_invoice_pdf(snapshot: dict) -> bytes:
+    """Render a snapshot with the process template (process pool entry point)"""
+    return get_template().render(snapshot)
+
+
+def cache_path(snapshot: dict) -> str:
+    """Content address of an invoice PDF: id, last change and template version"""
+    changed = snapshot["updated_at"] or snapshot["created_at"]
+    key = hashlib.sha256(
+        f"{snapshot['id']}:{changed.isoformat() if changed else ''}:{TEMPLATE_VERSION}".encode()
+    ).hexdigest()
+    return os.path.join(settings.INVOICE_PDF_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def _read_cached(snapshot: dict) -> Optional[bytes]:
+    try:
+        with open(cache_path(snapshot), "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_cached(snapshot: dict, pdf: bytes) -> None:
+    path = cache_path(snapshot)
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(pdf)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("Could not cache invoice PDF %s: %s", snapshot["invoice_number"], e)
+
+
+class _ZipStream:
+    """Write-only file object collecting what ZipFile writes between reads"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class InvoicePdfService:
+    """
+    Invoice PDF service: single and bulk rendering with an on-disk cache
+    """
+
+    @staticmethod
+    def get_invoice_pdf(db: Session, invoice_id: int) -> Tuple[str, bytes]:
+        """(invoice_number, PDF bytes) of one invoice, rendered on a cache miss"""
+        row = db.execute(snapshot_statement().where(Invoice.id == invoice_id)).first()
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Invoice not found"
+            )
+
+        snapshot = row._asdict()
+        pdf = _read_cached(snapshot)
+        if pdf is None:
+            pdf = render_invoice_pdf(snapshot)
+            _write_cached(snapshot, pdf)
+        return snapshot["invoice_number"], pdf
+
+    @staticmethod
+    def iter_period(month: str, invoice_date: Optional[date] = None) -> Iterator[Tuple[dict, bytes, bool]]:
+        """
+        Yield (snapshot, pdf, rendered) for every invoice of a billing period
+        (optionally only those dated invoice_date)
+
+        Snapshots are read in batches of settings.INVOICE_PDF_BATCH_SIZE; cache
+        misses of a batch are rendered across the process pool, which is only
+        started once the first miss shows up. Uses its own session so it can
+        back a streaming response.
+        """
+        stmt = snapshot_statement().where(
+            *_period_filter(month, invoice_date)
+        ).order_by(Invoice.invoice_number)
+
+        db = SessionLocal()
+        executor: Optional[ProcessPoolExecutor] = None
+        try:
+            result = db.execute(stmt.execution_options(yield_per=settings.INVOICE_PDF_BATCH_SIZE))
+            for rows in result.partitions():
+                snapshots = [row._asdict() for row in rows]
+                pdfs: Dict[int, bytes] = {}
+                missing = []
+                for snapshot in snapshots:
+                    cached = _read_cached(snapshot)
+                    if cached is None:
+                        missing.append(snapshot)
+                    else:
+                        pdfs[snapshot["id"]] = cached
+
+                if missing:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(
+                            max_workers=settings.INVOICE_PDF_WORKERS,
+                            mp_context=multiprocessing.get_context("spawn")
+                        )
+                    chunksize = max(1, len(missing) // (settings.INVOICE_PDF_WORKERS * 4))
+                    for snapshot, pdf in zip(missing, executor.map(render_invoice_pdf, missing, chunksize=chunksize)):
+                        _write_cached(snapshot, pdf)
+                        pdfs[snapshot["id"]] = pdf
+
+                rendered = {snapshot["id"] for snapshot in missing}
+                for snapshot in snapshots:
+                    yield snapshot, pdfs[snapshot["id"]], snapshot["id"] in rendered
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            db.close()
+
+    @staticmethod
+    def iter_period_zip(month: str) -> Iterator[bytes]:
+        """Stream the PDFs of a billing period as a ZIP archive"""
+        stream = _ZipStream()
+        # PDFs are already compressed: store them as they are
+        with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_STORED) as archive:
+            for snapshot, pdf, _ in InvoicePdfService.iter_period(month):
+                archive.writestr(f"{snapshot['invoice_number']}.pdf", pdf)
+                yield stream.pop()
+        yield stream.pop()
+
+    @staticmethod
+    def render_period(month: str, invoice_date: Optional[date] = None, progress=None) -> dict:
+        """
+        Render a billing period into the cache only; returns counts
+
+        progress(done, total, rendered, errors) is called after every batch of
+        settings.INVOICE_PDF_BATCH_SIZE invoices (a job's progress, which also
+        keeps its heartbeat fresh while rendering).
+        """
+        expected = 0
+        if progress:
+            with SessionLocal() as db:
+                expected = db.scalar(select(func.count(Invoice.id)).where(*_period_filter(month, invoice_date)))
+
+        total = rendered = 0
+        for _, _, was_rendered in InvoicePdfService.iter_period(month, invoice_date):
+            total += 1
+            rendered += was_rendered
+            if progress and total % settings.INVOICE_PDF_BATCH_SIZE == 0:
+                progress(total, max(expected, total), rendered, [])
+        if progress:
+            progress(total, total, rendered, [])
+        return {
+            "billing_period": month,
+            "total": total,
+            "rendered": rendered,
+            "cached": total - rendered,
+            "rendered_at": datetime.now().isoformat()
+        }
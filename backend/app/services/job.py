@@ -0,0 +1,432 @@
+"""
+Background jobs: batch invoicing, billing cycles, overdue sweeps and PDF rendering
+
+A job is a row in the jobs table. Submitting one commits the row and hands
+its id to the configured executor (settings.JOB_EXECUTOR): "inprocess" runs
+jobs on a small thread pool inside the API process (tests, single-server
+deployments), "celery" sends them to a Celery worker (app.worker).
+
+Running a job first claims the row with a conditional UPDATE, so a job
+delivered twice only runs once. Handlers commit their work in chunks and
+report progress after each chunk; progress updates also serve as heartbeat
+and cancellation point. A job whose worker died (no heartbeat for
+settings.JOB_HEARTBEAT_TIMEOUT seconds) can be claimed again and resumes
+from the last committed chunk, because handlers skip work already done.
+
+A delivery that finds the job still running under a fresh heartbeat (the
+Celery redelivery right after a worker was lost, or a restart within the
+timeout) cannot tell a dead worker from a slow one yet, so the executor
+tries again JOB_HEARTBEAT_TIMEOUT seconds later instead of dropping it.
+"""
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.job import Job
+from app.schemas.job import BillingCycleJobParams, InvoiceBatchJobParams, OverdueSweepJobParams, PdfRenderJobParams
+from app.services.billing_cycle import BillingCycleService
+from app.services.invoice import InvoiceService
+from app.services.invoice_pdf import InvoicePdfService
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised at a progress update once cancellation was requested"""
+
+
+class JobContext:
+    """Handle a running job uses to read its params and report progress"""
+
+    def __init__(self, job: Job, worker_id: str):
+        self.job_id = job.id
+        self.job_type = job.job_type
+        self.params = job.params or {}
+        self.attempt = job.attempts
+        self.worker_id = worker_id
+        # Work committed by earlier (interrupted) attempts
+        self.base_success = job.success_count
+
+    def _update(self, **values) -> Optional[bool]:
+        """Update our job row if we still own it; returns cancel_requested"""
+        with SessionLocal() as db:
+            cancel_requested = db.execute(
+                update(Job).where(
+                    Job.id == self.job_id,
+                    Job.worker_id == self.worker_id,
+                    Job.status == "running"
+                ).values(heartbeat_at=_now(), **values).returning(Job.cancel_requested)
+            ).scalar()
+            db.commit()
+        return cancel_requested
+
+    def progress(self, done: int, total: int, success: int, errors: List[dict]) -> None:
+        """Record progress (and heartbeat); raises JobCancelled when asked to stop"""
+        cancel_requested = self._update(
+            progress_done=done,
+            progress_total=total,
+            success_count=self.base_success + success,
+            error_count=len(errors),
+            errors=errors[:settings.JOB_MAX_ERROR_DETAILS]
+        )
+        # None: another worker took the job over after our heartbeat expired
+        if cancel_requested is None or cancel_requested:
+            raise JobCancelled()
+
+    def heartbeat(self) -> None:
+        """Heartbeat without changing progress, for work outside the counted items"""
+        cancel_requested = self._update()
+        if cancel_requested is None or cancel_requested:
+            raise JobCancelled()
+
+    def finish(self, job_status: str, result: Optional[dict] = None, error_message: Optional[str] = None) -> None:
+        self._update(
+            status=job_status,
+            result=result,
+            error_message=error_message,
+            finished_at=_now()
+        )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def _run_invoice_batch(db: Session, context: JobContext) -> dict:
+    params = InvoiceBatchJobParams(**context.params)
+    result = InvoiceService.generate_batch_invoices(
+        db=db,
+        billing_month=params.billing_month,
+        skip_already_billed=True,
+        progress=context.progress
+    )
+    result.pop("error_details")
+    result["billing_period"] = params.billing_month.strftime("%Y-%m")
+    return result
+
+
+def _run_overdue_sweep(db: Session, context: JobContext) -> dict:
+    params = OverdueSweepJobParams(**context.params)
+    return InvoiceService.check_overdue_invoices(
+        db, include_ids=params.include_ids, job_id=context.job_id, progress=context.progress
+    )
+
+
+def _run_billing_cycle(db: Session, context: JobContext) -> dict:
+    params = BillingCycleJobParams(**context.params)
+    return BillingCycleService.run_day(
+        db, params.run_date, progress=context.progress, heartbeat=context.heartbeat, job_id=context.job_id
+    )
+
+
+def _run_pdf_render(db: Session, context: JobContext) -> dict:
+    params = PdfRenderJobParams(**context.params)
+    return InvoicePdfService.render_period(params.billing_period, progress=context.progress)
+
+
+# job_type -> (params model, handler)
+JOB_TYPES: Dict[str, tuple] = {
+    "invoice_batch": (InvoiceBatchJobParams, _run_invoice_batch),
+    "overdue_sweep": (OverdueSweepJobParams, _run_overdue_sweep),
+    "billing_cycle": (BillingCycleJobParams, _run_billing_cycle),
+    "pdf_render": (PdfRenderJobParams, _run_pdf_render),
+}
+
+
+class InProcessExecutor:
+    """Run jobs on a thread pool inside the current process"""
+
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._timers: set = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int) -> None:
+        self._pool.submit(self._run, job_id)
+
+    def _run(self, job_id: int) -> None:
+        retry_in = JobService.run_job(job_id)
+        if retry_in is not None:
+            self._submit_later(job_id, retry_in)
+
+    def _submit_later(self, job_id: int, delay: float) -> None:
+        def fire():
+            with self._lock:
+                self._timers.discard(timer)
+            self.submit(job_id)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers.add(timer)
+        timer.start()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for timer in self._timers:
+                timer.cancel()
+            self._timers.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class CeleryExecutor:
+    """Send jobs to Celery workers (celery -A app.worker worker)"""
+
+    def submit(self, job_id: int) -> None:
+        from app.worker import run_job
+        run_job.delay(job_id)
+
+    def shutdown(self) -> None:
+        pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """The process-wide job executor for settings.JOB_EXECUTOR"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if settings.JOB_EXECUTOR == "celery":
+                _executor = CeleryExecutor()
+            else:
+                _executor = InProcessExecutor(settings.JOB_WORKERS)
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+
+class JobService:
+    """
+    Job service for submitting, tracking and running background jobs
+    """
+
+    @staticmethod
+    def get_job_by_id(db: Session, job_id: int) -> Job:
+        """Get job by ID"""
+        job = db.get(Job, job_id)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        return job
+
+    @staticmethod
+    def get_jobs(
+        db: Session,
+        skip: int = 0,
+        limit: int = 20,
+        job_type: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> List[Job]:
+        """Get jobs, newest first"""
+        stmt = select(Job)
+
+        if job_type:
+            stmt = stmt.where(Job.job_type == job_type)
+
+        if status:
+            stmt = stmt.where(Job.status == status)
+
+        return db.scalars(
+            stmt.order_by(Job.created_at.desc(), Job.id.desc()).offset(skip).limit(limit)
+        ).all()
+
+    @staticmethod
+    def submit_job(db: Session, job_type: str, params: dict, created_by: Optional[int] = None) -> Job:
+        """Validate params, store the job and hand it to the executor"""
+        params_model = JOB_TYPES[job_type][0]
+        try:
+            params = params_model(**params).model_dump(mode="json")
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=e.errors(include_url=False, include_context=False)
+            )
+
+        # One active job per type and params: a second submit returns the first
+        active = db.scalars(select(Job).where(
+            Job.job_type == job_type,
+            Job.status.in_(ACTIVE_STATUSES)
+        )).all()
+        for job in active:
+            if job.params == params:
+                return job
+
+        job = Job(job_type=job_type, params=params, status="queued", created_by=created_by)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        get_executor().submit(job.id)
+        return job
+
+    @staticmethod
+    def cancel_job(db: Session, job_id: int) -> Job:
+        """
+        Cancel a job
+
+        Queued jobs are cancelled at once; running jobs stop at their next
+        progress update, after the chunk in flight is committed.
+        """
+        job = JobService.get_job_by_id(db, job_id)
+
+        if job.status not in ACTIVE_STATUSES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot cancel {job.status} job"
+            )
+
+        job.cancel_requested = True
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished_at = _now()
+
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def resume_job(db: Session, job_id: int) -> Job:
+        """Queue a failed job, or a running job whose worker stopped heartbeating, again"""
+        job = JobService.get_job_by_id(db, job_id)
+
+        if job.status == "running" and not JobService._is_stale(job):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Job is still running"
+            )
+
+        if job.status not in ("failed", "running"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot resume {job.status} job"
+            )
+
+        if job.status == "failed":
+            job.status = "queued"
+            job.finished_at = None
+            job.error_message = None
+            db.commit()
+            db.refresh(job)
+
+        get_executor().submit(job.id)
+        return job
+
+    @staticmethod
+    def resume_interrupted_jobs() -> int:
+        """
+        Dispatch queued and running jobs again (call on startup)
+
+        Running jobs are included even while their heartbeat is fresh: the
+        worker may have died just before, and run_job() keeps retrying them
+        until they finish or their heartbeat expires and they are claimed.
+        """
+        db = SessionLocal()
+        try:
+            job_ids = db.scalars(select(Job.id).where(
+                Job.status.in_(ACTIVE_STATUSES),
+                Job.cancel_requested.is_(False)
+            ).order_by(Job.id)).all()
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            get_executor().submit(job_id)
+        return len(job_ids)
+
+    @staticmethod
+    def _stale_clause():
+        cutoff = _now() - timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+        return (Job.status == "running") & (Job.heartbeat_at < cutoff)
+
+    @staticmethod
+    def _is_stale(job: Job) -> bool:
+        cutoff = _now() - timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+        return job.heartbeat_at is None or job.heartbeat_at < cutoff
+
+    @staticmethod
+    def _held_retry_delay(job_id: int) -> Optional[int]:
+        """JOB_HEARTBEAT_TIMEOUT if the job is running under a heartbeat that has not expired"""
+        with SessionLocal() as db:
+            job = db.get(Job, job_id)
+            if job is None or job.status != "running" or job.cancel_requested:
+                return None
+        return settings.JOB_HEARTBEAT_TIMEOUT
+
+    @staticmethod
+    def claim_job(job_id: int, worker_id: str) -> Optional[JobContext]:
+        """Mark a queued (or abandoned) job as running by this worker, None if taken"""
+        with SessionLocal() as db:
+            job = db.scalars(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.cancel_requested.is_(False),
+                    or_(Job.status == "queued", JobService._stale_clause())
+                ).values(
+                    status="running",
+                    worker_id=worker_id,
+                    heartbeat_at=_now(),
+                    started_at=_now(),
+                    attempts=Job.attempts + 1
+                ).returning(Job)
+            ).first()
+            db.commit()
+            return JobContext(job, worker_id) if job else None
+
+    @staticmethod
+    def run_job(job_id: int) -> Optional[int]:
+        """
+        Claim and run a job to completion (executor entry point)
+
+        Returns the seconds after which the executor should deliver the job
+        again when another worker still holds it with a fresh heartbeat,
+        None when there is nothing left to do.
+        """
+        context = JobService.claim_job(job_id, _worker_id())
+        if context is None:
+            return JobService._held_retry_delay(job_id)
+
+        handler = JOB_TYPES[context.job_type][1]
+        db = SessionLocal()
+        try:
+            result = handler(db, context)
+            context.finish("succeeded", result=result)
+        except JobCancelled:
+            db.rollback()
+            context.finish("cancelled")
+        except HTTPException as e:
+            db.rollback()
+            context.finish("failed", error_message=str(e.detail))
+        except Exception as e:
+            db.rollback()
+            logger.exception("Job %s (%s) failed", job_id, context.job_type)
+            context.finish("failed", error_message=f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,84 @@
+from typing import Callable, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.document_counter import DocumentCounter
+
+
+class NumberingService:
+    """
+    Document number allocator backed by the document_counters table
+    
+    Every allocation increments the prefix row with a single UPDATE, so the
+    row lock serializes concurrent writers and the new value is only visible
+    once the caller commits. Allocate inside the same transaction that
+    inserts the documents: a rollback then gives the numbers back and the
+    sequence stays gap-free.
+    """
+    
+    MIN_WIDTH = 3
+    
+    @staticmethod
+    def format_number(prefix: str, number: int) -> str:
+        """
+        Format document number, e.g. INV-2024-12-001
+        
+        The sequence part is zero padded to at least three digits and simply
+        grows wider (1000, 10000, ...) once a month goes past 999 documents.
+        """
+        return f"{prefix}-{number:0{NumberingService.MIN_WIDTH}d}"
+    
+    @staticmethod
+    def allocate(
+        db: Session,
+        prefix: str,
+        count: int = 1,
+        seed: Optional[Callable[[Session, str], int]] = None
+    ) -> int:
+        """
+        Atomically reserve `count` consecutive numbers for a prefix
+        
+        Args:
+            db: Database session (not committed here)
+            prefix: Document prefix
+            count: Block size
+            seed: Returns the last number already used for a prefix that has
+                no counter row yet, so legacy documents are not reissued
+            
+        Returns:
+            int: First number of the reserved block
+        """
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        
+        last_value = db.execute(
+            update(DocumentCounter)
+            .where(DocumentCounter.prefix == prefix)
+            .values(last_value=DocumentCounter.last_value + count)
+            .returning(DocumentCounter.last_value)
+        ).scalar()
+        
+        if last_value is None:
+            # First document for this prefix; a concurrent creator is
+            # resolved by ON CONFLICT and falls through to the increment
+            start = seed(db, prefix) if seed else 0
+            stmt = insert(DocumentCounter).values(prefix=prefix, last_value=start + count)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DocumentCounter.prefix],
+                set_={"last_value": DocumentCounter.last_value + count}
+            ).returning(DocumentCounter.last_value)
+            last_value = db.execute(stmt).scalar()
+        
+        return last_value - count + 1
+    
+    @staticmethod
+    def allocate_numbers(
+        db: Session,
+        prefix: str,
+        count: int = 1,
+        seed: Optional[Callable[[Session, str], int]] = None
+    ) -> List[str]:
+        """Reserve and format a block of document numbers"""
+        start = NumberingService.allocate(db, prefix, count, seed)
+        return [NumberingService.format_number(prefix, number) for number in range(start, start + count)]
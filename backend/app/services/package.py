@@ -5,6 +5,7 @@ from fastapi import HTTPException, status
 
 from app.models.package import Package
 from app.schemas.package import PackageCreate, PackageUpdate
+from app.core import cache
 
 
 class PackageService:
@@ -77,6 +78,7 @@ class PackageService:
         package = Package(**package_in.model_dump())
         db.add(package)
         db.commit()
+        cache.invalidate(*cache.PACKAGE_NAMESPACES)
         db.refresh(package)
         
         return package
@@ -114,6 +116,7 @@ class PackageService:
             setattr(package, field, value)
         
         db.commit()
+        cache.invalidate(*cache.PACKAGE_NAMESPACES)
         db.refresh(package)
         
         return package
@@ -132,6 +135,7 @@ class PackageService:
         
         db.delete(package)
         db.commit()
+        cache.invalidate(*cache.PACKAGE_NAMESPACES)
     
     @staticmethod
     def toggle_package_status(db: Session, package_id: int) -> Package:
@@ -141,6 +145,7 @@ class PackageService:
         package.is_active = not package.is_active
         
         db.commit()
+        cache.invalidate(*cache.PACKAGE_NAMESPACES)
         db.refresh(package)
         
         return package
@@ -1,5 +1,8 @@
-from typing import Optional, List
+from typing import Dict, Optional, List
+from collections import defaultdict
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy import Integer, Numeric, Select, Update, case, column, func, select, update, values
 from datetime import datetime, date
 from fastapi import HTTPException, status
 from decimal import Decimal
@@ -9,6 +12,84 @@ from app.models.invoice import Invoice
 from app.models.customer import Customer
 from app.schemas.payment import PaymentCreate, PaymentUpdate
 from app.services.invoice import InvoiceService
+from app.services.numbering import NumberingService
+from app.services.rollup import RollupService
+from app.core import cache, pagination
+
+# Keyset order of payment lists: (created_at, id) newest first
+PAYMENT_LIST_ORDER = [(Payment.created_at, True), (Payment.id, True)]
+
+
+def payments_statement(
+    customer_id: Optional[int] = None,
+    invoice_id: Optional[int] = None,
+    status: Optional[str] = None,
+    payment_method: Optional[str] = None
+) -> Select:
+    """Unordered SELECT of payments matching the list filters (sync and async)"""
+    stmt = select(Payment)
+    
+    if customer_id:
+        stmt = stmt.where(Payment.customer_id == customer_id)
+    
+    if invoice_id:
+        stmt = stmt.where(Payment.invoice_id == invoice_id)
+    
+    if status:
+        stmt = stmt.where(Payment.status == status)
+    
+    if payment_method:
+        stmt = stmt.where(Payment.payment_method == payment_method)
+    
+    return stmt
+
+
+def invoice_payments_statement(amounts: Dict[int, Decimal]) -> Update:
+    """
+    UPDATE adding verified payment amounts to their invoices
+    
+    paid_amount = paid_amount + amount and the resulting status are computed
+    in SQL on the locked row, so concurrent verifications for one invoice
+    each add their amount instead of overwriting each other. A CTE locks the
+    invoices in id order and carries their old values for the rollups.
+    """
+    amount_rows = values(
+        column("invoice_id", Integer),
+        column("amount", Numeric(15, 2)),
+        name="amounts"
+    ).data(sorted(amounts.items()))
+    
+    locked = select(
+        Invoice.id,
+        Invoice.status,
+        Invoice.paid_amount,
+        Invoice.paid_at
+    ).where(
+        Invoice.id.in_(list(amounts))
+    ).order_by(Invoice.id).with_for_update().cte("locked")
+    
+    paid_amount = func.coalesce(Invoice.paid_amount, 0) + amount_rows.c.amount
+    fully_paid = paid_amount >= Invoice.total_amount
+    
+    return update(Invoice).where(
+        Invoice.id == locked.c.id,
+        Invoice.id == amount_rows.c.invoice_id
+    ).values(
+        paid_amount=paid_amount,
+        status=case((fully_paid, "paid"), (paid_amount > 0, "partial"), else_=Invoice.status),
+        paid_at=case((fully_paid, func.now()), else_=Invoice.paid_at),
+        updated_at=func.now()
+    ).returning(
+        Invoice.id,
+        Invoice.billing_period,
+        Invoice.status,
+        Invoice.total_amount,
+        Invoice.paid_amount,
+        Invoice.paid_at,
+        locked.c.status.label("old_status"),
+        locked.c.paid_amount.label("old_paid_amount"),
+        locked.c.paid_at.label("old_paid_at")
+    ).execution_options(synchronize_session=False)
 
 
 class PaymentService:
@@ -17,27 +98,43 @@ class PaymentService:
     """
     
     @staticmethod
-    def generate_payment_number(db: Session, payment_date: date) -> str:
-        """Generate unique payment number"""
-        # Format: PAY-YYYY-MM-XXX
-        year_month = payment_date.strftime("%Y-%m")
-        prefix = f"PAY-{year_month}"
-        
-        # Get last payment for this month
+    def payment_number_prefix(payment_date: date) -> str:
+        """Payment number prefix for a month, e.g. PAY-2024-12"""
+        return f"PAY-{payment_date.strftime('%Y-%m')}"
+    
+    @staticmethod
+    def _last_payment_sequence(db: Session, prefix: str) -> int:
+        """Get last sequence number used before the prefix had a counter"""
         last_payment = db.query(Payment).filter(
-            Payment.payment_number.like(f"{prefix}%")
+            Payment.payment_number.like(f"{prefix}-%")
         ).order_by(Payment.id.desc()).first()
         
         if last_payment:
             try:
-                last_number = int(last_payment.payment_number.split('-')[-1])
-                new_number = last_number + 1
+                return int(last_payment.payment_number.split('-')[-1])
             except (IndexError, ValueError):
-                new_number = 1
-        else:
-            new_number = 1
+                return 0
+        return 0
+    
+    @staticmethod
+    def generate_payment_number(db: Session, payment_date: date) -> str:
+        """Generate unique payment number"""
+        return PaymentService.allocate_payment_numbers(db, payment_date, 1)[0]
+    
+    @staticmethod
+    def allocate_payment_numbers(db: Session, payment_date: date, count: int) -> List[str]:
+        """
+        Allocate a contiguous block of payment numbers for one month
         
-        return f"{prefix}-{new_number:03d}"
+        Format: PAY-YYYY-MM-XXX. Numbers are reserved in the caller's
+        transaction, commit together with the payments that use them.
+        """
+        return NumberingService.allocate_numbers(
+            db,
+            PaymentService.payment_number_prefix(payment_date),
+            count,
+            seed=PaymentService._last_payment_sequence
+        )
     
     @staticmethod
     def get_payments(
@@ -50,22 +147,23 @@ class PaymentService:
         payment_method: Optional[str] = None
     ) -> List[Payment]:
         """Get payments list with filters"""
-        query = db.query(Payment)
-        
-        if customer_id:
-            query = query.filter(Payment.customer_id == customer_id)
-        
-        if invoice_id:
-            query = query.filter(Payment.invoice_id == invoice_id)
-        
-        if status:
-            query = query.filter(Payment.status == status)
-        
-        if payment_method:
-            query = query.filter(Payment.payment_method == payment_method)
-        
-        query = query.order_by(Payment.created_at.desc())
-        return query.offset(skip).limit(limit).all()
+        stmt = payments_statement(customer_id, invoice_id, status, payment_method)
+        stmt = stmt.order_by(Payment.created_at.desc(), Payment.id.desc())
+        return db.scalars(stmt.offset(skip).limit(limit)).all()
+    
+    @staticmethod
+    def get_payments_page(
+        db: Session,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        customer_id: Optional[int] = None,
+        invoice_id: Optional[int] = None,
+        status: Optional[str] = None,
+        payment_method: Optional[str] = None
+    ) -> dict:
+        """Get one page of payments in keyset order (newest first)"""
+        stmt = payments_statement(customer_id, invoice_id, status, payment_method)
+        return pagination.paginate(db, stmt, PAYMENT_LIST_ORDER, cursor, limit)
     
     @staticmethod
     def get_payment_by_id(db: Session, payment_id: int) -> Payment:
@@ -78,6 +176,21 @@ class PaymentService:
             )
         return payment
     
+    @staticmethod
+    def get_payment_for_update(db: Session, payment_id: int) -> Payment:
+        """Get payment by ID and lock it until the transaction ends"""
+        payment = db.scalars(
+            select(Payment).where(
+                Payment.id == payment_id
+            ).with_for_update().execution_options(populate_existing=True)
+        ).first()
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Payment not found"
+            )
+        return payment
+    
     @staticmethod
     def get_payment_by_number(db: Session, payment_number: str) -> Payment:
         """Get payment by number"""
@@ -127,7 +240,9 @@ class PaymentService:
         )
         
         db.add(payment)
+        RollupService.payment_changed(db, None, RollupService.payment_snapshot(payment))
         db.commit()
+        cache.invalidate(*cache.PAYMENT_NAMESPACES)
         db.refresh(payment)
         
         return payment
@@ -139,7 +254,7 @@ class PaymentService:
         payment_in: PaymentUpdate
     ) -> Payment:
         """Update payment"""
-        payment = PaymentService.get_payment_by_id(db, payment_id)
+        payment = PaymentService.get_payment_for_update(db, payment_id)
         
         # Don't allow updating verified payments
         if payment.status == "verified":
@@ -148,12 +263,16 @@ class PaymentService:
                 detail="Cannot update verified payment"
             )
         
+        before = RollupService.payment_snapshot(payment)
+        
         # Update fields
         update_data = payment_in.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             setattr(payment, field, value)
         
+        RollupService.payment_changed(db, before, RollupService.payment_snapshot(payment))
         db.commit()
+        cache.invalidate(*cache.PAYMENT_NAMESPACES)
         db.refresh(payment)
         
         return payment
@@ -165,7 +284,7 @@ class PaymentService:
         verified_by: int
     ) -> Payment:
         """Verify payment"""
-        payment = PaymentService.get_payment_by_id(db, payment_id)
+        payment = PaymentService.get_payment_for_update(db, payment_id)
         
         if payment.status == "verified":
             raise HTTPException(
@@ -179,6 +298,8 @@ class PaymentService:
                 detail="Cannot verify rejected payment"
             )
         
+        before = RollupService.payment_snapshot(payment)
+        
         # Update payment status
         payment.status = "verified"
         payment.verified_by = verified_by
@@ -186,23 +307,158 @@ class PaymentService:
         
         # Update invoice if exists
         if payment.invoice_id:
-            invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
-            if invoice:
-                # Update paid amount
-                invoice.paid_amount += payment.amount
-                
-                # Update invoice status
-                if invoice.paid_amount >= invoice.total_amount:
-                    invoice.status = "paid"
-                    invoice.paid_at = datetime.utcnow()
-                elif invoice.paid_amount > 0:
-                    invoice.status = "partial"
+            PaymentService._add_to_invoices(db, {payment.invoice_id: payment.amount})
         
+        RollupService.payment_changed(db, before, RollupService.payment_snapshot(payment))
         db.commit()
+        cache.invalidate(*cache.PAYMENT_VERIFY_NAMESPACES)
         db.refresh(payment)
         
         return payment
     
+    @staticmethod
+    def _add_to_invoices(db: Session, amounts: Dict[int, Decimal]) -> None:
+        """Add verified amounts to invoices (one atomic UPDATE) and adjust the rollups"""
+        if not amounts:
+            return
+        
+        rows = db.execute(invoice_payments_statement(amounts)).all()
+        RollupService.invoices_changed(db, [
+            (
+                RollupService.invoice_snapshot(dict(
+                    row._asdict(),
+                    status=row.old_status,
+                    paid_amount=row.old_paid_amount,
+                    paid_at=row.old_paid_at
+                )),
+                RollupService.invoice_snapshot(row)
+            )
+            for row in rows
+        ])
+    
+    @staticmethod
+    def _lock_payments(db: Session, payment_ids: List[int]) -> Dict[int, Payment]:
+        """Load and lock payments (id order, so concurrent batches don't deadlock)"""
+        payments = db.scalars(
+            select(Payment).where(
+                Payment.id.in_(payment_ids)
+            ).order_by(Payment.id).with_for_update().execution_options(populate_existing=True)
+        ).all()
+        return {payment.id: payment for payment in payments}
+    
+    @staticmethod
+    def _batch_result(payment_ids: List[int], errors: Dict[int, str], done_status: str) -> dict:
+        """Per-id outcome of a batch, in request order"""
+        results = []
+        for payment_id in payment_ids:
+            if payment_id in errors:
+                results.append({"payment_id": payment_id, "status": "error", "detail": errors[payment_id]})
+            else:
+                results.append({"payment_id": payment_id, "status": done_status})
+        
+        return {
+            "requested": len(payment_ids),
+            done_status: len(payment_ids) - len(errors),
+            "failed": len(errors),
+            "results": results
+        }
+    
+    @staticmethod
+    def verify_payments(
+        db: Session,
+        payment_ids: List[int],
+        verified_by: int,
+        admin_notes: Optional[str] = None
+    ) -> dict:
+        """
+        Verify many payments in one transaction
+        
+        The payments are locked with one SELECT ... FOR UPDATE; amounts are
+        summed per invoice and added by one UPDATE that locks the invoices,
+        so an invoice with several payments in the batch is updated once.
+        Payments that cannot be verified are reported per id and do not stop
+        the others.
+        """
+        payment_ids = list(dict.fromkeys(payment_ids))
+        payments = PaymentService._lock_payments(db, payment_ids)
+        
+        errors = {}
+        to_verify = []
+        for payment_id in payment_ids:
+            payment = payments.get(payment_id)
+            if payment is None:
+                errors[payment_id] = "Payment not found"
+            elif payment.status == "verified":
+                errors[payment_id] = "Payment already verified"
+            elif payment.status == "rejected":
+                errors[payment_id] = "Cannot verify rejected payment"
+            else:
+                to_verify.append(payment)
+        
+        amount_by_invoice = defaultdict(Decimal)
+        for payment in to_verify:
+            if payment.invoice_id:
+                amount_by_invoice[payment.invoice_id] += payment.amount
+        
+        verified_at = datetime.utcnow()
+        payment_changes = []
+        for payment in to_verify:
+            before = RollupService.payment_snapshot(payment)
+            payment.status = "verified"
+            payment.verified_by = verified_by
+            payment.verified_at = verified_at
+            if admin_notes:
+                payment.admin_notes = admin_notes
+            payment_changes.append((before, RollupService.payment_snapshot(payment)))
+        
+        PaymentService._add_to_invoices(db, amount_by_invoice)
+        RollupService.payments_changed(db, payment_changes)
+        db.commit()
+        if to_verify:
+            cache.invalidate(*cache.PAYMENT_VERIFY_NAMESPACES)
+        
+        return PaymentService._batch_result(payment_ids, errors, "verified")
+    
+    @staticmethod
+    def reject_payments(
+        db: Session,
+        payment_ids: List[int],
+        verified_by: int,
+        rejection_reason: str,
+        admin_notes: Optional[str] = None
+    ) -> dict:
+        """Reject many payments in one transaction; verified payments are reported per id"""
+        payment_ids = list(dict.fromkeys(payment_ids))
+        payments = PaymentService._lock_payments(db, payment_ids)
+        
+        errors = {}
+        changes = []
+        rejected_at = datetime.utcnow()
+        for payment_id in payment_ids:
+            payment = payments.get(payment_id)
+            if payment is None:
+                errors[payment_id] = "Payment not found"
+                continue
+            if payment.status == "verified":
+                errors[payment_id] = "Cannot reject verified payment"
+                continue
+            
+            before = RollupService.payment_snapshot(payment)
+            payment.status = "rejected"
+            payment.verified_by = verified_by
+            payment.verified_at = rejected_at
+            payment.rejection_reason = rejection_reason
+            if admin_notes:
+                payment.admin_notes = admin_notes
+            changes.append((before, RollupService.payment_snapshot(payment)))
+        
+        RollupService.payments_changed(db, changes)
+        db.commit()
+        if changes:
+            cache.invalidate(*cache.PAYMENT_NAMESPACES)
+        
+        return PaymentService._batch_result(payment_ids, errors, "rejected")
+    
     @staticmethod
     def reject_payment(
         db: Session,
@@ -211,7 +467,7 @@ class PaymentService:
         rejection_reason: str
     ) -> Payment:
         """Reject payment"""
-        payment = PaymentService.get_payment_by_id(db, payment_id)
+        payment = PaymentService.get_payment_for_update(db, payment_id)
         
         if payment.status == "verified":
             raise HTTPException(
@@ -219,13 +475,17 @@ class PaymentService:
                 detail="Cannot reject verified payment"
             )
         
+        before = RollupService.payment_snapshot(payment)
+        
         # Update payment status
         payment.status = "rejected"
         payment.verified_by = verified_by
         payment.verified_at = datetime.utcnow()
         payment.rejection_reason = rejection_reason
         
+        RollupService.payment_changed(db, before, RollupService.payment_snapshot(payment))
         db.commit()
+        cache.invalidate(*cache.PAYMENT_NAMESPACES)
         db.refresh(payment)
         
         return payment
@@ -233,7 +493,7 @@ class PaymentService:
     @staticmethod
     def cancel_payment(db: Session, payment_id: int) -> Payment:
         """Cancel payment"""
-        payment = PaymentService.get_payment_by_id(db, payment_id)
+        payment = PaymentService.get_payment_for_update(db, payment_id)
         
         if payment.status == "verified":
             raise HTTPException(
@@ -241,9 +501,71 @@ class PaymentService:
                 detail="Cannot cancel verified payment"
             )
         
+        before = RollupService.payment_snapshot(payment)
         payment.status = "cancelled"
         
+        RollupService.payment_changed(db, before, RollupService.payment_snapshot(payment))
         db.commit()
+        cache.invalidate(*cache.PAYMENT_NAMESPACES)
         db.refresh(payment)
         
         return payment
+
+
+class AsyncPaymentService:
+    """
+    AsyncSession counterparts of the PaymentService read methods
+    """
+    
+    @staticmethod
+    async def get_payments(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 20,
+        customer_id: Optional[int] = None,
+        invoice_id: Optional[int] = None,
+        status: Optional[str] = None,
+        payment_method: Optional[str] = None
+    ) -> List[Payment]:
+        """Get payments list with filters"""
+        stmt = payments_statement(customer_id, invoice_id, status, payment_method)
+        stmt = stmt.order_by(Payment.created_at.desc(), Payment.id.desc())
+        return (await db.scalars(stmt.offset(skip).limit(limit))).all()
+    
+    @staticmethod
+    async def get_payments_page(
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 20,
+        customer_id: Optional[int] = None,
+        invoice_id: Optional[int] = None,
+        status: Optional[str] = None,
+        payment_method: Optional[str] = None
+    ) -> dict:
+        """Get one page of payments in keyset order (newest first)"""
+        stmt = payments_statement(customer_id, invoice_id, status, payment_method)
+        return await pagination.paginate_async(db, stmt, PAYMENT_LIST_ORDER, cursor, limit)
+    
+    @staticmethod
+    async def get_payment_by_id(db: AsyncSession, payment_id: int) -> Payment:
+        """Get payment by ID"""
+        payment = await db.get(Payment, payment_id)
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Payment not found"
+            )
+        return payment
+    
+    @staticmethod
+    async def get_payment_by_number(db: AsyncSession, payment_number: str) -> Payment:
+        """Get payment by number"""
+        payment = (await db.scalars(
+            select(Payment).where(Payment.payment_number == payment_number)
+        )).first()
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Payment not found"
+            )
+        return payment
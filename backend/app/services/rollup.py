@@ -0,0 +1,347 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, cast, column, delete, func, literal, select, text, union_all, values
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.models.rollup import (
+    InvoiceStatusRollup,
+    RevenueMonthlyRollup,
+    CustomerStatusRollup,
+    CustomerMonthlyRollup,
+    PaymentMonthlyRollup
+)
+
+ROLLUP_MODELS = [
+    InvoiceStatusRollup,
+    RevenueMonthlyRollup,
+    CustomerStatusRollup,
+    CustomerMonthlyRollup,
+    PaymentMonthlyRollup,
+]
+
+Snapshot = Optional[Dict[str, Any]]
+Change = Tuple[Snapshot, Snapshot]
+
+
+def _month(value):
+    """SQL expression for the first day of the month of a date/timestamp"""
+    return cast(func.date_trunc("month", value), Date)
+
+
+def _read(obj, field: str):
+    return obj.get(field) if isinstance(obj, dict) else getattr(obj, field)
+
+
+class RollupService:
+    """
+    Maintains the monthly rollup tables the dashboard reads from
+
+    Write paths take a snapshot of a row before and after they change it and
+    pass both to invoices_changed / payments_changed / customers_changed in
+    the same transaction. The old snapshot is subtracted and the new one
+    added with INSERT ... ON CONFLICT DO UPDATE increments, so the rollups
+    commit or roll back with the write. Snapshots of several rows are
+    aggregated into one statement per rollup table.
+
+    Months are truncated in SQL with the session time zone, exactly like
+    rebuild() and the original fact-table queries.
+    """
+
+    # Snapshots
+
+    @staticmethod
+    def invoice_snapshot(invoice) -> Dict[str, Any]:
+        """Rollup-relevant fields of an Invoice (or a row dict for bulk inserts)"""
+        return {
+            "billing_period": _read(invoice, "billing_period"),
+            "status": _read(invoice, "status") or "pending",
+            "total_amount": Decimal(str(_read(invoice, "total_amount") or 0)),
+            "paid_amount": Decimal(str(_read(invoice, "paid_amount") or 0)),
+            "paid_at": _read(invoice, "paid_at"),
+        }
+
+    @staticmethod
+    def payment_snapshot(payment) -> Dict[str, Any]:
+        """Rollup-relevant fields of a Payment (or a row dict for bulk inserts)"""
+        return {
+            "payment_date": _read(payment, "payment_date"),
+            "payment_method": _read(payment, "payment_method"),
+            "status": _read(payment, "status") or "pending",
+            "amount": Decimal(str(_read(payment, "amount") or 0)),
+        }
+
+    @staticmethod
+    def customer_snapshot(customer) -> Dict[str, Any]:
+        """Rollup-relevant fields of a Customer"""
+        return {
+            "status": _read(customer, "status") or "active",
+            "package_id": _read(customer, "package_id") or 0,
+            # New customers are not flushed yet, so server_default created_at is still empty
+            "created_at": _read(customer, "created_at") or datetime.now(timezone.utc),
+            "termination_date": _read(customer, "termination_date"),
+        }
+
+    # Incremental maintenance
+
+    @staticmethod
+    def invoices_changed(db: Session, changes: Iterable[Change]) -> None:
+        """Apply (before, after) invoice snapshots; None means created/deleted"""
+        status_rows = []
+        revenue_rows = []
+        for before, after in changes:
+            if before == after:
+                continue
+            for snap, sign in ((before, -1), (after, 1)):
+                if snap is None:
+                    continue
+                status_rows.append({
+                    "billing_period": snap["billing_period"],
+                    "status": snap["status"],
+                    "invoice_count": sign,
+                    "total_amount": sign * snap["total_amount"],
+                    "paid_amount": sign * snap["paid_amount"],
+                })
+                if snap["status"] == "paid" and snap["paid_at"] is not None:
+                    revenue_rows.append({
+                        "month": snap["paid_at"],
+                        "revenue": sign * snap["total_amount"],
+                        "invoice_count": sign,
+                    })
+
+        RollupService._increment(
+            db, InvoiceStatusRollup,
+            ["billing_period", "status"], ["invoice_count", "total_amount", "paid_amount"],
+            status_rows
+        )
+        RollupService._increment(
+            db, RevenueMonthlyRollup,
+            ["month"], ["revenue", "invoice_count"],
+            revenue_rows, month_key="month"
+        )
+
+    @staticmethod
+    def invoice_changed(db: Session, before: Snapshot, after: Snapshot) -> None:
+        RollupService.invoices_changed(db, [(before, after)])
+
+    @staticmethod
+    def payments_changed(db: Session, changes: Iterable[Change]) -> None:
+        """Apply (before, after) payment snapshots; None means created/deleted"""
+        rows = []
+        for before, after in changes:
+            if before == after:
+                continue
+            for snap, sign in ((before, -1), (after, 1)):
+                if snap is None:
+                    continue
+                rows.append({
+                    "month": snap["payment_date"],
+                    "payment_method": snap["payment_method"],
+                    "status": snap["status"],
+                    "payment_count": sign,
+                    "amount": sign * snap["amount"],
+                })
+
+        RollupService._increment(
+            db, PaymentMonthlyRollup,
+            ["month", "payment_method", "status"], ["payment_count", "amount"],
+            rows, month_key="month"
+        )
+
+    @staticmethod
+    def payment_changed(db: Session, before: Snapshot, after: Snapshot) -> None:
+        RollupService.payments_changed(db, [(before, after)])
+
+    @staticmethod
+    def customers_changed(db: Session, changes: Iterable[Change]) -> None:
+        """Apply (before, after) customer snapshots; None means created/deleted"""
+        status_rows = []
+        monthly_rows = []
+        for before, after in changes:
+            if before == after:
+                continue
+            for snap, sign in ((before, -1), (after, 1)):
+                if snap is None:
+                    continue
+                status_rows.append({
+                    "status": snap["status"],
+                    "package_id": snap["package_id"],
+                    "customer_count": sign,
+                })
+                monthly_rows.append({
+                    "month": snap["created_at"],
+                    "package_id": snap["package_id"],
+                    "new_customers": sign,
+                    "churned_customers": 0,
+                })
+                if snap["status"] == "terminated" and snap["termination_date"] is not None:
+                    monthly_rows.append({
+                        "month": snap["termination_date"],
+                        "package_id": snap["package_id"],
+                        "new_customers": 0,
+                        "churned_customers": sign,
+                    })
+
+        RollupService._increment(
+            db, CustomerStatusRollup,
+            ["status", "package_id"], ["customer_count"],
+            status_rows
+        )
+        RollupService._increment(
+            db, CustomerMonthlyRollup,
+            ["month", "package_id"], ["new_customers", "churned_customers"],
+            monthly_rows, month_key="month"
+        )
+
+    @staticmethod
+    def customer_changed(db: Session, before: Snapshot, after: Snapshot) -> None:
+        RollupService.customers_changed(db, [(before, after)])
+
+    @staticmethod
+    def _increment(
+        db: Session,
+        model,
+        keys: List[str],
+        measures: List[str],
+        rows: List[Dict[str, Any]],
+        month_key: Optional[str] = None
+    ) -> None:
+        """
+        Add delta rows to a rollup table in one statement
+
+        Rows go through a VALUES list, are grouped by key (the month key is
+        truncated in SQL) and upserted in key order so concurrent writers
+        lock rollup rows in the same order.
+        """
+        if not rows:
+            return
+
+        table = model.__table__
+        names = keys + measures
+        deltas = values(
+            *[column(name, table.c[name].type if name != month_key else None) for name in names],
+            name="deltas"
+        ).data([tuple(row[name] for name in names) for row in rows])
+
+        key_exprs = [
+            _month(deltas.c[name]) if name == month_key else deltas.c[name]
+            for name in keys
+        ]
+        grouped = select(
+            *[expr.label(name) for expr, name in zip(key_exprs, keys)],
+            *[func.sum(deltas.c[name]).label(name) for name in measures]
+        ).group_by(*key_exprs).order_by(*key_exprs)
+
+        stmt = insert(model).from_select(names, grouped)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: table.c[name] + stmt.excluded[name] for name in measures}
+        )
+        db.execute(stmt)
+
+    # Full rebuild
+
+    @staticmethod
+    def rebuild(db: Session) -> None:
+        """
+        Recompute every rollup table from the fact tables
+
+        Runs in the caller's transaction and takes SHARE locks on the fact
+        tables, so writes wait until the rebuild commits and no increment is
+        lost or double counted. Fact tables are locked first, then the rollup
+        tables exclusively, so concurrent rebuilds queue instead of deadlocking.
+        """
+        db.execute(text("LOCK TABLE customers, invoices, payments IN SHARE MODE"))
+        db.execute(text(
+            "LOCK TABLE " + ", ".join(model.__tablename__ for model in ROLLUP_MODELS)
+            + " IN EXCLUSIVE MODE"
+        ))
+        for model in ROLLUP_MODELS:
+            db.execute(delete(model))
+
+        invoice_status = func.coalesce(Invoice.status, "pending")
+        db.execute(insert(InvoiceStatusRollup).from_select(
+            ["billing_period", "status", "invoice_count", "total_amount", "paid_amount"],
+            select(
+                Invoice.billing_period,
+                invoice_status,
+                func.count(Invoice.id),
+                func.coalesce(func.sum(Invoice.total_amount), 0),
+                func.coalesce(func.sum(func.coalesce(Invoice.paid_amount, 0)), 0)
+            ).group_by(Invoice.billing_period, invoice_status)
+        ))
+
+        paid_month = _month(Invoice.paid_at)
+        db.execute(insert(RevenueMonthlyRollup).from_select(
+            ["month", "revenue", "invoice_count"],
+            select(
+                paid_month,
+                func.coalesce(func.sum(Invoice.total_amount), 0),
+                func.count(Invoice.id)
+            ).where(
+                Invoice.status == "paid",
+                Invoice.paid_at.isnot(None)
+            ).group_by(paid_month)
+        ))
+
+        customer_status = func.coalesce(Customer.status, "active")
+        package_id = func.coalesce(Customer.package_id, 0)
+        db.execute(insert(CustomerStatusRollup).from_select(
+            ["status", "package_id", "customer_count"],
+            select(
+                customer_status,
+                package_id,
+                func.count(Customer.id)
+            ).group_by(customer_status, package_id)
+        ))
+
+        movements = union_all(
+            select(
+                _month(Customer.created_at).label("month"),
+                package_id.label("package_id"),
+                literal(1).label("new_customers"),
+                literal(0).label("churned_customers")
+            ).where(Customer.created_at.isnot(None)),
+            select(
+                _month(Customer.termination_date).label("month"),
+                package_id.label("package_id"),
+                literal(0).label("new_customers"),
+                literal(1).label("churned_customers")
+            ).where(
+                Customer.status == "terminated",
+                Customer.termination_date.isnot(None)
+            )
+        ).subquery()
+        db.execute(insert(CustomerMonthlyRollup).from_select(
+            ["month", "package_id", "new_customers", "churned_customers"],
+            select(
+                movements.c.month,
+                movements.c.package_id,
+                func.sum(movements.c.new_customers),
+                func.sum(movements.c.churned_customers)
+            ).group_by(movements.c.month, movements.c.package_id)
+        ))
+
+        payment_month = _month(Payment.payment_date)
+        payment_status = func.coalesce(Payment.status, "pending")
+        db.execute(insert(PaymentMonthlyRollup).from_select(
+            ["month", "payment_method", "status", "payment_count", "amount"],
+            select(
+                payment_month,
+                Payment.payment_method,
+                payment_status,
+                func.count(Payment.id),
+                func.coalesce(func.sum(Payment.amount), 0)
+            ).group_by(payment_month, Payment.payment_method, payment_status)
+        ))
+
+    @staticmethod
+    def is_empty(db: Session) -> bool:
+        """True when no rollup rows exist yet (fresh install or new deployment)"""
+        return not any(
+            db.query(model).first() is not None for model in ROLLUP_MODELS
+        )
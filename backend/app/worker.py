@@ -0,0 +1,54 @@
+"""
+Celery worker for background jobs (settings.JOB_EXECUTOR = "celery")
+
+    celery -A app.worker worker --loglevel=info
+    celery -A app.worker beat      # daily billing cycle
+
+Tasks only carry a job id; state and progress live in the jobs table. Tasks
+are acknowledged after they finish, so a job whose worker died is delivered
+again. That redelivery usually arrives while the dead worker's heartbeat is
+still fresh; the task then retries every JOB_HEARTBEAT_TIMEOUT seconds until
+the heartbeat expires and the job is claimed and resumes from its last
+committed chunk (or until it finishes, if its worker was alive after all).
+Restarted workers dispatch every queued and running job again the same way.
+"""
+from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_ready
+
+from app.core.config import settings
+from app.services.billing_cycle import BillingCycleService
+from app.services.job import JobService
+
+celery_app = Celery("isp_billing", broker=settings.celery_broker_url)
+celery_app.conf.update(
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    timezone=settings.TIMEZONE,
+    beat_schedule={
+        # Hourly, so days missed while beat was down are caught up soon
+        "billing-cycle": {
+            "task": "billing.schedule_due_runs",
+            "schedule": crontab(minute=5)
+        }
+    } if settings.BILLING_SCHEDULER_ENABLED else {}
+)
+
+
+@celery_app.task(name="jobs.run_job", bind=True, max_retries=None)
+def run_job(self, job_id: int) -> None:
+    retry_in = JobService.run_job(job_id)
+    if retry_in is not None:
+        # Held by a worker that may have died; look again once its heartbeat can expire
+        raise self.retry(countdown=retry_in)
+
+
+@celery_app.task(name="billing.schedule_due_runs")
+def schedule_due_runs() -> list:
+    return BillingCycleService.schedule_due_runs()
+
+
+@worker_ready.connect
+def resume_interrupted_jobs(**kwargs) -> None:
+    JobService.resume_interrupted_jobs()
@@ -0,0 +1,73 @@
+"""
+Benchmark customer search (GET /customers?search=...) latency
+
+Times CustomerService.get_customers for typical support-desk searches
+(name fragment, customer code, phone in local and +62 form, email) and
+reports p50/p95 against the 20 ms target.
+
+Usage (from backend/):
+    python -m benchmarks.customer_search --seed --customers 500000
+    python -m benchmarks.customer_search --iterations 50
+
+Run it against a disposable database: --seed writes rows into DATABASE_URL.
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.core.database import Base, engine
+from app.db.init_db import init_db
+from app.services.customer import CustomerService
+from benchmarks.dashboard_stats import SEED_SQL, measure
+
+TARGET_P95_MS = 20.0
+
+SEARCHES = [
+    ("name fragment", "Customer 4242"),
+    ("customer code", "BENCH-31337"),
+    ("phone, local form", "0812000123"),
+    ("phone, +62 form", "+62 812-0001-23"),
+    ("no match", "zzzz-nothing"),
+]
+
+
+def seed(customers: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    init_db()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM payments WHERE payment_number LIKE 'BENCH-%'"))
+        conn.execute(text("DELETE FROM invoices WHERE invoice_number LIKE 'BENCH-%'"))
+        conn.execute(text("DELETE FROM customers WHERE customer_code LIKE 'BENCH-%'"))
+        conn.execute(text(SEED_SQL[0]), {"customers": customers})
+        conn.execute(text("ANALYZE customers"))
+    print(f"Seeded {customers} customers")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="(Re)create the BENCH- customers first")
+    parser.add_argument("--customers", type=int, default=500_000, help="Customers to seed")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.customers)
+
+    results = [
+        measure(name, lambda db, term=term: CustomerService.get_customers(db, search=term), args.iterations)
+        for name, term in SEARCHES
+    ]
+
+    print(f"{'search':<24}{'queries':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['name']:<24}{r['queries']:>8}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}")
+
+    slow = [r["name"] for r in results if r["p95_ms"] > TARGET_P95_MS]
+    if slow:
+        print(f"\np95 above {TARGET_P95_MS:.0f} ms: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
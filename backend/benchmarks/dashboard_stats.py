@@ -0,0 +1,233 @@
+"""
+Benchmark GET /dashboard/stats: legacy per-figure queries vs rollup-table reads
+
+Seeds a synthetic dataset (prefixed BENCH-) when asked, then runs the legacy
+COUNT/SUM queries over customers, invoices and payments and the current
+endpoint, which reads the precomputed rollup tables, against the same
+database and prints query count and latency.
+
+Usage (from backend/):
+    python -m benchmarks.dashboard_stats --seed --invoices 100000
+    python -m benchmarks.dashboard_stats --iterations 50
+
+Run it against a disposable database: --seed writes rows into DATABASE_URL.
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, text
+
+from app.core.database import Base, SessionLocal, engine
+from app.db.init_db import init_db
+from app.db.rollups import rebuild_rollups
+from app.models.customer import Customer
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.api.v1.endpoints.dashboard import get_dashboard_stats
+
+
+class QueryCounter:
+    """Count statements sent to the database through the engine"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def legacy_dashboard_stats(db) -> dict:
+    """The original implementation: one COUNT/SUM query per figure"""
+    total_customers = db.query(Customer).count()
+    active_customers = db.query(Customer).filter(Customer.status == "active").count()
+    suspended_customers = db.query(Customer).filter(Customer.status == "suspended").count()
+
+    total_invoices = db.query(Invoice).count()
+    pending_invoices = db.query(Invoice).filter(Invoice.status == "pending").count()
+    paid_invoices = db.query(Invoice).filter(Invoice.status == "paid").count()
+    overdue_invoices = db.query(Invoice).filter(Invoice.status == "overdue").count()
+
+    total_payments = db.query(Payment).count()
+    pending_payments = db.query(Payment).filter(Payment.status == "pending").count()
+    verified_payments = db.query(Payment).filter(Payment.status == "verified").count()
+
+    total_revenue = db.query(func.sum(Invoice.total_amount)).filter(
+        Invoice.status == "paid"
+    ).scalar() or 0
+    pending_revenue = db.query(func.sum(Invoice.total_amount)).filter(
+        Invoice.status.in_(["pending", "partial", "overdue"])
+    ).scalar() or 0
+
+    first_day_of_month = date.today().replace(day=1)
+    this_month_revenue = db.query(func.sum(Invoice.total_amount)).filter(
+        Invoice.status == "paid",
+        Invoice.paid_at >= first_day_of_month
+    ).scalar() or 0
+
+    last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
+    last_month_revenue = db.query(func.sum(Invoice.total_amount)).filter(
+        Invoice.status == "paid",
+        Invoice.paid_at >= last_month_first_day,
+        Invoice.paid_at < first_day_of_month
+    ).scalar() or 0
+
+    return {
+        "customers": [total_customers, active_customers, suspended_customers],
+        "invoices": [total_invoices, pending_invoices, paid_invoices, overdue_invoices],
+        "payments": [total_payments, pending_payments, verified_payments],
+        "revenue": [total_revenue, pending_revenue, this_month_revenue, last_month_revenue],
+    }
+
+
+def current_dashboard_stats(db) -> dict:
+    # Bypass the response cache, we want the query cost
+    return get_dashboard_stats.__wrapped__(db=db, current_user=None)
+
+
+SEED_SQL = [
+    # Customers spread over packages and statuses, created over the last ~3 years
+    """
+    INSERT INTO customers (
+        customer_code, full_name, phone, address, city, province,
+        package_id, status, is_active, billing_day, auto_payment, created_at
+    )
+    SELECT
+        'BENCH-' || g,
+        'Bench Customer ' || g,
+        '0812' || lpad(g::text, 8, '0'),
+        'Jl. Benchmark No. ' || g,
+        (ARRAY['Jakarta', 'Bandung', 'Surabaya', 'Medan', 'Semarang'])[1 + g % 5],
+        'Indonesia',
+        pkg.ids[1 + g % array_length(pkg.ids, 1)],
+        CASE g % 20 WHEN 0 THEN 'suspended' WHEN 1 THEN 'terminated' ELSE 'active' END,
+        g % 20 > 1,
+        1 + g % 28,
+        false,
+        now() - (g % 1100) * interval '1 day'
+    FROM generate_series(1, :customers) AS g,
+         (SELECT array_agg(id) AS ids FROM packages) AS pkg
+    """,
+    # Monthly invoices per customer until the requested volume is reached
+    """
+    INSERT INTO invoices (
+        invoice_number, customer_id, billing_period, period_start, period_end,
+        invoice_date, due_date, subtotal, discount, late_fee, tax,
+        total_amount, paid_amount, status, paid_at, created_at
+    )
+    SELECT
+        'BENCH-INV-' || c.id || '-' || m,
+        c.id,
+        to_char(p.start, 'YYYY-MM'),
+        p.start,
+        (p.start + interval '1 month' - interval '1 day')::date,
+        p.start,
+        p.start + 7,
+        200000, 0, 0, 0, 200000,
+        CASE WHEN (c.id + m) % 10 < 7 THEN 200000 WHEN (c.id + m) % 10 = 7 THEN 100000 ELSE 0 END,
+        CASE (c.id + m) % 10
+            WHEN 7 THEN 'partial' WHEN 8 THEN 'overdue' WHEN 9 THEN 'pending' ELSE 'paid'
+        END,
+        CASE WHEN (c.id + m) % 10 < 7 THEN p.start + interval '5 days' END,
+        p.start
+    FROM customers c
+    CROSS JOIN generate_series(0, :months - 1) AS m
+    CROSS JOIN LATERAL (
+        SELECT (date_trunc('month', now()) - m * interval '1 month')::date AS start
+    ) AS p
+    WHERE c.customer_code LIKE 'BENCH-%'
+    LIMIT :invoices
+    """,
+    # One verified payment per paid invoice
+    """
+    INSERT INTO payments (
+        payment_number, customer_id, invoice_id, payment_date, amount,
+        payment_method, status, created_at
+    )
+    SELECT
+        'BENCH-PAY-' || i.id,
+        i.customer_id,
+        i.id,
+        i.paid_at::date,
+        i.paid_amount,
+        (ARRAY['cash', 'bank_transfer', 'e_wallet', 'credit_card'])[1 + i.id % 4],
+        'verified',
+        i.paid_at
+    FROM invoices i
+    WHERE i.invoice_number LIKE 'BENCH-INV-%' AND i.status = 'paid'
+    """,
+]
+
+
+def seed(invoices: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    init_db()
+    months = 12
+    customers = max(1, invoices // months)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM payments WHERE payment_number LIKE 'BENCH-%'"))
+        conn.execute(text("DELETE FROM invoices WHERE invoice_number LIKE 'BENCH-%'"))
+        conn.execute(text("DELETE FROM customers WHERE customer_code LIKE 'BENCH-%'"))
+        params = {"customers": customers, "months": months, "invoices": invoices}
+        for sql in SEED_SQL:
+            conn.execute(text(sql), params)
+        conn.execute(text("ANALYZE customers; ANALYZE invoices; ANALYZE payments"))
+    # Seed rows bypass the services, so recompute the rollups the endpoint reads
+    rebuild_rollups()
+    print(f"Seeded {customers} customers and {invoices} invoices")
+
+
+def measure(name: str, fn, iterations: int) -> dict:
+    db = SessionLocal()
+    try:
+        fn(db)  # warm up connection and plan cache
+        timings = []
+        with QueryCounter() as counter:
+            for _ in range(iterations):
+                started = time.perf_counter()
+                fn(db)
+                timings.append((time.perf_counter() - started) * 1000)
+                db.rollback()
+    finally:
+        db.close()
+
+    timings.sort()
+    return {
+        "name": name,
+        "queries": counter.count // iterations,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="(Re)create the BENCH- dataset first")
+    parser.add_argument("--invoices", type=int, default=100_000, help="Invoices to seed")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.invoices)
+
+    results = [
+        measure("before (per-figure queries)", legacy_dashboard_stats, args.iterations),
+        measure("after (rollup tables)", current_dashboard_stats, args.iterations),
+    ]
+
+    print(f"{'implementation':<34}{'queries':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['name']:<34}{r['queries']:>8}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+EXPLAIN check for the hot filter/sort paths: fail on sequential scans
+
+Runs the list/overdue queries exactly as the services and endpoints build
+them, captures the SQL they send, and EXPLAINs each statement. Exits with
+status 1 if any plan reads customers, invoices or payments with a Seq Scan,
+so it can gate CI or a deploy against a large seeded database.
+
+Usage (from backend/):
+    python -m benchmarks.explain_indexes --seed --invoices 200000
+    python -m benchmarks.explain_indexes --verbose
+
+Run it against a disposable database: --seed writes rows into DATABASE_URL.
+"""
+import argparse
+import json
+import sys
+from datetime import date
+
+from sqlalchemy import event, text
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.services.customer import CustomerService
+from app.services.invoice import InvoiceService, overdue_batch_statement
+from app.services.payment import PaymentService
+from app.api.v1.endpoints.dashboard import get_overdue_summary
+from benchmarks.dashboard_stats import seed
+
+# Tables that must never be read with a sequential scan on these paths
+WATCHED_TABLES = {"customers", "invoices", "payments"}
+
+
+def check_overdue_select(db):
+    """The chunk-picking CTE of InvoiceService.check_overdue_invoices (which itself commits)"""
+    return db.execute(overdue_batch_statement(date.today(), settings.OVERDUE_SWEEP_CHUNK_SIZE)).all()
+
+
+CASES = [
+    ("invoices: list", lambda db: InvoiceService.get_invoices(db)),
+    ("invoices: by customer", lambda db: InvoiceService.get_invoices(db, customer_id=1)),
+    ("invoices: by status", lambda db: InvoiceService.get_invoices(db, status="pending")),
+    ("invoices: by billing period", lambda db: InvoiceService.get_invoices(db, month=date.today().strftime("%Y-%m"))),
+    ("invoices: overdue list", lambda db: InvoiceService.get_overdue_invoices(db)),
+    ("invoices: check overdue", check_overdue_select),
+    ("dashboard: overdue summary", lambda db: get_overdue_summary.__wrapped__(db=db, current_user=None)),
+    ("payments: list", lambda db: PaymentService.get_payments(db)),
+    ("payments: by customer", lambda db: PaymentService.get_payments(db, customer_id=1)),
+    ("payments: by invoice", lambda db: PaymentService.get_payments(db, invoice_id=1)),
+    ("payments: by status", lambda db: PaymentService.get_payments(db, status="pending")),
+    ("payments: by method", lambda db: PaymentService.get_payments(db, payment_method="cash")),
+    ("customers: list", lambda db: CustomerService.get_customers(db)),
+    ("customers: by status", lambda db: CustomerService.get_customers(db, status="suspended")),
+    ("customers: by package", lambda db: CustomerService.get_customers(db, package_id=1)),
+    ("customers: search", lambda db: CustomerService.get_customers(db, search="Customer 4242")),
+    ("customers: search phone", lambda db: CustomerService.get_customers(db, search="+62 812-0001")),
+]
+
+
+class StatementRecorder:
+    """Record statements (and their parameters) sent through the engine"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+
+def seq_scans(plan: dict) -> list:
+    """Watched relations read with a Seq Scan anywhere in a JSON plan tree"""
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in WATCHED_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+def explain(db, statement: str, parameters) -> dict:
+    raw = db.connection().exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    return plan[0]["Plan"]
+
+
+def run(verbose: bool = False) -> int:
+    db = SessionLocal()
+    failures = 0
+    try:
+        for name, case in CASES:
+            with StatementRecorder() as recorder:
+                case(db)
+            for statement, parameters in recorder.statements:
+                plan = explain(db, statement, parameters)
+                scans = seq_scans(plan)
+                status = "FAIL" if scans else "ok"
+                print(f"{status:<6}{name:<32}{plan['Node Type']:<22}cost={plan['Total Cost']:.0f}"
+                      + (f"  seq scan on {', '.join(scans)}" if scans else ""))
+                if verbose or scans:
+                    print("      " + " ".join(statement.split()))
+                failures += bool(scans)
+            db.rollback()
+    finally:
+        db.close()
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", action="store_true", help="(Re)create the BENCH- dataset first")
+    parser.add_argument("--invoices", type=int, default=200_000, help="Invoices to seed")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.invoices)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE customers"))
+        conn.execute(text("VACUUM ANALYZE invoices"))
+        conn.execute(text("VACUUM ANALYZE payments"))
+
+    failures = run(args.verbose)
+    if failures:
+        print(f"\n{failures} statement(s) fell back to a sequential scan")
+        sys.exit(1)
+    print("\nNo sequential scans on customers, invoices or payments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Month-end load scenario: mixed API traffic against a running server
+
+Drives the real app over HTTP through the /api/v1 routes with --concurrency
+simulated staff, each picking operations from a weighted month-end mix:
+
+    generate   POST /invoices/generate for a customer not billed yet
+    batch      POST /invoices/generate-batch once, then GET /jobs/{id} polls
+    payment    POST /payments for an unpaid invoice (payment entry)
+    verify     GET /payments/pending, then POST /payments/{id}/verify
+    dashboard  the six GET /dashboard/* requests of a page refresh, in parallel
+
+It reports per-route throughput, latency percentiles and error rates, and
+a DB pool summary from the server's /metrics (checkout waits, timeouts,
+peak checked-out connections; needs METRICS_ENABLED). A route on which
+every request failed points at a broken scenario step rather than load,
+so the run then exits with status 1.
+
+Every user draws its operations from random.Random(--seed + user) and gets
+its own slice of customers and invoices, so a run against the synthetic
+dataset (--prepare, or python -m app.db.synthetic --reset with the same
+seed) is reproducible up to server-side timing.
+
+Usage (from backend/, with the API running, e.g. uvicorn app.main:app --workers 4):
+    python -m benchmarks.month_end_load --prepare --customers 50000
+    python -m benchmarks.month_end_load --concurrency 50 --duration 120
+    python -m benchmarks.month_end_load --mix generate=0,batch=1,payment=40,verify=40,dashboard=19
+
+Run it against a disposable database: the scenario writes invoices and
+payments, and --prepare truncates and reloads the dataset in DATABASE_URL.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+import httpx
+from dateutil.relativedelta import relativedelta
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.core.config import settings
+from app.db import synthetic
+
+API = "/api/v1"
+
+DEFAULT_MIX = {"generate": 5, "batch": 2, "payment": 35, "verify": 30, "dashboard": 28}
+
+DASHBOARD_ROUTES = [
+    "/dashboard/stats",
+    "/dashboard/revenue-chart",
+    "/dashboard/customer-growth",
+    "/dashboard/package-distribution",
+    "/dashboard/recent-activities",
+    "/dashboard/overdue-summary",
+]
+
+
+class RouteStats:
+    """Latencies and outcomes per route template"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, route: str, seconds: float, outcome: str) -> None:
+        self.latencies[route].append(seconds)
+        self.outcomes[route][outcome] += 1
+
+    def report(self, elapsed: float) -> str:
+        lines = [
+            f"{'route':<44}{'requests':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'max ms':>9}{'errors':>8}  status codes"
+        ]
+        for route in sorted(self.latencies):
+            timings = sorted(self.latencies[route])
+            outcomes = self.outcomes[route]
+            errors = sum(n for outcome, n in outcomes.items() if not outcome.startswith("2"))
+            lines.append(
+                f"{route:<44}{len(timings):>9}{len(timings) / elapsed:>8.1f}"
+                f"{_percentile(timings, 0.5) * 1000:>9.1f}{_percentile(timings, 0.95) * 1000:>9.1f}"
+                f"{_percentile(timings, 0.99) * 1000:>9.1f}{timings[-1] * 1000:>9.1f}"
+                f"{errors / len(timings):>8.1%}  "
+                + ", ".join(f"{outcome}: {n}" for outcome, n in sorted(outcomes.items()))
+            )
+        return "\n".join(lines)
+
+    def broken_routes(self) -> List[str]:
+        """Routes whose every request failed: a broken step, not load"""
+        return [
+            route for route, outcomes in self.outcomes.items()
+            if not any(outcome.startswith("2") for outcome in outcomes)
+        ]
+
+
+def _percentile(timings: List[float], fraction: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+class Scenario:
+    """Shared state of one run: client, route stats and the work each user draws from"""
+
+    def __init__(self, client: httpx.AsyncClient, billing_month: date):
+        self.client = client
+        self.stats = RouteStats()
+        self.billing_month = billing_month
+        self.batch_job_id: Optional[int] = None
+        self.customers: Dict[int, List[int]] = {}
+        self.invoices: Dict[int, List[dict]] = {}
+
+    async def call(self, method: str, route: str, path: Optional[str] = None, **kwargs) -> Optional[httpx.Response]:
+        """Send one request, recorded under its route template"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, API + (path or route), **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(f"{method} {route}", time.perf_counter() - started, type(e).__name__)
+            return None
+        self.stats.record(f"{method} {route}", time.perf_counter() - started, str(response.status_code))
+        return response
+
+    async def generate(self, user: int, rng: random.Random) -> None:
+        customers = self.customers[user]
+        if customers:
+            await self.call("POST", "/invoices/generate", json={
+                "customer_id": customers.pop(),
+                "billing_month": self.billing_month.isoformat(),
+            })
+
+    async def batch(self, user: int, rng: random.Random) -> None:
+        if self.batch_job_id is None:
+            # Billing next month for everyone; submitting again returns the active job
+            response = await self.call(
+                "POST", "/invoices/generate-batch",
+                params={"billing_month": (self.billing_month + relativedelta(months=1)).isoformat()}
+            )
+            if response is not None and response.status_code == 202:
+                self.batch_job_id = response.json()["id"]
+        else:
+            await self.call("GET", "/jobs/{job_id}", f"/jobs/{self.batch_job_id}")
+
+    async def payment(self, user: int, rng: random.Random) -> None:
+        invoices = self.invoices[user]
+        if not invoices:
+            return
+        invoice = invoices.pop()
+        method = rng.choice(["bank_transfer", "bank_transfer", "e_wallet", "cash"])
+        await self.call("POST", "/payments/", json={
+            "customer_id": invoice["customer_id"],
+            "invoice_id": invoice["id"],
+            "payment_date": date.today().isoformat(),
+            "amount": str(invoice["outstanding"]),
+            "payment_method": method,
+            "bank_name": rng.choice(synthetic.BANKS) if method == "bank_transfer" else None,
+        })
+
+    async def verify(self, user: int, rng: random.Random) -> None:
+        response = await self.call("GET", "/payments/pending", params={"limit": 20})
+        if response is None or response.status_code != 200 or not response.json():
+            return
+        payment_id = rng.choice(response.json())["id"]
+        await self.call(
+            "POST", "/payments/{payment_id}/verify", f"/payments/{payment_id}/verify",
+            json={"admin_notes": "Month-end load test"}
+        )
+
+    async def dashboard(self, user: int, rng: random.Random) -> None:
+        await asyncio.gather(*(self.call("GET", route) for route in DASHBOARD_ROUTES))
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> None:
+    response = await client.post(f"{API}/auth/login", data={"username": username, "password": password})
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+async def fetch_all(client: httpx.AsyncClient, path: str, params: dict, limit: int) -> List[dict]:
+    """Up to limit rows of a list endpoint, 100 per page"""
+    rows: List[dict] = []
+    while len(rows) < limit:
+        response = await client.get(f"{API}{path}", params={**params, "skip": len(rows), "limit": 100})
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page)
+        if len(page) < 100:
+            break
+    return rows[:limit]
+
+
+async def load_work(scenario: Scenario, users: int, per_user: int) -> None:
+    """Customers to bill and invoices to pay, dealt out to the users round-robin"""
+    customers = await fetch_all(scenario.client, "/customers/", {"status": "active"}, users * per_user)
+    invoices = []
+    for invoice_status in ("pending", "overdue", "partial"):
+        invoices += await fetch_all(scenario.client, "/invoices/", {"status": invoice_status}, users * per_user)
+    invoices.sort(key=lambda invoice: invoice["id"])
+
+    for user in range(users):
+        scenario.customers[user] = [customer["id"] for customer in customers[user::users]][::-1]
+        scenario.invoices[user] = [
+            {
+                "id": invoice["id"],
+                "customer_id": invoice["customer_id"],
+                "outstanding": Decimal(invoice["total_amount"]) - Decimal(invoice["paid_amount"]),
+            }
+            for invoice in invoices[user::users]
+        ][::-1]
+
+
+async def pool_metrics(client: httpx.AsyncClient) -> Optional[Dict[tuple, float]]:
+    """Pool samples of the server's /metrics, keyed by (sample name, pool[, le])"""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    samples = {}
+    for family in text_string_to_metric_families(response.text):
+        if not family.name.startswith("db_pool_"):
+            continue
+        for sample in family.samples:
+            key = (sample.name, sample.labels.get("pool"), sample.labels.get("le"))
+            samples[key] = samples.get(key, 0.0) + sample.value
+    return samples
+
+
+def pool_report(before: Dict[tuple, float], after: Dict[tuple, float], peaks: Dict[str, float]) -> str:
+    lines = [f"{'pool':<8}{'checkouts':>10}{'mean ms':>9}{'>10 ms':>8}{'>100 ms':>9}{'>1 s':>7}{'timeouts':>10}{'peak out':>10}"]
+    pools = sorted({pool for name, pool, le in after if name == "db_pool_checkout_seconds_count"})
+
+    def delta(name, pool, le=None):
+        return after.get((name, pool, le), 0.0) - before.get((name, pool, le), 0.0)
+
+    for pool in pools:
+        count = delta("db_pool_checkout_seconds_count", pool)
+        total = delta("db_pool_checkout_seconds_sum", pool)
+        slower = {
+            le: count - delta("db_pool_checkout_seconds_bucket", pool, le)
+            for le in ("0.01", "0.1", "1.0")
+        }
+        lines.append(
+            f"{pool:<8}{count:>10.0f}{(total / count * 1000 if count else 0):>9.2f}"
+            f"{slower['0.01']:>8.0f}{slower['0.1']:>9.0f}{slower['1.0']:>7.0f}"
+            f"{delta('db_pool_timeouts_total', pool):>10.0f}{peaks.get(pool, 0):>10.0f}"
+        )
+    return "\n".join(lines)
+
+
+async def sample_pool_peaks(client: httpx.AsyncClient, peaks: Dict[str, float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        samples = await pool_metrics(client) or {}
+        for (name, pool, le), value in samples.items():
+            if name == "db_pool_connections_checked_out":
+                peaks[pool] = max(peaks.get(pool, 0.0), value)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(args, mix: Dict[str, int]) -> List[str]:
+    """Run the scenario and print its report; returns the routes that never succeeded"""
+    limits = httpx.Limits(max_connections=args.concurrency * len(DASHBOARD_ROUTES))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        await login(client, args.username, args.password)
+
+        today = date.today()
+        scenario = Scenario(client, date(today.year, today.month, 1) + relativedelta(months=1))
+        await load_work(scenario, args.concurrency, args.work_per_user)
+
+        before = await pool_metrics(client)
+        peaks: Dict[str, float] = {}
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_pool_peaks(client, peaks, stop))
+
+        operations = list(mix)
+        weights = [mix[name] for name in operations]
+        deadline = time.perf_counter() + args.duration
+
+        async def user(number: int) -> None:
+            rng = random.Random(args.seed + number)
+            while time.perf_counter() < deadline:
+                operation = rng.choices(operations, weights)[0]
+                await getattr(scenario, operation)(number, rng)
+                if args.think_time:
+                    await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(number) for number in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        await sampler
+        after = await pool_metrics(client)
+
+    print(f"\n{args.concurrency} users for {elapsed:.0f}s, mix {', '.join(f'{k}={v}' for k, v in mix.items())}\n")
+    print(scenario.stats.report(elapsed))
+    print()
+    if before is None or after is None:
+        print("DB pool: /metrics not available (METRICS_ENABLED off?)")
+    else:
+        print("DB pool (checkouts slower than 10 ms / 100 ms / 1 s are queueing for a connection):")
+        print(pool_report(before, after, peaks))
+
+    broken = scenario.stats.broken_routes()
+    for route in sorted(broken):
+        print(f"FAIL: every {route} request failed ({dict(scenario.stats.outcomes[route])})")
+    return broken
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = dict(DEFAULT_MIX)
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"expected name=weight with name in {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return {name: weight for name, weight in mix.items() if weight}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", default=settings.FIRST_SUPERUSER_EMAIL)
+    parser.add_argument("--password", default=settings.FIRST_SUPERUSER_PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=20, help="Simulated users")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run")
+    parser.add_argument("--think-time", type=float, default=0, help="Mean pause between a user's operations (s)")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="Weights, e.g. payment=40,verify=40")
+    parser.add_argument("--seed", type=int, default=42, help="Operation mix and synthetic dataset seed")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout (s)")
+    parser.add_argument("--work-per-user", type=int, default=200, help="Customers / invoices dealt to each user")
+    parser.add_argument("--prepare", action="store_true", help="Reload the synthetic dataset first")
+    parser.add_argument("--customers", type=int, default=10_000, help="Dataset size with --prepare")
+    parser.add_argument("--months", type=int, default=12, help="Billing months with --prepare")
+    args = parser.parse_args()
+
+    if args.prepare:
+        loaded = synthetic.generate(args.customers, args.months, seed=args.seed, reset=True)
+        print(f"Loaded {loaded['customers']} customers, {loaded['invoices']} invoices, {loaded['payments']} payments")
+
+    if asyncio.run(run(args, args.mix)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
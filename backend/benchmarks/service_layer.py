@@ -0,0 +1,318 @@
+"""
+Service-layer benchmark suite with a regression gate
+
+Loads the synthetic dataset (app.db.synthetic) at each --sizes customer
+count and times the hot service calls and dashboard endpoints against it:
+throughput, p50/p99 latency and SQL statements per call. Every run is
+compared with the last recorded run for the same size, seed, months and
+--as-of date (the dataset's "today", fixed so reruns load the same data); a
+metric that got worse by more than --threshold (latency up, throughput
+down) or any extra SQL statement fails the run with exit status 1.
+
+Passing runs are appended to the JSON history file (--history); use
+--accept to record a run that regresses on purpose, making it the new
+baseline.
+
+Cases that write (verify_payment, generate_monthly_invoice, batch
+generation, overdue sweep) run after the read-only ones and on fresh rows
+each iteration; the overdue sweep has real work only once per dataset, so
+it runs a single iteration.
+
+Usage (from backend/):
+    python -m benchmarks.service_layer --sizes 1000,10000,100000
+    python -m benchmarks.service_layer --sizes 10000 --cases dashboard_stats,customer_search
+    python -m benchmarks.service_layer --sizes 10000 --accept
+
+Run it against a disposable database: every size truncates and reloads
+customers, invoices and payments in DATABASE_URL.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import select
+
+from app.api.v1.endpoints import dashboard
+from app.core.database import SessionLocal
+from app.core.query_budget import record_queries
+from app.db import synthetic
+from app.models.customer import Customer
+from app.models.payment import Payment
+from app.models.user import User
+from app.services.customer import CustomerService
+from app.services.invoice import InvoiceService
+from app.services.payment import PaymentService
+
+DEFAULT_HISTORY = Path(".benchmarks") / "service_layer.json"
+DEFAULT_AS_OF = date(2026, 6, 30)
+
+# (metric, direction): +1 when a higher value is worse
+TRACKED_METRICS = [("p50_ms", +1), ("p99_ms", +1), ("throughput", -1)]
+
+
+class Case(NamedTuple):
+    name: str
+    # setup(db, context, iterations) -> one argument per iteration
+    setup: Callable
+    # run(db, context, argument) -> items processed (None: one call)
+    run: Callable
+    writes: bool = False
+    max_iterations: Optional[int] = None
+
+
+def _dashboard(endpoint: Callable, **params) -> Callable:
+    # Bypass the response cache where there is one, we want the query cost
+    endpoint = getattr(endpoint, "__wrapped__", endpoint)
+
+    def run(db, context, argument):
+        endpoint(db=db, current_user=None, **params)
+    return run
+
+
+def _repeat(db, context, iterations):
+    return [None] * iterations
+
+
+def _search_terms(db, context, iterations):
+    terms = [
+        synthetic.LAST_NAMES[0],
+        synthetic.FIRST_NAMES[1].lower(),
+        synthetic.CITIES[0][0],
+        "CUST-0042",
+        "0812",
+        "zzzz-nothing",
+    ]
+    return [terms[n % len(terms)] for n in range(iterations)]
+
+
+def _search_customers(db, context, term):
+    CustomerService.get_customers(db, search=term)
+
+
+def _pending_payments(db, context, iterations):
+    return db.scalars(
+        select(Payment.id).where(Payment.status == "pending").order_by(Payment.id).limit(iterations)
+    ).all()
+
+
+def _verify_payment(db, context, payment_id):
+    PaymentService.verify_payment(db, payment_id, verified_by=context["admin_id"])
+
+
+def _unbilled_customers(db, context, iterations):
+    # The dataset stops at as_of, so nobody is billed for next month yet
+    return db.scalars(
+        select(Customer.id)
+        .where(Customer.status == "active", Customer.package_id.is_not(None))
+        .order_by(Customer.id)
+        .limit(iterations)
+    ).all()
+
+
+def _monthly_invoice(db, context, customer_id):
+    InvoiceService.generate_monthly_invoice(db, customer_id, context["next_month"])
+
+
+def _future_months(db, context, iterations):
+    # Months no other case bills, one per iteration
+    return [context["next_month"] + relativedelta(months=n + 1) for n in range(iterations)]
+
+
+def _batch_invoices(db, context, billing_month):
+    return InvoiceService.generate_batch_invoices(db, billing_month)["success"]
+
+
+def _overdue_sweep(db, context, argument):
+    return InvoiceService.check_overdue_invoices(db)["overdue_count"]
+
+
+CASES = [
+    Case("customer_search", _search_terms, _search_customers),
+    Case("dashboard_stats", _repeat, _dashboard(dashboard.get_dashboard_stats)),
+    Case("dashboard_revenue_chart", _repeat, _dashboard(dashboard.get_revenue_chart, months=12)),
+    Case("dashboard_customer_growth", _repeat, _dashboard(dashboard.get_customer_growth, months=12)),
+    Case("dashboard_package_distribution", _repeat, _dashboard(dashboard.get_package_distribution)),
+    Case("dashboard_recent_activities", _repeat, _dashboard(dashboard.get_recent_activities, limit=10)),
+    Case("dashboard_overdue_summary", _repeat, _dashboard(dashboard.get_overdue_summary)),
+    Case("verify_payment", _pending_payments, _verify_payment, writes=True),
+    Case("generate_monthly_invoice", _unbilled_customers, _monthly_invoice, writes=True),
+    # Throughput of these two is invoices per second
+    Case("generate_batch_invoices", _future_months, _batch_invoices, writes=True, max_iterations=3),
+    Case("check_overdue_invoices", _repeat, _overdue_sweep, writes=True, max_iterations=1),
+]
+
+
+def _percentile(timings: List[float], fraction: float) -> float:
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+def measure(case: Case, context: dict, iterations: int) -> Optional[dict]:
+    iterations = min(iterations, case.max_iterations or iterations)
+    db = SessionLocal()
+    try:
+        arguments = case.setup(db, context, iterations + (0 if case.writes else 1))
+        db.rollback()
+        if not arguments:
+            return None
+        if not case.writes:
+            # Warm up connection and plan cache; writes need fresh rows for every call
+            case.run(db, context, arguments.pop())
+            db.rollback()
+
+        timings = []
+        items = 0
+        with record_queries() as recorder:
+            for argument in arguments:
+                started = time.perf_counter()
+                processed = case.run(db, context, argument)
+                timings.append((time.perf_counter() - started) * 1000)
+                items += 1 if processed is None else max(processed, 1)
+                db.rollback()
+    finally:
+        db.close()
+
+    timings.sort()
+    return {
+        "iterations": len(timings),
+        "throughput": items / (sum(timings) / 1000),
+        "p50_ms": _percentile(timings, 0.5),
+        "p99_ms": _percentile(timings, 0.99),
+        "queries": recorder.count / len(timings),
+    }
+
+
+def run_size(customers: int, months: int, seed: int, as_of: date, iterations: int, cases: List[Case]) -> dict:
+    loaded = synthetic.generate(customers, months, seed=seed, as_of=as_of, reset=True)
+    print(
+        f"\n{customers} customers: {loaded['invoices']} invoices, {loaded['payments']} payments "
+        f"(loaded in {loaded['total_seconds']}s)"
+    )
+
+    with SessionLocal() as db:
+        context = {
+            "admin_id": db.scalar(select(User.id).order_by(User.id)),
+            "next_month": date(as_of.year, as_of.month, 1) + relativedelta(months=1),
+        }
+
+    results = {}
+    for case in sorted(cases, key=lambda case: case.writes):
+        result = measure(case, context, iterations)
+        if result is None:
+            print(f"  {case.name:<34} skipped (no rows to work on)")
+            continue
+        results[case.name] = result
+        print(
+            f"  {case.name:<34}{result['throughput']:>10.1f}/s{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+            f"{result['queries']:>9.1f}"
+        )
+    return results
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text())
+
+
+def baseline_for(history: List[dict], run: dict, size: str, case: str) -> Optional[dict]:
+    """The case's result in the latest recorded run on the same dataset"""
+    for previous in reversed(history):
+        if (previous["seed"], previous["months"], previous.get("as_of")) != (run["seed"], run["months"], run["as_of"]):
+            continue
+        result = previous["results"].get(size, {}).get(case)
+        if result:
+            return result
+    return None
+
+
+def regressions(history: List[dict], run: dict, threshold: float, min_delta_ms: float) -> List[str]:
+    problems = []
+    for size, results in run["results"].items():
+        for case, result in results.items():
+            baseline = baseline_for(history, run, size, case)
+            if baseline is None:
+                continue
+            if result["queries"] > baseline["queries"]:
+                problems.append(
+                    f"{case} @ {size}: {result['queries']:.1f} statements per call, was {baseline['queries']:.1f}"
+                )
+            for metric, direction in TRACKED_METRICS:
+                old, new = baseline[metric], result[metric]
+                change = (new - old) / old if old else 0.0
+                if change * direction <= threshold:
+                    continue
+                if metric.endswith("_ms") and new - old < min_delta_ms:
+                    continue  # sub-millisecond jitter
+                problems.append(f"{case} @ {size}: {metric} {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return problems
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated customer counts")
+    parser.add_argument("--months", type=int, default=12, help="Billing months per dataset")
+    parser.add_argument("--seed", type=int, default=42, help="Synthetic dataset seed")
+    parser.add_argument(
+        "--as-of", type=date.fromisoformat, default=DEFAULT_AS_OF,
+        help=f"Synthetic dataset 'today' (default: {DEFAULT_AS_OF})"
+    )
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--cases", help=f"Comma-separated subset of: {', '.join(case.name for case in CASES)}")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative change (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore latency changes below this")
+    parser.add_argument("--history", type=Path, default=DEFAULT_HISTORY)
+    parser.add_argument("--accept", action="store_true", help="Record the run even if it regresses")
+    parser.add_argument("--no-save", action="store_true", help="Compare only, do not record the run")
+    args = parser.parse_args()
+
+    cases = CASES
+    if args.cases:
+        names = set(args.cases.split(","))
+        unknown = names - {case.name for case in CASES}
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+        cases = [case for case in CASES if case.name in names]
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "seed": args.seed,
+        "months": args.months,
+        "as_of": args.as_of.isoformat(),
+        "results": {},
+    }
+    print(f"  {'case':<34}{'throughput':>12}{'p50 ms':>10}{'p99 ms':>10}{'queries':>9}")
+    for size in [int(size) for size in args.sizes.split(",")]:
+        run["results"][str(size)] = run_size(size, args.months, args.seed, args.as_of, args.iterations, cases)
+
+    history = load_history(args.history)
+    problems = regressions(history, run, args.threshold, args.min_delta_ms)
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+
+    if not args.no_save and (not problems or args.accept):
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        args.history.write_text(json.dumps(history + [run], indent=2))
+        print(f"Recorded in {args.history}")
+
+    if problems and not args.accept:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Stress test concurrent payment verification: no paid_amount increment may be lost
+
+Seeds one invoice (prefixed BENCH-VERIFY) with many small pending payments,
+then verifies them from several threads at once, every thread with its own
+session, all hitting the same invoice row. Afterwards the invoice's
+paid_amount must equal the sum of its verified payments, and its status
+rollup must match the invoice.
+
+--mode legacy runs the original read-modify-write verification for
+comparison; it is expected to lose increments and exit with status 1.
+
+Usage (from backend/):
+    python -m benchmarks.verify_concurrency --payments 500 --threads 16
+    python -m benchmarks.verify_concurrency --mode batch --batch-size 25
+    python -m benchmarks.verify_concurrency --mode legacy
+
+Run it against a disposable database: it writes rows into DATABASE_URL.
+"""
+import argparse
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+
+from app.core.database import Base, SessionLocal, engine
+from app.db.init_db import init_db
+from app.db.rollups import rebuild_rollups
+from app.models.invoice import Invoice
+from app.models.payment import Payment
+from app.models.rollup import InvoiceStatusRollup
+from app.services.payment import PaymentService
+
+PERIOD = "BENCH-VERIFY"
+VERIFIED_BY = 1
+
+
+def seed(payments: int, amount: Decimal) -> int:
+    """One customer, one invoice for payments * amount, `payments` pending payments"""
+    Base.metadata.create_all(bind=engine)
+    init_db()
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM payments WHERE payment_number LIKE 'BENCH-VERIFY-%'"))
+        conn.execute(text("DELETE FROM invoices WHERE invoice_number LIKE 'BENCH-VERIFY-%'"))
+        conn.execute(text("DELETE FROM customers WHERE customer_code = 'BENCH-VERIFY'"))
+        customer_id = conn.execute(text("""
+            INSERT INTO customers (customer_code, full_name, phone, address, city, province, status, is_active)
+            VALUES ('BENCH-VERIFY', 'Bench Verify', '081200000000', 'Jl. Benchmark', 'Jakarta', 'Indonesia', 'active', true)
+            RETURNING id
+        """)).scalar()
+        invoice_id = conn.execute(text("""
+            INSERT INTO invoices (
+                invoice_number, customer_id, billing_period, period_start, period_end,
+                invoice_date, due_date, subtotal, discount, late_fee, tax,
+                total_amount, paid_amount, status
+            )
+            VALUES (
+                'BENCH-VERIFY-INV', :customer_id, :period, :start, :end,
+                :start, :due, :total, 0, 0, 0, :total, 0, 'pending'
+            )
+            RETURNING id
+        """), {
+            "customer_id": customer_id,
+            "period": PERIOD,
+            "start": today.replace(day=1),
+            "end": today,
+            "due": today + timedelta(days=7),
+            "total": amount * payments,
+        }).scalar()
+        conn.execute(text("""
+            INSERT INTO payments (
+                payment_number, customer_id, invoice_id, payment_date, amount, payment_method, status
+            )
+            SELECT 'BENCH-VERIFY-PAY-' || g, :customer_id, :invoice_id, :today, :amount, 'bank_transfer', 'pending'
+            FROM generate_series(1, :payments) AS g
+        """), {
+            "customer_id": customer_id,
+            "invoice_id": invoice_id,
+            "today": today,
+            "amount": amount,
+            "payments": payments,
+        })
+    # Seed rows bypass the services, so recompute the rollups
+    rebuild_rollups()
+    return invoice_id
+
+
+def legacy_verify(db, payment_ids) -> None:
+    """The original verification: paid_amount read into Python and written back"""
+    for payment_id in payment_ids:
+        payment = db.get(Payment, payment_id)
+        payment.status = "verified"
+        payment.verified_by = VERIFIED_BY
+        payment.verified_at = datetime.utcnow()
+        invoice = db.get(Invoice, payment.invoice_id)
+        invoice.paid_amount += payment.amount
+        if invoice.paid_amount >= invoice.total_amount:
+            invoice.status = "paid"
+            invoice.paid_at = datetime.utcnow()
+        elif invoice.paid_amount > 0:
+            invoice.status = "partial"
+        db.commit()
+
+
+def single_verify(db, payment_ids) -> None:
+    for payment_id in payment_ids:
+        PaymentService.verify_payment(db, payment_id, verified_by=VERIFIED_BY)
+
+
+def batch_verify(db, payment_ids) -> None:
+    PaymentService.verify_payments(db, payment_ids, verified_by=VERIFIED_BY)
+
+
+MODES = {"single": single_verify, "batch": batch_verify, "legacy": legacy_verify}
+
+
+def run(verify, payment_ids, threads: int, batch_size: int) -> dict:
+    """Verify payment_ids from `threads` threads started together"""
+    chunks = [payment_ids[i:i + batch_size] for i in range(0, len(payment_ids), batch_size)]
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def worker(worker_chunks):
+        barrier.wait()
+        for chunk in worker_chunks:
+            db = SessionLocal()
+            try:
+                verify(db, chunk)
+            except HTTPException as e:
+                db.rollback()
+                errors.append(e.detail)
+            finally:
+                db.close()
+
+    workers = [
+        threading.Thread(target=worker, args=(chunks[n::threads],))
+        for n in range(threads)
+    ]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return {"seconds": time.perf_counter() - started, "errors": errors}
+
+
+def check(invoice_id: int) -> list:
+    """Invariants after the run; returns the violations"""
+    problems = []
+    with SessionLocal() as db:
+        invoice = db.get(Invoice, invoice_id)
+        verified_count, verified_sum, total_count = db.execute(
+            select(
+                func.count().filter(Payment.status == "verified"),
+                func.coalesce(func.sum(Payment.amount).filter(Payment.status == "verified"), 0),
+                func.count()
+            ).where(Payment.invoice_id == invoice_id)
+        ).one()
+
+        if verified_count != total_count:
+            problems.append(f"{total_count - verified_count} of {total_count} payments not verified")
+        if invoice.paid_amount != verified_sum:
+            problems.append(
+                f"paid_amount {invoice.paid_amount} != verified payments {verified_sum} "
+                f"(lost {verified_sum - invoice.paid_amount})"
+            )
+        if invoice.paid_amount >= invoice.total_amount and invoice.status != "paid":
+            problems.append(f"fully paid invoice has status {invoice.status}")
+
+        rollup = {
+            row.status: (row.invoice_count, row.paid_amount)
+            for row in db.scalars(select(InvoiceStatusRollup).where(InvoiceStatusRollup.billing_period == PERIOD))
+            if row.invoice_count
+        }
+        if rollup != {invoice.status: (1, invoice.paid_amount)}:
+            problems.append(f"status rollup {rollup} does not match invoice ({invoice.status}, {invoice.paid_amount})")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=sorted(MODES), default="single")
+    parser.add_argument("--payments", type=int, default=500, help="Pending payments on the invoice")
+    parser.add_argument("--amount", type=Decimal, default=Decimal("1000"), help="Amount per payment")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=1, help="Payment ids per verify call / transaction")
+    args = parser.parse_args()
+
+    if args.mode == "batch" and args.batch_size == 1:
+        args.batch_size = 25
+
+    invoice_id = seed(args.payments, args.amount)
+    with SessionLocal() as db:
+        payment_ids = db.scalars(
+            select(Payment.id).where(Payment.invoice_id == invoice_id).order_by(Payment.id)
+        ).all()
+
+    result = run(MODES[args.mode], payment_ids, args.threads, args.batch_size)
+    problems = check(invoice_id)
+
+    print(
+        f"{args.mode}: {len(payment_ids)} payments, {args.threads} threads, "
+        f"{args.batch_size} per transaction in {result['seconds']:.2f}s "
+        f"({len(payment_ids) / result['seconds']:.0f} payments/s)"
+    )
+    for error in result["errors"]:
+        print(f"  error: {error}")
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+
+    if problems or result["errors"]:
+        sys.exit(1)
+    print("OK: no increments lost")
+
+
+if __name__ == "__main__":
+    main()